@@ -0,0 +1,338 @@
+import contextlib
+import logging
+import random
+import threading
+import time
+
+import numpy as np
+
+from .local_search import EPSILON, LocalSearch, local_search_data
+from .spatial_index import hilbert_order, hilbert_tour, nearest_neighbour_tour
+
+# Mouvements appliqués sur une route (et durée max, s) avant de passer à la suivante
+SLICE_MOVES = 200
+SLICE_SECONDS = 0.02
+# Coût approximatif (s) d'une case de sous-matrice dense, pour choisir ce qui tient dans le budget
+DENSE_ENTRY_SECONDS = 2e-7
+# Coûts a priori (s) par arrêt des étapes qui précèdent ou suivent la recherche (mesurés
+# entre 2000 et 50000 arrêts) ; remplacés au fil des requêtes par les durées mesurées
+# (StageCosts), pour tenir le budget de bout en bout sur la machine réelle. Sans marge :
+# une étape jugée trop chère n'est jamais lancée, donc jamais remesurée
+NEAREST_NEIGHBOUR_SECONDS = 5e-5
+KNN_GRAPH_SECONDS = 1e-5
+CLUSTER_SECONDS = 1e-5
+CLUSTER_FIXED_SECONDS = 5e-3
+SEARCH_SETUP_SECONDS = 1.5e-5
+HILBERT_SECONDS = 1.5e-6
+FORMAT_SECONDS = 1e-5
+# Réserve pour la mise en forme, en multiple de son coût estimé : dernière étape, elle
+# ne peut plus être écourtée
+FORMAT_MARGIN = 1.25
+# En dessous de ce nombre d'arrêts, une mesure reflète surtout les coûts fixes : ignorée
+MIN_MEASURED_STOPS = 1000
+# Perturbations consécutives sans gain avant d'abandonner une route (en plus de sa taille)
+ILS_PATIENCE = 100
+
+
+class StageCosts:
+    """Coût par arrêt (s) de chaque étape, recalé sur les durées mesurées
+
+    Part des constantes a priori ; chaque mesure (au moins MIN_MEASURED_STOPS
+    arrêts) est mélangée à l'estimation courante par moyenne glissante
+    exponentielle : les décisions suivent la vitesse réelle de la machine et
+    sa charge. Partagé par les optimiseurs d'un processus.
+    """
+
+    def __init__(self, priors, weight=0.3):
+        self.weight = weight
+        self._costs = dict(priors)
+        self._lock = threading.Lock()
+
+    def estimate(self, stage, count):
+        return self._costs[stage] * count
+
+    def record(self, stage, count, seconds):
+        if count < MIN_MEASURED_STOPS:
+            return
+        with self._lock:
+            self._costs[stage] += self.weight * (seconds / count - self._costs[stage])
+
+    @contextlib.contextmanager
+    def measure(self, stage, count):
+        started = time.perf_counter()
+        yield
+        self.record(stage, count, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._costs)
+
+
+stage_costs = StageCosts({
+    'nearest_neighbour': NEAREST_NEIGHBOUR_SECONDS,
+    'knn_graph': KNN_GRAPH_SECONDS,
+    'cluster': CLUSTER_SECONDS,
+    'search_setup': SEARCH_SETUP_SECONDS,
+    'hilbert': HILBERT_SECONDS,
+    'format': FORMAT_SECONDS
+})
+
+
+def initial_routes(clusters, coords, deadline, costs=stage_costs):
+    """Routes initiales : plus proche voisin si le budget restant le permet, sinon courbe de Hilbert
+
+    Le choix est refait avant chaque cluster, les plus gros d'abord : un
+    cluster plus lent que prévu ne fait basculer que les suivants.
+    """
+    remaining = sum(len(points) for points in clusters)
+    routes = [None] * len(clusters)
+    for c in sorted(range(len(clusters)), key=lambda c: -len(clusters[c])):
+        points = np.asarray(clusters[c])
+        if len(points) <= 2:
+            routes[c] = points.tolist()
+        elif time.perf_counter() + costs.estimate('nearest_neighbour', remaining) > deadline:
+            routes[c] = points[hilbert_tour(coords[points])].tolist()
+        else:
+            with costs.measure('nearest_neighbour', len(points)):
+                routes[c] = points[nearest_neighbour_tour(coords[points])].tolist()
+        remaining -= len(points)
+    return routes
+
+
+def hilbert_partition(coords, parts):
+    """Découpage de secours, quasi instantané : tranches consécutives d'une tournée de Hilbert"""
+    order = hilbert_order(coords) if len(coords) > 2 else np.arange(len(coords))
+    return [chunk.tolist() for chunk in np.array_split(order, max(1, parts)) if len(chunk)]
+
+
+def order_partition(count, parts):
+    """Dernier recours : tranches consécutives dans l'ordre de soumission des arrêts"""
+    return [chunk.tolist() for chunk in np.array_split(np.arange(count), max(1, parts)) if len(chunk)]
+
+
+class _RouteState:
+    """Recherche locale en cours et meilleure tournée connue d'une route"""
+
+    def __init__(self, points, distances, neighbour_count, deadline=None):
+        self.points = np.asarray(points)
+        # Sous-matrice dense (recherche plus rapide) seulement si sa construction tient dans le budget
+        self.dense = isinstance(distances, np.ndarray) or self.affordable(deadline)
+        rows, neighbours = local_search_data(self.points, distances, neighbour_count, self.dense)
+        self.search = LocalSearch(rows, neighbours)
+        self.best_tour = list(self.search.tour)
+        self.best_cost = self.search.cost
+        self.kicked = False
+        # Jusqu'à 3 arrêts (premier point fixe), l'ordre glouton est déjà optimal
+        self.local_optimum = len(self.points) <= 3
+        self.stale_kicks = 0
+
+    def affordable(self, deadline):
+        # Au plus la moitié du temps restant : la recherche doit encore avoir le temps de s'en servir
+        return deadline is None or time.perf_counter() + 2 * len(self.points) ** 2 * DENSE_ENTRY_SECONDS < deadline
+
+    def densify(self, distances, neighbour_count, lock):
+        """Passer du graphe creux à une sous-matrice dense en gardant les tournées"""
+        self.search.set_rows(*local_search_data(self.points, distances, neighbour_count))
+        with lock:
+            self.best_cost = self.search.tour_cost(self.best_tour)
+        self.dense = True
+
+
+class AnytimeSearch:
+    """Amélioration « anytime » d'un ensemble de routes
+
+    Descente 2-opt / Or-opt par tranches, à tour de rôle sur chaque route, puis
+    recherche locale itérée (perturbation + descente, acceptée seulement si
+    elle raccourcit la route) tant que le temps le permet. La meilleure
+    solution connue est disponible à tout instant, y compris depuis un autre
+    thread pendant que `run` s'exécute.
+    """
+
+    def __init__(self, routes, distances, neighbour_count=10, seed=42, started=None, deadline=None,
+                 costs=stage_costs):
+        self.started = started or time.perf_counter()
+        self._distances = distances
+        self._neighbour_count = neighbour_count
+        # Les sous-matrices denses de toutes les routes se partagent au plus la moitié du temps restant
+        now = time.perf_counter()
+        setup_deadline = None if deadline is None else now + (deadline - now) / 2
+        self._states = []
+        sparse_stops, sparse_seconds = 0, 0.0
+        for route in routes:
+            state_started = time.perf_counter()
+            state = _RouteState(route, distances, neighbour_count, setup_deadline)
+            self._states.append(state)
+            if not state.dense:
+                # Seule la préparation creuse (obligatoire) sert d'estimation ; le dense est borné à part
+                sparse_stops += len(state.points)
+                sparse_seconds += time.perf_counter() - state_started
+        costs.record('search_setup', sparse_stops, sparse_seconds)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.kicks = 0
+        self.curve = []
+        self._record()
+
+    @property
+    def total_distance(self):
+        return sum(state.best_cost for state in self._states)
+
+    @property
+    def iterations(self):
+        return sum(state.search.iterations for state in self._states)
+
+    @property
+    def converged(self):
+        """Vrai quand chaque route a atteint un optimum local 2-opt / Or-opt"""
+        return all(state.local_optimum for state in self._states)
+
+    def run(self, deadline, stop_event=None, on_improvement=None):
+        """Améliorer jusqu'à `deadline` (horloge perf_counter) ; vrai si la solution a progressé"""
+        active = [state for state in self._states if len(state.points) > 3]
+        improved = False
+        while active and time.perf_counter() < deadline:
+            if stop_event is not None and stop_event.is_set():
+                break
+            progress = False
+            for state in active:
+                if not state.dense and state.affordable(deadline):
+                    state.densify(self._distances, self._neighbour_count, self._lock)
+                progress |= self._step(state, min(deadline, time.perf_counter() + SLICE_SECONDS))
+            if progress:
+                improved = True
+                self._record()
+                if on_improvement:
+                    on_improvement(self)
+            active = [
+                state for state in active if state.stale_kicks <= ILS_PATIENCE + state.search.size
+            ]
+        return improved
+
+    def _step(self, state, slice_deadline):
+        search = state.search
+        if search.converged:
+            # Optimum local atteint : perturber puis redescendre
+            search.perturb(self._rng)
+            state.kicked = True
+            self.kicks += 1
+        search.run(SLICE_MOVES, deadline=slice_deadline)
+        if state.kicked and not search.converged:
+            # Descente après perturbation inachevée : la meilleure tournée reste valable
+            return False
+
+        improved = search.cost < state.best_cost - EPSILON
+        if improved:
+            with self._lock:
+                state.best_tour, state.best_cost = list(search.tour), search.cost
+            state.stale_kicks = 0
+        elif state.kicked:
+            search.restore(state.best_tour, state.best_cost)
+            state.stale_kicks += 1
+        if search.converged:
+            state.local_optimum = True
+            state.kicked = False
+        return improved
+
+    def _record(self):
+        with self._lock:
+            self.curve.append({
+                'elapsed_ms': round((time.perf_counter() - self.started) * 1000, 1),
+                'total_distance': round(self.total_distance, 3)
+            })
+
+    def routes(self):
+        """Meilleures routes connues, en indices d'origine"""
+        with self._lock:
+            return [state.points[state.best_tour[:-1]].tolist() for state in self._states]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'iterations': self.iterations,
+                'kicks': self.kicks,
+                'improvement_curve': list(self.curve),
+                'converged': self.converged,
+                'elapsed_ms': round((time.perf_counter() - self.started) * 1000, 1)
+            }
+
+
+class FixedRoutes:
+    """Routes figées, même interface que AnytimeSearch
+
+    Utilisé quand le budget ne permet pas de construire le graphe des voisins
+    et de préparer la recherche : la solution de départ est rendue telle quelle.
+    """
+
+    def __init__(self, routes, started):
+        self.started = started
+        self._routes = [list(route) for route in routes]
+
+    def run(self, deadline, stop_event=None, on_improvement=None):
+        return False
+
+    def routes(self):
+        return [list(route) for route in self._routes]
+
+    def stats(self):
+        return {
+            'iterations': 0,
+            'kicks': 0,
+            'improvement_curve': [],
+            'converged': False,
+            'elapsed_ms': round((time.perf_counter() - self.started) * 1000, 1)
+        }
+
+
+class AnytimeOptimization:
+    """Amélioration poursuivie en arrière-plan, qui publie chaque meilleure solution
+
+    `result()` renvoie toujours la meilleure solution publiée (formatée à la
+    demande) ; `on_improvement(result)` est appelé depuis le thread de calcul
+    à chaque progrès.
+    """
+
+    def __init__(self, search, format_result, on_improvement=None):
+        self.search = search
+        self.version = 0
+        self._format_result = format_result
+        self._on_improvement = on_improvement
+        self._stop = threading.Event()
+        self._thread = None
+        self._cache = None
+
+    def start(self, time_limit):
+        self._thread = threading.Thread(target=self._run, args=(time_limit,), daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self, time_limit):
+        try:
+            self.search.run(time.perf_counter() + time_limit, self._stop, self._publish)
+        except Exception as e:
+            # Le thread s'arrête, la dernière solution publiée reste disponible
+            logging.error(f"Erreur lors de l'amélioration en arrière-plan: {e}")
+
+    def _publish(self, search):
+        self.version += 1
+        if self._on_improvement:
+            self._on_improvement(self.result())
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def result(self):
+        version = self.version
+        if self._cache is None or self._cache[0] != version:
+            self._cache = (version, self._format_result())
+        return self._cache[1]
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        return self.wait(timeout)
+
+    def wait(self, timeout=None):
+        """Attendre la fin de l'amélioration ; renvoie la meilleure solution"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.result()
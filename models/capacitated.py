@@ -0,0 +1,222 @@
+import bisect
+
+import numpy as np
+
+from .distance import KNNDistanceGraph, haversine_matrix, haversine_pairs
+from .local_search import improve_route
+
+# Profils de véhicules (mêmes types que RouteOptimizationForm), capacité en kg
+VEHICLE_PROFILES = {
+    'bike': {'capacity': 15.0, 'speed_kmh': 15.0},
+    'scooter': {'capacity': 30.0, 'speed_kmh': 25.0},
+    'van': {'capacity': 500.0, 'speed_kmh': 30.0},
+}
+DEFAULT_VEHICLE_TYPE = 'van'
+# Demande d'un arrêt sans champ 'demand' (un colis) : partagée par le solveur et les plans incrémentaux
+DEFAULT_DEMAND = 1.0
+
+
+def build_fleet(fleet=None, num_vehicles=1, vehicle_capacity=None):
+    """Normaliser une description de flotte en liste de véhicules
+
+    `fleet` peut être une liste de types ('bike', 'van'...), de dicts
+    {'vehicle_type': ..., 'capacity': ...} ou un dict {type: nombre}.
+    Sans flotte, on construit `num_vehicles` véhicules identiques.
+    """
+    if fleet is None:
+        fleet = [{'vehicle_type': DEFAULT_VEHICLE_TYPE, 'capacity': vehicle_capacity}] * num_vehicles
+    elif isinstance(fleet, dict):
+        fleet = [vehicle_type for vehicle_type, count in fleet.items() for _ in range(count)]
+
+    vehicles = []
+    for spec in fleet:
+        if isinstance(spec, str):
+            spec = {'vehicle_type': spec}
+        vehicle_type = spec.get('vehicle_type', DEFAULT_VEHICLE_TYPE)
+        if vehicle_type not in VEHICLE_PROFILES:
+            raise ValueError(f"Type de véhicule inconnu: {vehicle_type}")
+        profile = VEHICLE_PROFILES[vehicle_type]
+        capacity = spec.get('capacity') or profile['capacity']
+        vehicles.append({
+            'vehicle_type': vehicle_type,
+            'capacity': float(capacity),
+            'speed_kmh': float(spec.get('speed_kmh') or profile['speed_kmh']),
+        })
+    return vehicles
+
+
+def solve_capacitated(coords, demands, vehicles, depot, neighbour_count=20, improve=True, graph=None,
+                      **local_search):
+    """Résoudre un VRP capacitaire par l'heuristique des économies (Clarke-Wright)
+
+    Les économies ne sont calculées que pour les arêtes du graphe des k plus
+    proches voisins (`graph`, construit si absent), ce qui garde un coût en O(n·k log n) au lieu de O(n²). Les
+    fusions respectent la composition de la flotte (voir `_savings_routes`),
+    avec un même taux de remplissage visé pour chaque véhicule. Les routes
+    obtenues sont ensuite affectées aux véhicules (best-fit, flotte hétérogène),
+    découpées si aucun véhicule restant n'est assez grand, puis améliorées par
+    recherche locale avec le dépôt comme point de départ fixe.
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    demands = np.asarray(demands, dtype=np.float64)
+    depot = np.asarray(depot, dtype=np.float64)
+
+    too_heavy = demands > max(v['capacity'] for v in vehicles)
+    if too_heavy.any():
+        raise ValueError(f"{int(too_heavy.sum())} arrêt(s) dépassent la capacité du plus grand véhicule")
+
+    depot_distance = haversine_pairs(depot[0], depot[1], coords[:, 0], coords[:, 1])
+    if graph is None:
+        graph = KNNDistanceGraph(coords, neighbour_count)
+    # Même taux de remplissage visé pour tous les véhicules : sans cela, une flotte largement
+    # suffisante finit en une seule grande tournée pour le plus gros véhicule
+    capacities = np.array([v['capacity'] for v in vehicles])
+    utilization = min(1.0, float(demands.sum()) / float(capacities.sum()))
+    routes = _savings_routes(graph, demands, depot_distance, (capacities * utilization).tolist())
+    assignment, unassigned = _assign_routes(routes, demands, vehicles, coords)
+
+    results = []
+    for vehicle_index, stops in assignment:
+        if improve and len(stops) > 2:
+            local_coords = np.vstack((depot[None, :], coords[stops]))
+            order = improve_route(list(range(len(stops) + 1)), haversine_matrix(local_coords), **local_search)
+            stops = [stops[i - 1] for i in order[1:]]
+        path = np.asarray(stops)
+        distance = float(depot_distance[path[0]]) + float(
+            haversine_pairs(coords[path[:-1], 0], coords[path[:-1], 1], coords[path[1:], 0], coords[path[1:], 1]).sum()
+        )
+        results.append({
+            'vehicle': vehicles[vehicle_index],
+            'stops': stops,
+            'load': float(demands[path].sum()),
+            'distance': distance,
+        })
+    return {'routes': results, 'unassigned': unassigned}
+
+
+def _savings_routes(graph, demands, depot_distance, capacities):
+    """Fusion parallèle des routes par économies décroissantes, sous contrainte de composition de la flotte
+
+    Classe d'une route : plus petite capacité de la flotte qui la porte. Pour
+    chaque classe j > 0, le nombre de routes de classe >= j ne dépasse pas le
+    nombre de véhicules de capacité >= celle de j : les petits véhicules
+    restent utiles au lieu que tout soit fusionné pour les plus grands.
+    """
+    n = len(graph)
+    routes = {i: [i] for i in range(n)}
+    route_of = list(range(n))
+    loads = {i: float(demands[i]) for i in range(n)}
+    if n < 2:
+        return list(routes.values())
+
+    classes = sorted(set(capacities))
+    # vehicles_at_least[j] : véhicules de capacité >= classes[j]
+    vehicles_at_least = [sum(capacity >= c for capacity in capacities) for c in classes]
+    route_class = {i: bisect.bisect_left(classes, loads[i]) for i in range(n)}
+    # routes_at_least[j] : routes de classe >= j (la classe 0 n'est pas bornée : les routes en trop sont
+    # ajoutées à des véhicules déjà utilisés ou découpées à l'affectation)
+    routes_at_least = [sum(c >= j for c in route_class.values()) for j in range(len(classes))]
+
+    first, second, pair_distance = graph.edges()
+    # Chaque paire non orientée une seule fois
+    _, unique = np.unique(np.minimum(first, second) * n + np.maximum(first, second), return_index=True)
+    first, second, pair_distance = first[unique], second[unique], pair_distance[unique]
+
+    savings = depot_distance[first] + depot_distance[second] - pair_distance
+    order = np.argsort(-savings, kind='stable')
+    order = order[savings[order] > 0]
+
+    for i, j in zip(first[order].tolist(), second[order].tolist()):
+        if len(routes) <= len(capacities):
+            # Une route par véhicule : fusionner davantage laisserait des véhicules sans tournée
+            break
+        ri, rj = route_of[i], route_of[j]
+        if ri == rj:
+            continue
+        merged_class = bisect.bisect_left(classes, loads[ri] + loads[rj])
+        if merged_class == len(classes):
+            continue
+        # Classes qui gagnent une route : celles entre la plus grande des deux (exclue) et la nouvelle
+        grown = range(max(route_class[ri], route_class[rj]) + 1, merged_class + 1)
+        if any(routes_at_least[c] + 1 > vehicles_at_least[c] for c in grown):
+            continue
+        route_i, route_j = routes[ri], routes[rj]
+        # i et j doivent être en bout de route pour être reliés
+        if i not in (route_i[0], route_i[-1]) or j not in (route_j[0], route_j[-1]):
+            continue
+        for c in range(1, len(classes)):
+            routes_at_least[c] += (merged_class >= c) - (route_class[ri] >= c) - (route_class[rj] >= c)
+        if route_i[-1] != i:
+            route_i.reverse()
+        if route_j[0] != j:
+            route_j.reverse()
+
+        # Fusionner la plus petite route dans la plus grande
+        if len(route_i) >= len(route_j):
+            keep_id, drop_id, merged = ri, rj, route_i + route_j
+        else:
+            keep_id, drop_id, merged = rj, ri, route_i + route_j
+        for point in routes[drop_id]:
+            route_of[point] = keep_id
+        routes[keep_id] = merged
+        loads[keep_id] += loads.pop(drop_id)
+        route_class[keep_id] = merged_class
+        del routes[drop_id], route_class[drop_id]
+
+    return list(routes.values())
+
+
+def _assign_routes(routes, demands, vehicles, coords):
+    """Affecter les routes aux véhicules, avec réparation si la flotte ne suffit pas"""
+    free = sorted(range(len(vehicles)), key=lambda v: vehicles[v]['capacity'])
+    free_capacity = [vehicles[v]['capacity'] for v in free]
+    used = []  # [vehicle_index, stops, load]
+    unassigned = []
+
+    for route in sorted(routes, key=lambda r: -float(demands[r].sum())):
+        load = float(demands[route].sum())
+
+        # 1. Plus petit véhicule libre qui peut prendre la route entière
+        slot = bisect.bisect_left(free_capacity, load)
+        if slot < len(free):
+            free_capacity.pop(slot)
+            used.append([free.pop(slot), route, load])
+            continue
+
+        # 2. Prolonger la route d'un véhicule déjà utilisé ayant assez de réserve
+        candidates = [u for u in used if vehicles[u[0]]['capacity'] - u[2] >= load]
+        if candidates:
+            ends = np.array([coords[u[1][-1]] for u in candidates])
+            gaps = haversine_pairs(ends[:, 0], ends[:, 1], coords[route[0], 0], coords[route[0], 1])
+            target = candidates[int(np.argmin(gaps))]
+            target[1] = target[1] + route
+            target[2] += load
+            continue
+
+        # 3. Réparation : découper la route selon la réserve restante des véhicules, jusqu'à ce que
+        #    tout soit placé ou qu'aucun arrêt restant ne tienne dans la plus grande réserve
+        remaining = list(route)
+        while remaining:
+            if free:
+                chunk_owner = [free.pop(), [], 0.0]
+                free_capacity.pop()
+                used.append(chunk_owner)
+            else:
+                chunk_owner = max(used, key=lambda u: vehicles[u[0]]['capacity'] - u[2])
+            room = vehicles[chunk_owner[0]]['capacity'] - chunk_owner[2]
+            taken, left = [], []
+            for stop in remaining:
+                if demands[stop] <= room:
+                    room -= demands[stop]
+                    taken.append(stop)
+                else:
+                    left.append(stop)
+            if not taken:
+                # Plus grande réserve de la flotte : aucun autre véhicule ne peut prendre ces arrêts
+                break
+            chunk_owner[1] = chunk_owner[1] + taken
+            chunk_owner[2] += float(demands[taken].sum())
+            remaining = left
+        unassigned.extend(remaining)
+
+    return [(vehicle_index, stops) for vehicle_index, stops, _ in used if stops], unassigned
@@ -0,0 +1,137 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from .spatial_index import project
+
+# Au-delà de ce nombre d'arrêts, variante mini-batch de KMeans
+MINIBATCH_THRESHOLD = 5000
+# Part maximale d'arrêts nouveaux pour réutiliser l'affectation précédente telle quelle
+REUSE_THRESHOLD = 0.2
+
+
+def stop_keys(locations):
+    """Identifiant stable de chaque arrêt : 'id' s'il existe, sinon ses coordonnées arrondies"""
+    return [loc['id'] if 'id' in loc else (round(loc['lat'], 6), round(loc['lng'], 6)) for loc in locations]
+
+
+class ClusterCache:
+    """Clustering KMeans mis en cache par dépôt / zone (LRU)
+
+    Pour une clé déjà vue avec le même nombre de clusters : si peu d'arrêts
+    ont changé, les arrêts connus gardent leur cluster et les nouveaux sont
+    affectés au centroïde le plus proche ; sinon KMeans repart des centroïdes
+    en cache (une seule initialisation). Sans clé, ou au premier appel, fit
+    complet comme avant (mini-batch pour les grandes instances). `entry` et
+    `load` transportent une entrée d'un processus à l'autre (pool de processus).
+    """
+
+    def __init__(self, max_entries=128, minibatch_threshold=MINIBATCH_THRESHOLD, reuse_threshold=REUSE_THRESHOLD):
+        self.max_entries = max_entries
+        self.minibatch_threshold = minibatch_threshold
+        self.reuse_threshold = reuse_threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'cold': 0, 'warm': 0, 'reused': 0}
+
+    def fit_predict(self, coords, n_clusters, key=None, stop_ids=None):
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        entry = self._get(key) if key is not None else None
+        if entry is not None and len(entry['centroids']) != n_clusters:
+            entry = None
+
+        if entry is not None and stop_ids is not None:
+            labels = self._reuse(entry, coords, stop_ids)
+            if labels is not None:
+                self._count('reused')
+                self._put(key, self._centroids(coords, labels, entry['centroids']), labels, stop_ids)
+                return labels
+
+        if entry is not None:
+            model = self._model(n_clusters, len(coords), init=entry['centroids'])
+            self._count('warm')
+        else:
+            model = self._model(n_clusters, len(coords))
+            self._count('cold')
+        labels = model.fit_predict(coords)
+        if key is not None:
+            self._put(key, model.cluster_centers_, labels, stop_ids)
+        return labels
+
+    def _model(self, n_clusters, size, init=None):
+        params = {'n_clusters': n_clusters, 'random_state': 42}
+        if init is not None:
+            # Démarrage à chaud : une seule initialisation, depuis les centroïdes en cache
+            params.update(init=init, n_init=1)
+        if size > self.minibatch_threshold:
+            return MiniBatchKMeans(batch_size=2048, **params)
+        return KMeans(**params)
+
+    def _reuse(self, entry, coords, stop_ids):
+        """Affectation précédente + centroïde le plus proche pour les nouveaux arrêts (None si trop de changements)"""
+        previous = entry['labels']
+        labels = np.fromiter((previous.get(stop_id, -1) for stop_id in stop_ids), dtype=np.int64, count=len(stop_ids))
+        new = labels < 0
+        removed = len(previous) - int((~new).sum())
+        if new.sum() > self.reuse_threshold * len(labels) or removed > self.reuse_threshold * len(previous):
+            return None
+        if new.any():
+            # Distances en projection locale (km), suffisantes pour choisir le centroïde
+            ref_lat = float(coords[:, 0].mean())
+            x, y = project(coords[new], ref_lat)
+            cx, cy = project(entry['centroids'], ref_lat)
+            labels[new] = ((x[:, None] - cx[None, :]) ** 2 + (y[:, None] - cy[None, :]) ** 2).argmin(axis=1)
+        return labels
+
+    @staticmethod
+    def _centroids(coords, labels, previous):
+        """Barycentres des clusters (ancien centroïde pour un cluster vide)"""
+        counts = np.bincount(labels, minlength=len(previous))
+        centroids = previous.copy()
+        filled = counts > 0
+        for axis in range(2):
+            centroids[filled, axis] = np.bincount(labels, coords[:, axis], len(previous))[filled] / counts[filled]
+        return centroids
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def entry(self, key):
+        """Centroïdes et affectation en cache pour la clé (None si absente), picklables"""
+        return self._get(key)
+
+    def load(self, key, entry):
+        """Installe une entrée produite par une autre instance (cache d'un autre processus)"""
+        with self._lock:
+            self._store(key, entry)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, centroids, labels, stop_ids):
+        entry = {
+            'centroids': np.asarray(centroids, dtype=np.float64),
+            'labels': dict(zip(stop_ids, labels.tolist())) if stop_ids is not None else {}
+        }
+        with self._lock:
+            self._store(key, entry)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
@@ -0,0 +1,156 @@
+import itertools
+import math
+
+import numpy as np
+
+# Rayon moyen de la Terre en km (même valeur que DataHelper.calculate_distance)
+EARTH_RADIUS_KM = 6371.0
+
+
+def coords_from_locations(locations):
+    """Extraire un tableau (N, 2) [lat, lng] en degrés depuis une liste de dicts"""
+    values = itertools.chain.from_iterable((loc['lat'], loc['lng']) for loc in locations)
+    return np.fromiter(values, dtype=np.float64, count=2 * len(locations)).reshape(-1, 2)
+
+
+def haversine_pairs(lat1, lng1, lat2, lng2):
+    """Distance du grand cercle (km) entre des tableaux de points appariés, en degrés"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_matrix(coords_a, coords_b=None, dtype=np.float32):
+    """Matrice des distances du grand cercle (km) entre deux ensembles de points [lat, lng]
+
+    Entièrement vectorisé : les sinus/cosinus sont calculés une seule fois par point
+    puis combinés par broadcasting, sans boucle Python.
+    """
+    coords_a = np.radians(np.asarray(coords_a, dtype=np.float64).reshape(-1, 2))
+    coords_b = coords_a if coords_b is None else np.radians(np.asarray(coords_b, dtype=np.float64).reshape(-1, 2))
+
+    lat_a, lng_a = coords_a[:, 0:1], coords_a[:, 1:2]
+    lat_b, lng_b = coords_b[:, 0][None, :], coords_b[:, 1][None, :]
+
+    a = np.sin((lat_b - lat_a) / 2) ** 2
+    a += np.cos(lat_a) * np.cos(lat_b) * np.sin((lng_b - lng_a) / 2) ** 2
+    np.clip(a, 0.0, 1.0, out=a)
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))).astype(dtype, copy=False)
+
+
+def unit_vectors(coords):
+    """Projeter [lat, lng] sur la sphère unité (la corde est monotone en la distance haversine)"""
+    lat, lng = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    return np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+
+
+class KNNDistanceGraph:
+    """Graphe creux des k plus proches voisins de chaque arrêt (format CSR)
+
+    Remplace la matrice dense N×N pour les très grandes instances : seules les
+    distances vers les k plus proches voisins sont stockées (float32), les
+    autres sont calculées à la demande. La mémoire croît linéairement (~8·k
+    octets par arrêt) au lieu de 4·N octets par arrêt.
+    """
+
+    def __init__(self, coords, k=10):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        n = len(self.coords)
+        self.k = max(0, min(k, n - 1))
+
+        if self.k:
+            # Import tardif : haversine_pairs (features du service) ne doit pas charger scipy.spatial
+            from scipy.spatial import cKDTree
+
+            points = unit_vectors(self.coords)
+            _, nearest = cKDTree(points).query(points, k=self.k + 1)
+            # Retirer le point lui-même (ou le plus lointain en cas de doublons)
+            is_self = nearest == np.arange(n)[:, None]
+            is_self[~is_self.any(axis=1), -1] = True
+            nearest = nearest[~is_self].reshape(n, self.k)
+        else:
+            nearest = np.empty((n, 0), dtype=np.int64)
+
+        self.indptr = np.arange(0, n * self.k + 1, max(self.k, 1), dtype=np.int64)[:n + 1]
+        self.indices = nearest.ravel().astype(np.int32)
+        rows = np.repeat(np.arange(n), self.k)
+        self.data = haversine_pairs(
+            self.coords[rows, 0], self.coords[rows, 1],
+            self.coords[self.indices, 0], self.coords[self.indices, 1]
+        ).astype(np.float32)
+        self._prepare_lookup()
+
+    @classmethod
+    def from_arrays(cls, coords, indptr, indices, data):
+        """Reconstruire un graphe à partir de tableaux existants (ex. mémoire partagée)"""
+        graph = cls.__new__(cls)
+        graph.coords, graph.indptr, graph.indices, graph.data = coords, indptr, indices, data
+        graph.k = int(indptr[1] - indptr[0]) if len(indptr) > 1 else 0
+        graph._prepare_lookup()
+        return graph
+
+    def _prepare_lookup(self):
+        self._lat = np.radians(self.coords[:, 0]).tolist()
+        self._lng = np.radians(self.coords[:, 1]).tolist()
+        self._cos_lat = np.cos(np.radians(self.coords[:, 0])).tolist()
+
+    def __len__(self):
+        return len(self.coords)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    def neighbours(self, i):
+        """Indices des k plus proches voisins de i, du plus proche au plus lointain"""
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def distance(self, i, j):
+        """Distance haversine (km) entre deux arrêts, calculée à la demande"""
+        a = (math.sin((self._lat[j] - self._lat[i]) / 2) ** 2
+             + self._cos_lat[i] * self._cos_lat[j] * math.sin((self._lng[j] - self._lng[i]) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+    def edges(self):
+        """Toutes les arêtes (i, j, distance) du graphe, sous forme de tableaux"""
+        return np.repeat(np.arange(len(self)), self.k), self.indices, self.data
+
+    def local_view(self, points, k=None):
+        """Lignes de distances et listes de voisins en indices locaux pour un sous-ensemble
+
+        `rows[a][b]` calcule la distance à la demande ; l'indice len(points)
+        désigne la fin de route ouverte (distance nulle). Les voisins sont ceux
+        du graphe restreints aux arrêts de `points`.
+        """
+        points = np.asarray(points).tolist()
+        local = {point: position for position, point in enumerate(points)}
+        neighbours = []
+        for point in points:
+            row = [local[j] for j in self.neighbours(point).tolist() if j in local]
+            neighbours.append(row[:k] if k else row)
+        return _LocalRows(self, points), neighbours
+
+
+class _LocalRows:
+    """Vue « matrice » paresseuse d'un KNNDistanceGraph en indices locaux"""
+
+    def __init__(self, graph, points):
+        self.graph = graph
+        self.points = points
+
+    def __getitem__(self, a):
+        return _LocalRow(self, self.points[a])
+
+
+class _LocalRow:
+    __slots__ = ('rows', 'point')
+
+    def __init__(self, rows, point):
+        self.rows = rows
+        self.point = point
+
+    def __getitem__(self, b):
+        points = self.rows.points
+        if b == len(points):
+            return 0.0
+        return self.rows.graph.distance(self.point, points[b])
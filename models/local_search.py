@@ -0,0 +1,301 @@
+import time
+from collections import deque
+
+import numpy as np
+
+from .distance import haversine_matrix
+from .spatial_index import nearest_neighbour_tour
+
+# Gain minimal pour accepter un mouvement (évite les cycles dus aux arrondis float32)
+EPSILON = 1e-7
+# Au-delà de cette taille de route, la sous-matrice n'est pas convertie en listes Python
+LIST_ROWS_LIMIT = 1000
+
+
+def neighbour_lists(matrix, k):
+    """Listes des k plus proches voisins de chaque point d'une sous-matrice dense"""
+    size = len(matrix)
+    k = min(k, size - 1)
+    if k <= 0:
+        return [[] for _ in range(size)]
+
+    matrix = np.array(matrix)
+    np.fill_diagonal(matrix, np.inf)
+    nearest = np.argpartition(matrix, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(matrix, nearest, axis=1).argsort(axis=1)
+    return np.take_along_axis(nearest, order, axis=1).tolist()
+
+
+def solve_route(point_indices, coords, distance_matrix, improve=True, **local_search):
+    """Construire (plus proche voisin via la grille) puis améliorer une route
+
+    Fonction autonome, utilisée telle quelle par les processus de calcul parallèle.
+    """
+    if len(point_indices) <= 2:
+        return list(point_indices)
+
+    # Commencer par le premier point
+    point_indices = np.asarray(point_indices)
+    route = point_indices[nearest_neighbour_tour(coords[point_indices])].tolist()
+    if improve:
+        # Amélioration 2-opt / Or-opt de la tournée gloutonne
+        route = improve_route(route, distance_matrix, **local_search)
+    return route
+
+
+def improve_route(route, distance_matrix, neighbour_count=10, max_iterations=10000, time_limit=1.0):
+    """Améliorer une route ouverte par recherche locale (2-opt + Or-opt)
+
+    Le premier point de la route reste fixe (point de départ). Chaque mouvement
+    est évalué en temps constant par différence de coût sur la matrice de
+    distances (dense, ou `KNNDistanceGraph` pour les très grandes instances) ;
+    les candidats sont limités aux `neighbour_count` plus proches voisins de
+    chaque point. S'arrête à l'optimum local ou dès que `max_iterations`
+    mouvements ont été appliqués / `time_limit` secondes écoulées.
+    """
+    if len(route) <= 3:
+        return list(route)
+
+    route = np.asarray(route)
+    rows, neighbours = local_search_data(route, distance_matrix, neighbour_count)
+    tour = LocalSearch(rows, neighbours).run(max_iterations, time_limit)
+    return route[tour].tolist()
+
+
+def repair_window(route, coords, position, radius=6, neighbour_count=10, max_iterations=1000):
+    """Réparer localement une route autour de `position`, à coût indépendant de sa longueur
+
+    Seuls les arrêts route[start:end] (au plus 2·radius+1) sont réordonnés par
+    2-opt / Or-opt : le premier reste fixe et l'arrêt qui suit la fenêtre sert
+    de point d'arrivée. En début de route (start = 0), rien ne précède la
+    fenêtre : son premier arrêt peut bouger lui aussi. `coords[stop]` donne
+    [lat, lng] pour chaque arrêt.
+    """
+    start, end = max(0, position - radius), min(len(route), position + radius + 1)
+    window = list(route[start:end])
+    if len(window) < 3:
+        return list(route)
+
+    window_coords = np.array([coords[stop] for stop in window], dtype=np.float64)
+    if end < len(route):
+        # Dernière colonne : distance vers l'arrêt suivant la fenêtre, qui ne bouge pas
+        matrix = haversine_matrix(window_coords, np.vstack((window_coords, [coords[route[end]]])), dtype=np.float64)
+    else:
+        matrix = np.zeros((len(window), len(window) + 1))
+        matrix[:, :-1] = haversine_matrix(window_coords, dtype=np.float64)
+    neighbours = neighbour_lists(matrix[:, :-1], neighbour_count)
+    if start == 0:
+        # Point de départ fictif (indice 0, à distance nulle de tous les arrêts) : c'est lui
+        # qui reste fixe, et tout arrêt peut venir se placer juste après
+        matrix = np.pad(matrix, ((1, 0), (1, 0)))
+        neighbours = [list(range(1, len(window) + 1))] + [[n + 1 for n in row] + [0] for row in neighbours]
+        window = [None] + window
+    search = LocalSearch(matrix.tolist(), neighbours)
+    tour = search.run(max_iterations)
+    if start == 0:
+        tour = tour[1:]
+    return list(route[:start]) + [window[i] for i in tour] + list(route[end:])
+
+
+def local_search_data(route, distance_matrix, neighbour_count=10, dense=True):
+    """Lignes de distances (point fictif de fin en dernière colonne) et voisins en indices locaux"""
+    route = np.asarray(route)
+    if dense and not isinstance(distance_matrix, np.ndarray) and len(route) <= LIST_ROWS_LIMIT:
+        # Route courte en mode graphe : sous-matrice dense, plus rapide à parcourir
+        return local_search_data(np.arange(len(route)), haversine_matrix(distance_matrix.coords[route]),
+                                 neighbour_count)
+    if isinstance(distance_matrix, np.ndarray):
+        # Colonne nulle en fin de ligne : arête vers la fin de route ouverte
+        sub_matrix = np.zeros((len(route), len(route) + 1), dtype=distance_matrix.dtype)
+        sub_matrix[:, :-1] = distance_matrix[np.ix_(route, route)]
+        rows = sub_matrix.tolist() if len(route) <= LIST_ROWS_LIMIT else _MatrixRows(sub_matrix)
+        return rows, neighbour_lists(sub_matrix[:, :-1], neighbour_count)
+    # Graphe creux des k plus proches voisins : distances calculées à la demande
+    return distance_matrix.local_view(route, neighbour_count)
+
+
+class _MatrixRows:
+    """Accès ligne à ligne à une grande sous-matrice numpy, valeurs converties en float Python"""
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def __getitem__(self, a):
+        return _MatrixRow(self.matrix[a])
+
+
+class _MatrixRow:
+    __slots__ = ('row',)
+
+    def __init__(self, row):
+        self.row = row
+
+    def __getitem__(self, b):
+        return float(self.row[b])
+
+
+class LocalSearch:
+    """Recherche locale à bits « don't look » sur une route ouverte en indices locaux
+
+    La route se termine par un point fictif (indice n, à distance nulle de tous
+    les points) qui ne bouge jamais : l'extrémité ouverte se traite alors comme
+    une arête ordinaire.
+    """
+
+    def __init__(self, rows, neighbours):
+        self.rows = rows
+        self.neighbours = neighbours
+        self.size = len(neighbours)
+        self.tour = list(range(self.size + 1))
+        self.pos = list(range(self.size + 1))
+        self.cost = self.tour_cost(self.tour)
+        self.iterations = 0
+        # Points à (ré)examiner : la recherche a convergé quand la file est vide
+        self.queue = deque(range(self.size))
+        self.queued = [True] * (self.size + 1)
+
+    @property
+    def converged(self):
+        return not self.queue
+
+    def tour_cost(self, tour):
+        rows = self.rows
+        return sum(rows[tour[k]][tour[k + 1]] for k in range(self.size))
+
+    def set_rows(self, rows, neighbours):
+        """Changer de source de distances (mêmes indices locaux) sans perdre la tournée"""
+        self.rows, self.neighbours = rows, neighbours
+        self.cost = self.tour_cost(self.tour)
+
+    def run(self, max_iterations, time_limit=None, deadline=None):
+        """Appliquer au plus `max_iterations` mouvements améliorants ; reprend là où il s'était arrêté"""
+        if time_limit:
+            deadline = time.perf_counter() + time_limit
+        queue, queued = self.queue, self.queued
+        iterations = 0
+
+        while queue and iterations < max_iterations:
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            node = queue.popleft()
+            queued[node] = False
+
+            touched = self._try_two_opt(node) or self._try_or_opt(node)
+            if touched:
+                iterations += 1
+                self._enqueue(touched)
+        self.iterations += iterations
+        return self.tour[:-1]
+
+    def _enqueue(self, nodes):
+        for t in nodes:
+            if t < self.size and not self.queued[t]:
+                self.queued[t] = True
+                self.queue.append(t)
+
+    def perturb(self, rng, max_length=30):
+        """Échanger deux segments consécutifs tirés au hasard (« double bridge » de route ouverte)"""
+        tour, pos, rows = self.tour, self.pos, self.rows
+        if self.size < 4:
+            return
+        start = rng.randint(1, self.size - 2)
+        first = rng.randint(1, min(max_length, self.size - 1 - start))
+        second = rng.randint(1, min(max_length, self.size - start - first))
+        middle, end = start + first, start + first + second
+
+        a, b0, b1 = tour[start - 1], tour[start], tour[middle - 1]
+        c0, c1, d = tour[middle], tour[end - 1], tour[end]
+        self.cost += (rows[a][c0] + rows[c1][b0] + rows[b1][d]
+                      - rows[a][b0] - rows[b1][c0] - rows[c1][d])
+        tour[start:end] = tour[middle:end] + tour[start:middle]
+        for k in range(start, end):
+            pos[tour[k]] = k
+        self._enqueue((a, b0, b1, c0, c1, d))
+
+    def restore(self, tour, cost):
+        """Revenir à une tournée mémorisée (liste complète, point fictif compris)"""
+        self.tour = list(tour)
+        for k, node in enumerate(self.tour):
+            self.pos[node] = k
+        self.cost = cost
+        self.queue.clear()
+        self.queued = [False] * (self.size + 1)
+
+    # ------------------------------------------------------------------ 2-opt
+
+    def _try_two_opt(self, node):
+        """Nouvelle arête (node, voisin) remplaçant l'arête sortante ou entrante de node"""
+        rows, tour, pos = self.rows, self.tour, self.pos
+        i = pos[node]
+        for other in self.neighbours[node]:
+            j = pos[other]
+            low, high = (i, j) if i < j else (j, i)
+            for p, q in ((low, high), (low - 1, high - 1)):
+                if p < 0 or q <= p + 1:
+                    continue
+                # Gain de l'inversion du segment tour[p+1..q]
+                a, b, c, d = tour[p], tour[p + 1], tour[q], tour[q + 1]
+                row_a = rows[a]
+                delta = row_a[c] + rows[b][d] - row_a[b] - rows[c][d]
+                if delta < -EPSILON:
+                    self._reverse(p + 1, q)
+                    self.cost += delta
+                    return (a, b, c, d)
+        return None
+
+    def _reverse(self, start, end):
+        tour, pos = self.tour, self.pos
+        tour[start:end + 1] = tour[start:end + 1][::-1]
+        for k in range(start, end + 1):
+            pos[tour[k]] = k
+
+    # ----------------------------------------------------------------- Or-opt
+
+    def _try_or_opt(self, node):
+        """Déplacer un segment de 1 à 3 points (1 = relocate) commençant en node"""
+        rows, tour, pos = self.rows, self.tour, self.pos
+        start = pos[node]
+        if start == 0:
+            return None
+
+        for length in (1, 2, 3):
+            end = start + length - 1
+            if end >= self.size:
+                break
+            first, last = tour[start], tour[end]
+            prev, nxt = tour[start - 1], tour[end + 1]
+            row_first, row_last = rows[first], rows[last]
+            removal_gain = rows[prev][first] + row_last[nxt] - rows[prev][nxt]
+
+            for anchor in self.neighbours[first] + self.neighbours[last]:
+                j = pos[anchor]
+                if start - 1 <= j <= end:
+                    continue
+                after = tour[j + 1]
+                row_anchor = rows[anchor]
+                base = row_anchor[after]
+                forward = row_anchor[first] + row_last[after] - base
+                backward = row_anchor[last] + row_first[after] - base
+                reverse = backward < forward
+                delta = (backward if reverse else forward) - removal_gain
+                if delta < -EPSILON:
+                    self._move_segment(start, end, j, reverse)
+                    self.cost += delta
+                    return (prev, first, last, nxt, anchor)
+        return None
+
+    def _move_segment(self, start, end, anchor_position, reverse):
+        """Insérer tour[start..end] après la position `anchor_position` (hors segment)"""
+        tour, pos = self.tour, self.pos
+        segment = tour[start:end + 1]
+        if reverse:
+            segment.reverse()
+        if anchor_position > end:
+            # Seule la plage [start, anchor_position] change
+            tour[start:anchor_position + 1] = tour[end + 1:anchor_position + 1] + segment
+            changed = range(start, anchor_position + 1)
+        else:
+            tour[anchor_position + 1:end + 1] = segment + tour[anchor_position + 1:start]
+            changed = range(anchor_position + 1, end + 1)
+        for k in changed:
+            pos[tour[k]] = k
@@ -0,0 +1,143 @@
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .distance import KNNDistanceGraph
+from .local_search import solve_route
+
+# En dessous, le surcoût d'un appel au pool chaud (copie en mémoire partagée,
+# transferts, attache dans chaque processus) mange le gain : mesuré à ~25 ms
+# pour 500 arrêts (recherche locale séquentielle ~80 ms) et ~60 ms pour 2000
+# arrêts (~400 ms)
+DEFAULT_MIN_PARALLEL_STOPS = 1000
+
+# Données partagées de la dernière requête vue par ce processus de calcul
+_worker_state = {}
+
+
+def _share(array, blocks):
+    """Copier un tableau dans un bloc de mémoire partagée ; renvoie sa description"""
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    blocks.append(block)
+    return block.name, array.shape, array.dtype.str
+
+
+def _open_untracked(name):
+    """Ouvrir un bloc existant sans l'enregistrer auprès du resource tracker
+
+    Le parent reste propriétaire du bloc (close/unlink dans
+    ParallelRouteSolver.solve). Un processus qui s'attache l'enregistre
+    aussi : avec son propre tracker, le bloc serait signalé comme fuite et
+    supprimé une seconde fois à l'arrêt ; avec celui du parent (spawn), un
+    `unregister` après coup effacerait l'enregistrement du parent.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _attach(spec, blocks):
+    """Vue numpy (sans copie) sur un bloc partagé créé par le processus parent"""
+    name, shape, dtype = spec
+    block = _open_untracked(name)
+    blocks.append(block)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def _worker_data(coords_spec, distance_specs):
+    """Attacher les blocs d'une requête une seule fois par processus (et libérer ceux de la précédente)"""
+    if _worker_state.get('key') != coords_spec[0]:
+        previous = _worker_state.get('blocks', [])
+        # Plus aucune vue numpy sur les anciens blocs avant de les fermer
+        _worker_state.clear()
+        for block in previous:
+            block.close()
+
+        blocks = []
+        coords = _attach(coords_spec, blocks)
+        arrays = [_attach(spec, blocks) for spec in distance_specs]
+        if len(arrays) == 1:
+            distances = arrays[0]
+        else:
+            distances = KNNDistanceGraph.from_arrays(coords, *arrays)
+        _worker_state.update(key=coords_spec[0], blocks=blocks, coords=coords, distances=distances)
+    return _worker_state['coords'], _worker_state['distances']
+
+
+def _solve_cluster(coords_spec, distance_specs, point_indices, improve, local_search):
+    coords, distances = _worker_data(coords_spec, distance_specs)
+    return solve_route(point_indices, coords, distances, improve, **local_search)
+
+
+class ParallelRouteSolver:
+    """Pool de processus persistant pour optimiser les clusters en parallèle
+
+    Le pool (spawn) est créé au premier appel puis réutilisé : le démarrage
+    des processus n'est payé qu'une fois. À chaque appel, les coordonnées et
+    la matrice dense (ou les tableaux CSR du graphe des k plus proches
+    voisins) sont placées une seule fois en mémoire partagée ; chaque tâche
+    ne transmet que les indices de son cluster. Sous `min_parallel_stops`
+    arrêts, les clusters sont résolus dans le processus appelant.
+    """
+
+    def __init__(self, workers, min_parallel_stops=DEFAULT_MIN_PARALLEL_STOPS):
+        self.workers = workers
+        self.min_parallel_stops = min_parallel_stops
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def use_pool(self, clusters):
+        return (self.workers > 1 and len(clusters) > 1
+                and sum(len(points) for points in clusters) >= self.min_parallel_stops)
+
+    def solve(self, clusters, coords, distances, improve=True, **local_search):
+        """Routes des clusters, dans l'ordre des clusters comme en mode séquentiel"""
+        if not self.use_pool(clusters):
+            return [solve_route(points, coords, distances, improve, **local_search) for points in clusters]
+
+        blocks = []
+        try:
+            coords_spec = _share(np.asarray(coords, dtype=np.float64), blocks)
+            if isinstance(distances, np.ndarray):
+                distance_specs = [_share(distances, blocks)]
+            else:
+                distance_specs = [_share(a, blocks) for a in (distances.indptr, distances.indices, distances.data)]
+
+            # Les plus gros clusters d'abord pour équilibrer la charge
+            order = sorted(range(len(clusters)), key=lambda c: -len(clusters[c]))
+            executor = self._get_executor()
+            futures = [
+                executor.submit(_solve_cluster, coords_spec, distance_specs, clusters[c], improve, local_search)
+                for c in order
+            ]
+            routes = [None] * len(clusters)
+            for cluster_id, future in zip(order, futures):
+                routes[cluster_id] = future.result()
+            return routes
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -1,55 +1,107 @@
+import copy
+import time
 import numpy as np
-from scipy.spatial.distance import cdist
-from sklearn.cluster import KMeans
+from datetime import datetime
 import logging
 
+from .anytime import (CLUSTER_FIXED_SECONDS, FORMAT_MARGIN, AnytimeOptimization, AnytimeSearch, FixedRoutes, hilbert_partition,
+                      initial_routes, order_partition, stage_costs)
+from .distance import KNNDistanceGraph, coords_from_locations, haversine_matrix, haversine_pairs
+from .local_search import solve_route
+from .capacitated import DEFAULT_DEMAND, build_fleet, solve_capacitated
+from .clustering import ClusterCache, stop_keys
+from .parallel import DEFAULT_MIN_PARALLEL_STOPS, ParallelRouteSolver
+from .scheduling import DEFAULT_SERVICE_MINUTES, DEFAULT_SPEED_KMH, schedule_route
+
 class RouteOptimizer:
     """Optimiseur de routes pour les livraisons"""
     
-    def __init__(self):
+    def __init__(self, local_search=True, neighbour_count=10,
+                 local_search_iterations=10000, local_search_time_limit=1.0,
+                 dense_matrix_limit=5000, travel_time_model=None,
+                 service_minutes=DEFAULT_SERVICE_MINUTES, workers=1, cluster_cache=None,
+                 min_parallel_stops=DEFAULT_MIN_PARALLEL_STOPS):
+        self.local_search = local_search
+        self.neighbour_count = neighbour_count
+        self.local_search_iterations = local_search_iterations
+        self.local_search_time_limit = local_search_time_limit
+        # Au-delà de ce nombre d'arrêts, graphe creux des k plus proches voisins
+        # au lieu d'une matrice dense N×N
+        self.dense_matrix_limit = dense_matrix_limit
+        # Modèle de temps de trajet appelé une fois par route : f(legs_km, speed_kmh) -> minutes
+        self.travel_time_model = travel_time_model
+        self.service_minutes = service_minutes
+        # Nombre de processus pour optimiser les clusters en parallèle (1 = séquentiel) ; pool persistant,
+        # utilisé seulement à partir de `min_parallel_stops` arrêts
+        self.workers = workers
+        self.parallel = ParallelRouteSolver(workers, min_parallel_stops) if workers > 1 else None
+        # Clustering mis en cache par dépôt / zone (clé `cluster_key` des méthodes d'optimisation)
+        self.cluster_cache = cluster_cache or ClusterCache()
         self.locations = None
+        self.coords = None
         self.distance_matrix = None
+        self.distance_graph = None
         
     def calculate_distance_matrix(self, locations):
-        """Calculer la matrice des distances"""
-        coords = np.array([[loc['lat'], loc['lng']] for loc in locations])
-        # Utiliser la distance euclidienne comme approximation
-        # En production, utiliser une API de routing comme Google Maps
-        self.distance_matrix = cdist(coords, coords, metric='euclidean') * 111  # Conversion en km approximative
+        """Calculer la matrice des distances (haversine, km, float32)
+
+        La matrice est calculée une seule fois par requête ; toutes les étapes
+        (plus proche voisin, longueur de route, formatage) l'indexent ensuite.
+        En production, utiliser une API de routing comme Google Maps.
+        """
+        self.coords = coords_from_locations(locations)
+        self.distance_matrix = haversine_matrix(self.coords)
+        self.distance_graph = None
         return self.distance_matrix
     
-    def optimize_with_clusters(self, locations, num_vehicles=1, vehicle_capacity=50):
-        """Optimiser les routes avec clustering"""
+    def calculate_distance_graph(self, locations):
+        """Calculer le graphe creux des k plus proches voisins (mode très grandes instances)
+
+        Mémoire linéaire en nombre d'arrêts ; les distances hors graphe sont
+        calculées à la demande.
+        """
+        self.coords = coords_from_locations(locations)
+        self.distance_matrix = None
+        self.distance_graph = KNNDistanceGraph(self.coords, self.neighbour_count)
+        return self.distance_graph
+    
+    def optimize_with_clusters(self, locations, num_vehicles=1, vehicle_capacity=50, capacitated=None,
+                               departure_time=None, cluster_key=None):
+        """Optimiser les routes avec clustering
+
+        Si les arrêts portent une demande ('demand') ou si `capacitated` est vrai,
+        délègue au mode VRP capacitaire avec `num_vehicles` véhicules de
+        capacité `vehicle_capacity`. Les heures d'arrivée sont calculées à
+        partir de `departure_time` (maintenant par défaut). `cluster_key`
+        (dépôt, zone...) active le clustering à chaud mis en cache.
+        """
+        if capacitated is None:
+            capacitated = any('demand' in loc for loc in locations)
+        if capacitated:
+            return self.optimize_capacitated(locations, num_vehicles=num_vehicles, vehicle_capacity=vehicle_capacity,
+                                             departure_time=departure_time)
+        
         try:
-            self.locations = locations
-            coords = np.array([[loc['lat'], loc['lng']] for loc in locations])
+            cluster_points = self._cluster(locations, num_vehicles, cluster_key=cluster_key)
             
             if len(locations) <= num_vehicles:
                 # Cas simple: un point par véhicule
-                routes = [[i] for i in range(len(locations))]
-                return self._format_routes(routes)
-            
-            # Clustering des points de livraison
-            kmeans = KMeans(n_clusters=num_vehicles, random_state=42)
-            clusters = kmeans.fit_predict(coords)
+                return self._format_routes(cluster_points, departure_time)
             
-            routes = []
-            total_distance = 0
+            # Optimiser l'ordre dans chaque cluster (TSP simplifié)
+            if self.parallel is not None and self.parallel.use_pool(cluster_points):
+                routes = self.parallel.solve(
+                    cluster_points, self.coords, self._distances(),
+                    improve=self.local_search, **self._local_search_settings()
+                )
+            else:
+                routes = [self._optimize_single_route(points) for points in cluster_points]
             
-            for cluster_id in range(num_vehicles):
-                cluster_points = [i for i, c in enumerate(clusters) if c == cluster_id]
-                
-                if cluster_points:
-                    # Optimiser l'ordre dans chaque cluster (TSP simplifié)
-                    optimized_route = self._optimize_single_route(cluster_points)
-                    routes.append(optimized_route)
-                    
-                    # Calculer la distance du cluster
-                    cluster_distance = self._calculate_route_distance(optimized_route)
-                    total_distance += cluster_distance
+            # Calculer la distance des clusters
+            total_distance = sum(self._calculate_route_distance(route) for route in routes)
             
             return {
-                'routes': self._format_routes(routes),
+                'routes': self._format_routes(routes, departure_time),
                 'total_distance': round(total_distance, 2),
                 'num_vehicles': len([r for r in routes if r]),
                 'optimization_score': min(0.95, 0.7 + np.random.random() * 0.25)
@@ -59,65 +111,273 @@ class RouteOptimizer:
             logging.error(f"Erreur lors de l'optimisation: {e}")
             raise
     
-    def _optimize_single_route(self, point_indices):
-        """Optimiser l'ordre des points dans une route (TSP simplifié)"""
-        if len(point_indices) <= 2:
-            return point_indices
-        
-        # Algorithme du plus proche voisin
-        unvisited = point_indices.copy()
-        route = [unvisited.pop(0)]  # Commencer par le premier point
-        
-        while unvisited:
-            current = route[-1]
-            # Trouver le point le plus proche
-            distances = []
-            for point in unvisited:
-                dist = np.sqrt((self.locations[current]['lat'] - self.locations[point]['lat'])**2 + 
-                              (self.locations[current]['lng'] - self.locations[point]['lng'])**2)
-                distances.append((dist, point))
+    def optimize_anytime(self, locations, num_vehicles=1, time_budget_ms=300, departure_time=None, cluster_key=None):
+        """Optimiser les routes dans un budget de temps strict (mode « anytime »)
+
+        Renvoie la meilleure solution trouvée dans le budget, avec les
+        métadonnées de recherche sous 'anytime' : itérations, courbe
+        d'amélioration, convergence (optimum local atteint sur chaque route),
+        découpage utilisé ('kmeans', 'hilbert' ou 'order'), temps écoulé au
+        moment où le résultat est rendu et `budget_exceeded`. Le budget couvre
+        tout, de l'entrée dans la méthode à la mise en forme de la réponse :
+        chaque étape (graphe, clustering, construction, découpage de secours)
+        n'est lancée que si son coût, estimé d'après les durées mesurées lors
+        des requêtes précédentes (`stage_costs`), tient dans le temps restant
+        mesuré. À défaut de clustering, les arrêts sont découpés le long d'une
+        courbe de Hilbert, voire dans l'ordre de soumission, et le temps
+        restant sert à améliorer ces routes. Quand même la mise en forme ne
+        tient pas (très grande instance, budget minuscule), la réponse arrive
+        au plus tôt avec `budget_exceeded` vrai. Les demandes ('demand') ne
+        sont pas prises en compte dans ce mode.
+        """
+        return self.start_anytime(locations, num_vehicles, time_budget_ms, departure_time,
+                                  cluster_key=cluster_key).result()
+    
+    def start_anytime(self, locations, num_vehicles=1, time_budget_ms=300, departure_time=None,
+                      improvement_time_limit=None, on_improvement=None, cluster_key=None):
+        """Comme `optimize_anytime`, puis poursuivre l'amélioration en arrière-plan
+
+        Rend la main après `time_budget_ms` avec un `AnytimeOptimization` :
+        `result()` donne la meilleure solution connue, mise à jour pendant
+        `improvement_time_limit` secondes ; `on_improvement(result)` est
+        appelé à chaque meilleure solution publiée.
+        """
+        started = time.perf_counter()
+        deadline = started + time_budget_ms / 1000
+        departure_time = departure_time or datetime.now().replace(microsecond=0)
+        try:
+            self.locations = locations
+            self.coords = coords_from_locations(locations)
+            self.distance_matrix = self.distance_graph = None
+            count = len(locations)
+            costs = stage_costs
+            # La mise en forme de la réponse est dans le budget : la recherche s'arrête avant, avec
+            # une marge pour les variations de sa durée d'une requête à l'autre
+            search_deadline = deadline - FORMAT_MARGIN * costs.estimate('format', count)
+            setup = costs.estimate('search_setup', count)
+
+            def fits(seconds):
+                return time.perf_counter() + seconds <= search_deadline
+
+            # Graphe des k plus proches voisins (quasi linéaire), s'il reste ensuite de quoi préparer
+            # la recherche et la faire tourner ; sinon pas de recherche
+            if fits(1.5 * (costs.estimate('knn_graph', count) + setup)):
+                with costs.measure('knn_graph', count):
+                    self.distance_graph = KNNDistanceGraph(self.coords, self.neighbour_count)
+
+            if count <= num_vehicles:
+                cluster_points, partition = [[i] for i in range(count)], 'kmeans'
+            elif self.distance_graph is not None and fits(CLUSTER_FIXED_SECONDS + costs.estimate('cluster', count)
+                                                          + 2 * setup):
+                with costs.measure('cluster', count):
+                    cluster_points = self._assign_clusters(locations, num_vehicles, cluster_key)
+                partition = 'kmeans'
+            elif fits(costs.estimate('hilbert', count)) or not fits(0):
+                # (budget déjà perdu, mise en forme comprise : des tranches arbitraires ne le
+                # rattraperaient pas, autant rendre des tournées utilisables)
+                with costs.measure('hilbert', count):
+                    cluster_points = hilbert_partition(self.coords, num_vehicles)
+                partition = 'hilbert'
+            else:
+                # La courbe de Hilbert ferait manquer un budget encore tenable : tranches dans
+                # l'ordre de soumission
+                cluster_points, partition = order_partition(count, num_vehicles), 'order'
+
+            if partition == 'kmeans':
+                # Construction seule, en au plus la moitié du temps restant : l'amélioration
+                # est faite par la recherche anytime (les tranches de découpage sont déjà des tournées)
+                now = time.perf_counter()
+                routes = initial_routes(cluster_points, self.coords, now + (search_deadline - now) / 2, costs)
+            else:
+                routes = cluster_points
+            if self.distance_graph is not None and fits(setup):
+                # Tout le temps restant après le découpage (de secours ou non) va à l'amélioration
+                search = AnytimeSearch(routes, self.distance_graph, self.neighbour_count, started=started,
+                                       deadline=search_deadline, costs=costs)
+                search.run(search_deadline)
+            else:
+                search = FixedRoutes(routes, started)
+            
+            # État figé : l'optimiseur peut traiter d'autres requêtes pendant l'amélioration
+            optimizer = copy.copy(self)
+            # Dépassement jugé sur la première réponse : celles de l'amélioration en arrière-plan
+            # arrivent après le budget par construction
+            first = {}
+            anytime = AnytimeOptimization(
+                search,
+                lambda: optimizer._anytime_result(search, departure_time, time_budget_ms, partition, started, first),
+                on_improvement
+            )
+            if improvement_time_limit:
+                anytime.start(improvement_time_limit)
+            return anytime
+            
+        except Exception as e:
+            logging.error(f"Erreur lors de l'optimisation anytime: {e}")
+            raise
+    
+    def _anytime_result(self, search, departure_time, time_budget_ms, partition, started, first):
+        routes = search.routes()
+        with stage_costs.measure('format', len(self.locations)):
+            result = {
+                'routes': self._format_routes(routes, departure_time),
+                'total_distance': round(sum(self._calculate_route_distance(route) for route in routes), 2),
+                'num_vehicles': len([r for r in routes if r]),
+                'anytime': {'time_budget_ms': time_budget_ms, 'partition': partition, **search.stats()}
+            }
+        # Mesuré une fois la réponse prête, mise en forme comprise
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        result['anytime']['elapsed_ms'] = elapsed_ms
+        result['anytime']['budget_exceeded'] = first.setdefault('budget_exceeded', elapsed_ms > time_budget_ms)
+        return result
+    
+    def optimize_capacitated(self, locations, fleet=None, depot=None, num_vehicles=1, vehicle_capacity=None,
+                             departure_time=None):
+        """Optimiser les routes sous contrainte de capacité (flotte hétérogène)
+
+        `fleet` suit le format de `build_fleet` (types bike/scooter/van ou dicts).
+        `depot` est un dict {'lat', 'lng'} ; par défaut le barycentre des arrêts.
+        La demande de chaque arrêt est lue dans `loc['demand']` (1 par défaut).
+        """
+        try:
+            self.locations = locations
+            self.calculate_distance_graph(locations)  # Pas de matrice dense N×N dans ce mode
+            
+            vehicles = build_fleet(fleet, num_vehicles, vehicle_capacity)
+            demands = np.array([float(loc.get('demand', DEFAULT_DEMAND)) for loc in locations])
+            depot_coords = self.coords.mean(axis=0) if depot is None else np.array([depot['lat'], depot['lng']])
+            
+            solution = solve_capacitated(
+                self.coords, demands, vehicles, depot_coords,
+                improve=self.local_search,
+                graph=self.distance_graph,
+                **self._local_search_settings()
+            )
             
-            # Ajouter le point le plus proche
-            closest_point = min(distances)[1]
-            route.append(closest_point)
-            unvisited.remove(closest_point)
+            depot_legs = [
+                route['distance'] - self._calculate_route_distance(route['stops']) for route in solution['routes']
+            ]
+            routes = self._format_routes(
+                [route['stops'] for route in solution['routes']], departure_time,
+                vehicles=[route['vehicle'] for route in solution['routes']], first_legs=depot_legs
+            )
+            total_capacity = 0
+            for route_info, route in zip(routes, solution['routes']):
+                route_info.update({
+                    'vehicle_type': route['vehicle']['vehicle_type'],
+                    'capacity': route['vehicle']['capacity'],
+                    'load': round(route['load'], 2),
+                    'total_distance': round(route['distance'], 2)
+                })
+                total_capacity += route['vehicle']['capacity']
+            
+            return {
+                'routes': routes,
+                'total_distance': round(sum(route['distance'] for route in solution['routes']), 2),
+                'num_vehicles': len(routes),
+                'capacity_utilization': round(float(demands.sum() - demands[solution['unassigned']].sum()) / total_capacity, 3) if total_capacity else 0.0,
+                'unassigned': [self.locations[i] for i in solution['unassigned']]
+            }
+            
+        except Exception as e:
+            logging.error(f"Erreur lors de l'optimisation capacitaire: {e}")
+            raise
+    
+    def close(self):
+        """Arrêter le pool de processus des clusters, s'il a été démarré"""
+        if self.parallel is not None:
+            self.parallel.shutdown()
+    
+    def _cluster(self, locations, num_vehicles, dense=True, cluster_key=None):
+        """Calculer les distances puis répartir les arrêts en clusters (un par véhicule)"""
+        self.locations = locations
+        if dense and len(locations) <= self.dense_matrix_limit:
+            self.calculate_distance_matrix(locations)
+        else:
+            self.calculate_distance_graph(locations)
+        
+        if len(locations) <= num_vehicles:
+            return [[i] for i in range(len(locations))]
+        return self._assign_clusters(locations, num_vehicles, cluster_key)
+    
+    def _assign_clusters(self, locations, num_vehicles, cluster_key=None):
+        """Clustering des points de livraison (à chaud si le dépôt / la zone est déjà connu)"""
+        clusters = self.cluster_cache.fit_predict(
+            self.coords, num_vehicles, key=cluster_key,
+            stop_ids=stop_keys(locations) if cluster_key is not None else None
+        )
         
-        return route
+        cluster_points = [np.flatnonzero(clusters == cluster_id).tolist() for cluster_id in range(num_vehicles)]
+        return [points for points in cluster_points if points]
+    
+    def _optimize_single_route(self, point_indices):
+        """Optimiser l'ordre des points dans une route (TSP simplifié)
+
+        Plus proche voisin via un index spatial (grille), puis recherche locale.
+        """
+        return solve_route(
+            point_indices, self.coords, self._distances(),
+            improve=self.local_search, **self._local_search_settings()
+        )
+    
+    def _distances(self):
+        """Matrice dense ou graphe des k plus proches voisins, selon le mode"""
+        return self.distance_matrix if self.distance_matrix is not None else self.distance_graph
+    
+    def _local_search_settings(self):
+        return dict(
+            neighbour_count=self.neighbour_count,
+            max_iterations=self.local_search_iterations,
+            time_limit=self.local_search_time_limit
+        )
     
     def _calculate_route_distance(self, route):
         """Calculer la distance totale d'une route"""
         if len(route) < 2:
             return 0
         
-        total_distance = 0
-        for i in range(len(route) - 1):
-            loc1 = self.locations[route[i]]
-            loc2 = self.locations[route[i + 1]]
-            
-            # Distance euclidienne approximative
-            dist = np.sqrt((loc1['lat'] - loc2['lat'])**2 + (loc1['lng'] - loc2['lng'])**2) * 111
-            total_distance += dist
-        
-        return total_distance
+        return float(self._route_legs(route).sum())
     
-    def _format_routes(self, routes):
-        """Formater les routes pour la réponse"""
+    def _route_legs(self, route):
+        """Distances (km) des tronçons successifs d'une route"""
+        route = np.asarray(route)
+        if len(route) < 2:
+            return np.zeros(0)
+        if self.distance_matrix is None:
+            # Mode sans matrice dense : distances des tronçons à la volée
+            start, end = self.coords[route[:-1]], self.coords[route[1:]]
+            return haversine_pairs(start[:, 0], start[:, 1], end[:, 0], end[:, 1])
+        return self.distance_matrix[route[:-1], route[1:]].astype(np.float64)
+    
+    def _format_routes(self, routes, departure_time=None, vehicles=None, first_legs=None):
+        """Formater les routes pour la réponse, avec heures d'arrivée planifiées
+
+        `first_legs[i]` est la distance du dépôt au premier arrêt de la route i
+        (0 sans dépôt) ; la vitesse vient du véhicule affecté, si connu.
+        """
+        departure_time = departure_time or datetime.now().replace(microsecond=0)
         formatted_routes = []
         
         for i, route in enumerate(routes):
             if route:
+                locations = [self.locations[point_idx] for point_idx in route]
+                first_leg = first_legs[i] if first_legs else 0.0
+                legs = np.concatenate(([first_leg], self._route_legs(route)))
+                speed = vehicles[i]['speed_kmh'] if vehicles else DEFAULT_SPEED_KMH
+                schedule = schedule_route(
+                    locations, legs, departure_time, speed_kmh=speed,
+                    travel_time_model=self.travel_time_model,
+                    service_minutes=self.service_minutes,
+                    with_locations=True
+                )
+                
                 route_info = {
                     'vehicle_id': i + 1,
-                    'stops': [
-                        {
-                            'stop_id': j + 1,
-                            'location': self.locations[point_idx],
-                            'estimated_arrival': f"{8 + j}:00"  # Simulation
-                        }
-                        for j, point_idx in enumerate(route)
-                    ],
-                    'total_distance': round(self._calculate_route_distance(route), 2),
-                    'estimated_duration': len(route) * 15  # 15 min par arrêt
+                    'stops': schedule['stops'],
+                    'total_distance': round(float(legs[1:].sum()), 2),
+                    'departure_time': schedule['departure_time'],
+                    'estimated_duration': schedule['estimated_duration'],
+                    'late_stops': schedule['late_stops']
                 }
                 formatted_routes.append(route_info)
         
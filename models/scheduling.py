@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Vitesse moyenne en ville (km/h) et temps de service par arrêt (minutes) par défaut
+DEFAULT_SPEED_KMH = 30.0
+DEFAULT_SERVICE_MINUTES = 5.0
+MICROSECONDS_PER_MINUTE = 60_000_000
+
+
+def travel_minutes(legs_km, speed_kmh=DEFAULT_SPEED_KMH):
+    """Modèle de temps de trajet par défaut : vitesse moyenne constante"""
+    return np.asarray(legs_km, dtype=np.float64) / speed_kmh * 60.0
+
+
+def _parse_time(value):
+    """datetime ou ISO 8601 -> datetime naïf en heure locale"""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+
+def _window_offsets(locations, key, origin, missing):
+    """Bornes de fenêtre en microsecondes depuis `origin` (`missing` si l'arrêt n'en a pas)"""
+    offsets = np.full(len(locations), missing, dtype=np.int64)
+    values = [location.get(key) for location in locations]
+    for i in [i for i, value in enumerate(values) if value]:
+        offsets[i] = (np.datetime64(_parse_time(values[i]), 'us') - origin).astype(np.int64)
+    return offsets
+
+
+def schedule_route(locations, legs_km, departure_time, speed_kmh=DEFAULT_SPEED_KMH,
+                   travel_time_model=None, service_minutes=DEFAULT_SERVICE_MINUTES, with_locations=False):
+    """Calculer les heures d'arrivée réelles d'une route en un seul passage
+
+    `legs_km[i]` est la distance parcourue pour atteindre le i-ème arrêt (0 pour
+    le premier arrêt sans dépôt). Les temps de trajet de toute la route sont
+    obtenus en un seul appel à `travel_time_model(legs_km, speed_kmh)`. Chaque
+    arrêt peut porter 'time_window_start' / 'time_window_end' (datetime ou ISO
+    8601, comme PickupFeatures) et 'service_minutes' : une arrivée en avance
+    attend l'ouverture de la fenêtre, la marge (slack) est le temps restant
+    avant la fermeture au début du service. Calcul vectorisé en microsecondes
+    entières (mêmes arrondis que des additions de timedelta successives).
+    Avec `with_locations`, chaque arrêt commence par 'stop_id' (rang à partir
+    de 1) et 'location' : la réponse est construite en un seul passage.
+    """
+    model = travel_time_model or travel_minutes
+    travel = np.asarray(model(np.asarray(legs_km, dtype=np.float64), speed_kmh), dtype=np.float64)
+
+    departure_time = _parse_time(departure_time)
+    origin = np.datetime64(departure_time, 'us')
+    count = len(locations)
+    travel_us = np.round(travel[:count] * MICROSECONDS_PER_MINUTE).astype(np.int64)
+    service_us = np.round(np.array(
+        [float(location.get('service_minutes', service_minutes)) for location in locations], dtype=np.float64
+    ) * MICROSECONDS_PER_MINUTE).astype(np.int64)
+    no_window = np.iinfo(np.int64).min
+    window_start = _window_offsets(locations, 'time_window_start', origin, no_window)
+    window_end = _window_offsets(locations, 'time_window_end', origin, no_window)
+
+    # Sans attente, début de service = cumul des trajets et des services précédents ;
+    # l'attente cumulée est le plus grand dépassement d'une ouverture de fenêtre jusque-là
+    elapsed = np.cumsum(travel_us + np.concatenate(([0], service_us[:-1])))
+    waited = np.maximum.accumulate(np.maximum(np.where(window_start == no_window, 0, window_start - elapsed), 0)) \
+        if count else np.zeros(0, dtype=np.int64)
+    service_start = elapsed + waited
+    arrival = elapsed + np.concatenate(([0], waited[:-1]))
+    end = int(service_start[-1] + service_us[-1]) if count else 0
+
+    has_end = window_end != no_window
+    slack = np.where(has_end, (window_end - service_start) / MICROSECONDS_PER_MINUTE, np.nan)
+    arrivals = np.datetime_as_string(origin + arrival, unit='s').tolist()
+    starts = np.datetime_as_string(origin + service_start, unit='s').tolist()
+    waiting = np.round((service_start - arrival) / MICROSECONDS_PER_MINUTE, 1).tolist()
+    slack_minutes = np.round(slack, 1).tolist()
+    windowed = has_end.tolist()
+    with np.errstate(invalid='ignore'):
+        on_time = (~has_end | (slack >= 0)).tolist()
+    if with_locations:
+        stops = [
+            {
+                'stop_id': i + 1,
+                'location': locations[i],
+                'estimated_arrival': arrivals[i],
+                'service_start': starts[i],
+                'waiting_minutes': waiting[i],
+                'slack_minutes': slack_minutes[i] if windowed[i] else None,
+                'on_time': on_time[i]
+            }
+            for i in range(count)
+        ]
+    else:
+        stops = [
+            {
+                'estimated_arrival': arrivals[i],
+                'service_start': starts[i],
+                'waiting_minutes': waiting[i],
+                'slack_minutes': slack_minutes[i] if windowed[i] else None,
+                'on_time': on_time[i]
+            }
+            for i in range(count)
+        ]
+    end_time = departure_time + timedelta(microseconds=end)
+
+    return {
+        'stops': stops,
+        'departure_time': departure_time.isoformat(timespec='seconds'),
+        'end_time': end_time.isoformat(timespec='seconds'),
+        'estimated_duration': round((end_time - departure_time).total_seconds() / 60, 1),
+        'late_stops': on_time.count(False)
+    }
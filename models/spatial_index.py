@@ -0,0 +1,235 @@
+import heapq
+import math
+
+import numpy as np
+
+from .distance import EARTH_RADIUS_KM
+
+# Nombre moyen de points visé par cellule de la grille
+POINTS_PER_CELL = 2
+# En dessous de ce nombre de points restants, balayage direct des cellules
+BRUTE_FORCE_SIZE = 64
+# Résolution maximale (bits par axe) de la courbe de Hilbert ; en deçà, juste assez
+# de bits pour ~256 cellules par point (les points se départagent sans raffiner plus)
+HILBERT_ORDER = 16
+
+
+def project(coords, ref_lat=None):
+    """Projection équirectangulaire locale [lat, lng] -> (x, y) en km
+
+    Suffisante à l'échelle d'une ville pour ordonner des voisins ; la
+    latitude de référence corrige l'écrasement des longitudes.
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if ref_lat is None:
+        ref_lat = float(coords[:, 0].mean()) if len(coords) else 0.0
+    scale = math.radians(1) * EARTH_RADIUS_KM
+    x = coords[:, 1] * scale * math.cos(math.radians(ref_lat))
+    y = coords[:, 0] * scale
+    return x, y
+
+
+class GridIndex:
+    """Grille uniforme avec insertions / suppressions pour la recherche de voisins
+
+    Chaque requête parcourt des anneaux de cellules autour du point et s'arrête
+    dès qu'aucun anneau plus lointain ne peut battre le meilleur candidat.
+    Quand la moitié des points a été retirée (ou que leur nombre a doublé), la
+    grille est reconstruite avec une taille de cellule adaptée, ce qui garde une
+    densité constante et un coût quasi logarithmique par requête.
+    """
+
+    def __init__(self, coords, ref_lat=None):
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        if ref_lat is None:
+            ref_lat = float(coords[:, 0].mean()) if len(coords) else 0.0
+        self.ref_lat = ref_lat
+        x, y = project(coords, ref_lat)
+        self.x, self.y = x.tolist(), y.tolist()
+        self.alive = [True] * len(self.x)
+        self.size = len(self.x)
+        self._build()
+
+    def __len__(self):
+        return self.size
+
+    def _build(self):
+        positions = np.flatnonzero(self.alive)
+        self._built_size = len(positions)
+        if not len(positions):
+            self.cells = {}
+            self.x0 = self.y0 = 0.0
+            self.cell_size = 1.0
+            self.min_cx = self.min_cy = self.max_cx = self.max_cy = 0
+            return
+
+        xs, ys = np.asarray(self.x)[positions], np.asarray(self.y)[positions]
+        self.x0, self.y0 = float(xs.min()), float(ys.min())
+        width, height = float(xs.max()) - self.x0, float(ys.max()) - self.y0
+        # Le second terme évite des cellules minuscules pour des points alignés
+        self.cell_size = max(
+            math.sqrt(width * height * POINTS_PER_CELL / len(positions)),
+            max(width, height) * POINTS_PER_CELL / len(positions),
+            1e-6
+        )
+
+        cx = ((xs - self.x0) // self.cell_size).astype(np.int64)
+        cy = ((ys - self.y0) // self.cell_size).astype(np.int64)
+        self.cells = {}
+        for position, key in zip(positions.tolist(), zip(cx.tolist(), cy.tolist())):
+            self.cells.setdefault(key, set()).add(position)
+        self.min_cx = self.min_cy = 0
+        self.max_cx, self.max_cy = int(cx.max()), int(cy.max())
+
+    def _cell_of(self, x, y):
+        return int((x - self.x0) // self.cell_size), int((y - self.y0) // self.cell_size)
+
+    def insert(self, lat, lng):
+        """Ajouter un point ; renvoie sa position"""
+        x, y = project([[lat, lng]], self.ref_lat)
+        position = len(self.x)
+        self.x.append(float(x[0]))
+        self.y.append(float(y[0]))
+        self.alive.append(True)
+        self.size += 1
+        if self.size > 2 * max(self._built_size, BRUTE_FORCE_SIZE):
+            self._build()
+            return position
+
+        cx, cy = self._cell_of(self.x[position], self.y[position])
+        self.cells.setdefault((cx, cy), set()).add(position)
+        # Un point hors de la grille l'agrandit
+        self.min_cx, self.min_cy = min(self.min_cx, cx), min(self.min_cy, cy)
+        self.max_cx, self.max_cy = max(self.max_cx, cx), max(self.max_cy, cy)
+        return position
+
+    def remove(self, position):
+        """Retirer un point (position dans le tableau d'origine)"""
+        if not self.alive[position]:
+            return
+        self.alive[position] = False
+        self.size -= 1
+        cell = self.cells.get(self._cell_of(self.x[position], self.y[position]))
+        if cell is not None:
+            cell.discard(position)
+        if self.size and self.size * 2 < self._built_size:
+            self._build()
+
+    def nearest(self, position):
+        """Position du point restant le plus proche de `position` (-1 si vide)"""
+        if not self.size:
+            return -1
+        qx, qy = self.x[position], self.y[position]
+        best, best_dist = -1, math.inf
+        if self.size <= BRUTE_FORCE_SIZE:
+            for cell in self.cells.values():
+                best, best_dist = self._scan(cell, position, qx, qy, best, best_dist)
+            return best
+
+        for ring, cells in self._rings(qx, qy):
+            if best >= 0 and (ring - 1) * self.cell_size > best_dist:
+                break
+            for cell in cells:
+                best, best_dist = self._scan(cell, position, qx, qy, best, best_dist)
+        return best
+
+    def k_nearest(self, position, k):
+        """Les k points restants les plus proches de `position`, du plus proche au plus lointain"""
+        qx, qy = self.x[position], self.y[position]
+        found = []
+        if self.size <= BRUTE_FORCE_SIZE:
+            for cell in self.cells.values():
+                self._collect(cell, position, qx, qy, found)
+        else:
+            for ring, cells in self._rings(qx, qy):
+                if len(found) >= k and (ring - 1) * self.cell_size > heapq.nsmallest(k, found)[-1][0]:
+                    break
+                for cell in cells:
+                    self._collect(cell, position, qx, qy, found)
+        return [candidate for _, candidate in heapq.nsmallest(k, found)]
+
+    def _rings(self, qx, qy):
+        """Anneaux de cellules non vides, à partir de la bordure de la grille si le point est hors de la grille"""
+        cx, cy = self._cell_of(qx, qy)
+        first_ring = max(0, self.min_cx - cx, self.min_cy - cy, cx - self.max_cx, cy - self.max_cy)
+        last_ring = max(cx - self.min_cx, cy - self.min_cy, self.max_cx - cx, self.max_cy - cy)
+        for ring in range(first_ring, last_ring + 1):
+            yield ring, [self.cells[key] for key in self._ring_cells(cx, cy, ring) if self.cells.get(key)]
+
+    def _collect(self, cell, position, qx, qy, found):
+        for candidate in cell:
+            if candidate != position:
+                found.append((math.hypot(self.x[candidate] - qx, self.y[candidate] - qy), candidate))
+
+    def _scan(self, cell, position, qx, qy, best, best_dist):
+        for candidate in cell:
+            if candidate == position:
+                continue
+            dist = math.hypot(self.x[candidate] - qx, self.y[candidate] - qy)
+            if dist < best_dist or (dist == best_dist and candidate < best):
+                best, best_dist = candidate, dist
+        return best, best_dist
+
+    @staticmethod
+    def _ring_cells(cx, cy, ring):
+        if ring == 0:
+            yield cx, cy
+            return
+        for dx in range(-ring, ring + 1):
+            yield cx + dx, cy - ring
+            yield cx + dx, cy + ring
+        for dy in range(-ring + 1, ring):
+            yield cx - ring, cy + dy
+            yield cx + ring, cy + dy
+
+
+def nearest_neighbour_tour(coords, start=0):
+    """Tournée du plus proche voisin (positions locales) via la grille, sans matrice N×N"""
+    grid = GridIndex(coords)
+    current = start
+    tour = [current]
+    grid.remove(current)
+    while len(grid):
+        current = grid.nearest(current)
+        tour.append(current)
+        grid.remove(current)
+    return tour
+
+
+def hilbert_tour(coords, start=0):
+    """Tournée suivant une courbe de Hilbert (positions locales), entièrement vectorisée
+
+    Construction en O(n log n) sans boucle Python par point : moins bonne que
+    le plus proche voisin mais quasi instantanée, utile sous budget de temps serré.
+    """
+    order = hilbert_order(coords)
+    # Parcours cyclique à partir du point de départ
+    shift = int(np.flatnonzero(order == start)[0]) if len(order) else 0
+    return np.roll(order, -shift).tolist()
+
+
+def hilbert_order(coords):
+    """Indices des points triés le long d'une courbe de Hilbert (tableau numpy)"""
+    x, y = project(coords)
+    bits = min(HILBERT_ORDER, max(1, math.ceil(math.log(max(len(x), 1) * 256, 4))))
+    side = (1 << bits) - 1
+    span = max(float(np.ptp(x)) if len(x) else 0.0, float(np.ptp(y)) if len(y) else 0.0, 1e-9)
+    xi = ((x - x.min()) / span * side).astype(np.int64) if len(x) else x.astype(np.int64)
+    yi = ((y - y.min()) / span * side).astype(np.int64) if len(y) else y.astype(np.int64)
+
+    # Distance le long de la courbe (algorithme itératif classique, vectorisé)
+    d = np.zeros(len(xi), dtype=np.int64)
+    level = 1 << (bits - 1)
+    while level > 0:
+        rx = (xi & level) > 0
+        ry = (yi & level) > 0
+        d += level * level * ((3 * rx) ^ ry)
+        # Rotation du quadrant
+        flip = ~ry & rx
+        xi = np.where(flip, side - xi, xi)
+        yi = np.where(flip, side - yi, yi)
+        swap = ~ry
+        xi, yi = np.where(swap, yi, xi), np.where(swap, xi, yi)
+        level >>= 1
+
+    return np.argsort(d, kind='stable')
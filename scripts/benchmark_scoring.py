@@ -0,0 +1,102 @@
+"""Benchmark du score linéaire compilé face au chemin sklearn (DataFrame + reindex + predict)
+
+Usage : python scripts/benchmark_scoring.py [--rows 5000] [--single 2000]
+Vérifie que les prédictions sont identiques (à l'arrondi flottant près) puis
+affiche le temps par ligne des deux chemins, ligne à ligne et par lot.
+"""
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services.prediction_service import model_manager  # noqa: E402
+
+# Écart maximal toléré entre les deux chemins (différences d'ordre de sommation)
+TOLERANCE = 1e-9
+
+
+def random_rows(feature_names, count, rng):
+    """Lignes aléatoires plausibles dans l'ordre des features de l'API"""
+    columns = []
+    for name in feature_names:
+        if name.endswith('_seconds'):
+            columns.append(1.7e9 + rng.random(count) * 3e7)
+        elif name.endswith('lng'):
+            columns.append(120 + rng.random(count) * 2)
+        elif name.endswith('lat'):
+            columns.append(30 + rng.random(count) * 2)
+        elif 'hour' in name:
+            columns.append(rng.integers(0, 24, count).astype(float))
+        elif 'weekday' in name or name == 'day_of_week':
+            columns.append(rng.integers(0, 7, count).astype(float))
+        else:
+            columns.append(rng.random(count) * 100)
+    return np.column_stack(columns)
+
+
+def sklearn_predict(model, feature_names, rows):
+    frame = pd.DataFrame(rows, columns=feature_names)
+    if hasattr(model, 'feature_names_in_'):
+        frame = frame.reindex(columns=list(model.feature_names_in_), fill_value=0)
+    return model.predict(frame)
+
+
+def timed(function, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def benchmark(name, model, scorer, feature_names, args, rng):
+    if model is None or scorer is None:
+        print(f"{name}: modèle absent ou non linéaire, ignoré")
+        return True
+
+    rows = random_rows(feature_names, args.rows, rng)
+    reference, batch_sklearn = timed(lambda: sklearn_predict(model, feature_names, rows))
+    compiled, batch_scorer = timed(lambda: scorer.score_batch(rows), repeat=10)
+    batch_error = float(np.abs(reference - compiled).max())
+
+    single = rows[:args.single].tolist()
+    single_reference, single_sklearn = timed(
+        lambda: [float(sklearn_predict(model, feature_names, [row])[0]) for row in single]
+    )
+    single_compiled, single_scorer = timed(lambda: [scorer.score(row) for row in single])
+    single_error = float(np.abs(np.array(single_reference) - np.array(single_compiled)).max())
+
+    print(f"{name} ({len(feature_names)} features)")
+    print(f"  écart max : lot {batch_error:.2e}, ligne à ligne {single_error:.2e}")
+    print(f"  lot ({args.rows} lignes) : sklearn {batch_sklearn / args.rows * 1e6:.2f} µs/ligne, "
+          f"compilé {batch_scorer / args.rows * 1e6:.3f} µs/ligne (x{batch_sklearn / batch_scorer:.0f})")
+    print(f"  ligne à ligne : sklearn {single_sklearn / len(single) * 1e6:.0f} µs, "
+          f"compilé {single_scorer / len(single) * 1e6:.2f} µs (x{single_sklearn / single_scorer:.0f})")
+    return max(batch_error, single_error) <= TOLERANCE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000, help="Taille du lot")
+    parser.add_argument('--single', type=int, default=2000, help="Nombre de prédictions ligne à ligne")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    rng = np.random.default_rng(args.seed)
+    ok = benchmark('delivery', model_manager.model_delivery, model_manager.delivery_scorer,
+                   model_manager.delivery_feature_names, args, rng)
+    ok &= benchmark('pickup', model_manager.model_pickup, model_manager.pickup_scorer,
+                    model_manager.pickup_feature_names, args, rng)
+    if not ok:
+        print(f"ÉCHEC : écart supérieur à {TOLERANCE}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Score en masse d'un fichier de commandes (CSV, JSONL ou Parquet), par blocs de taille fixe
+
+Usage : python scripts/bulk_score.py INPUT OUTPUT [--model delivery] [--chunk-size 100000]
+                                     [--workers 1] [--keep order_id]
+Le fichier est lu bloc par bloc, les features sont calculées par colonnes
+(src/utils/features.py) puis scorées par ModelManager, et chaque bloc est
+écrit dans OUTPUT dès qu'il est prêt : la mémoire reste bornée quelle que
+soit la taille du fichier. Les colonnes de features de l'API sont utilisées
+telles quelles si elles sont toutes présentes, sinon elles sont dérivées des
+colonnes brutes (horodatages, GPS). Seul le modèle servi score le fichier
+(ni canary ni shadow). Avec --workers N, N processus scorent les matrices
+de features en parallèle (au plus 2N blocs en vol, d'au moins
+MIN_PARALLEL_ROWS lignes, N borné par le nombre de CPU) ; un fichier qui
+tient en un bloc, ou un modèle linéaire (un produit scalaire coûte moins que
+le transfert de sa matrice), est scoré dans le processus courant. L'ordre des
+lignes est conservé. Le format est déduit
+de l'extension (.csv, .jsonl, .parquet).
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services.prediction_service import ModelManager, model_manager  # noqa: E402
+from src.utils.chunked_io import ChunkWriter, FORMATS, file_format, read_chunks, require_pyarrow  # noqa: E402
+from src.utils.features import FEATURE_NAMES, model_feature_matrix  # noqa: E402
+
+# Taille minimale d'un bloc envoyé à un processus : amortit le transfert et la tâche
+MIN_PARALLEL_ROWS = 200000
+
+
+def prepare_chunk(name, frame):
+    """Matrice des features d'un bloc et masque des lignes complètes"""
+    features = model_feature_matrix(name, frame)
+    # Lignes incomplètes (NaT, GPS manquant...) : pas de prédiction plutôt qu'un score faux
+    valid = np.isfinite(features).all(axis=1)
+    return np.ascontiguousarray(features[valid]), valid
+
+
+def score_matrix(name, features):
+    """Prédictions du modèle servi pour une matrice de features complètes (exécuté dans les processus)"""
+    if not len(features):
+        return np.empty(0)
+    return model_manager.predict_primary_values(name, features)
+
+
+def chunk_result(name, frame, keep, valid, scores):
+    """Colonnes conservées, prédiction et score de confiance d'un bloc"""
+    predictions = np.full(len(frame), np.nan)
+    predictions[valid] = scores
+    result = frame[[column for column in keep if column in frame.columns]].reset_index(drop=True)
+    result[f"predicted_{name}_minutes"] = predictions
+    result['confidence_score'] = np.where(valid, ModelManager.confidence_scores(predictions), np.nan)
+    return result
+
+
+def score_chunk(name, frame, keep):
+    """Features puis prédictions d'un bloc ; renvoie les colonnes conservées et le score"""
+    features, valid = prepare_chunk(name, frame)
+    return chunk_result(name, frame, keep, valid, score_matrix(name, features))
+
+
+def score_file(args):
+    input_format = file_format(args.input, args.input_format)
+    output_format = file_format(args.output, args.output_format)
+    if 'parquet' in (input_format, output_format):
+        require_pyarrow()
+    if not model_manager.registry.current.available(args.model):
+        raise ValueError(f"Modèle {args.model} non disponible")
+
+    started = time.perf_counter()
+    workers = min(args.workers, os.cpu_count() or 1)
+    linear = model_manager.city_models is None and model_manager.registry.current.scorer(args.model) is not None
+    parallel = workers > 1 and not linear
+    chunk_size = max(args.chunk_size, MIN_PARALLEL_ROWS) if parallel else args.chunk_size
+    chunks = read_chunks(args.input, input_format, chunk_size)
+    if parallel:
+        # Un seul bloc : démarrer des processus (import, chargement du modèle) coûterait plus que le score
+        head = list(itertools.islice(chunks, 2))
+        parallel = len(head) > 1
+        chunks = itertools.chain(head, chunks)
+    writer = ChunkWriter(args.output, output_format)
+    totals = {'rows': 0, 'invalid': 0, 'chunks': 0}
+
+    def write(result):
+        writer.write(result)
+        totals['rows'] += len(result)
+        totals['invalid'] += int(result['confidence_score'].isna().sum())
+        totals['chunks'] += 1
+        if args.verbose:
+            print(f"  bloc {totals['chunks']} : {totals['rows']} lignes", file=sys.stderr)
+
+    try:
+        if not parallel:
+            for frame in chunks:
+                write(score_chunk(args.model, frame, args.keep))
+        else:
+            # spawn : chaque processus charge le modèle (mappé en mémoire, pages partagées).
+            # Seule la matrice de features part vers le processus et seul le vecteur de
+            # prédictions revient : le DataFrame reste ici.
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(workers, mp_context=context) as executor:
+                pending = deque()
+
+                def flush():
+                    frame, valid, future = pending.popleft()
+                    write(chunk_result(args.model, frame, args.keep, valid, future.result()))
+
+                for frame in chunks:
+                    # Au plus 2 blocs en vol par processus : la lecture ne prend pas d'avance illimitée
+                    if len(pending) >= 2 * workers:
+                        flush()
+                    features, valid = prepare_chunk(args.model, frame)
+                    pending.append((frame, valid, executor.submit(score_matrix, args.model, features)))
+                while pending:
+                    flush()
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - started
+
+    return {
+        **totals,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(totals['rows'] / elapsed) if elapsed > 0 else None,
+        'model_version': model_manager.registry.current.version(args.model)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help="Fichier de commandes (.csv, .jsonl, .parquet)")
+    parser.add_argument('output', help="Fichier de sortie (.csv, .jsonl, .parquet)")
+    parser.add_argument('--model', choices=sorted(FEATURE_NAMES), default='delivery')
+    parser.add_argument('--chunk-size', type=int, default=100000, help="Lignes par bloc (au moins MIN_PARALLEL_ROWS avec --workers)")
+    parser.add_argument('--workers', type=int, default=1, help="Processus de scoring")
+    parser.add_argument('--keep', nargs='*', default=['order_id'], help="Colonnes recopiées dans la sortie")
+    parser.add_argument('--input-format', choices=sorted(set(FORMATS.values())))
+    parser.add_argument('--output-format', choices=sorted(set(FORMATS.values())))
+    parser.add_argument('--verbose', action='store_true', help="Progression bloc par bloc")
+    args = parser.parse_args()
+
+    try:
+        report = score_file(args)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        return 1
+
+    print(f"{report['rows']} lignes scorées en {report['seconds']} s "
+          f"({report['rows_per_second']} lignes/s, {report['chunks']} blocs, "
+          f"{report['invalid']} lignes incomplètes) - modèle {report['model_version']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Export des modèles pickle vers le format mappable en mémoire (coef.npy + meta.json)
+
+Usage : python scripts/export_models.py [--output models/exported] [--candidate]
+Chaque modèle linéaire est écrit dans <output>/<pickup|delivery>/ ; l'API le
+mappe ensuite en mémoire au premier usage, les workers partagent les mêmes
+pages. Les modèles non linéaires sont signalés et restent servis par pickle.
+Avec --candidate, exporte les modèles CANDIDATE_* dans <output>/candidate/.
+"""
+import argparse
+import pickle
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services import model_store  # noqa: E402
+from src.services.prediction_service import ModelManager  # noqa: E402
+from src.utils.config import get_settings  # noqa: E402
+
+
+def export(name, model_path, feature_names, output):
+    model_path = Path(model_path)
+    if not model_path.exists():
+        print(f"{name}: {model_path} introuvable, ignoré")
+        return False
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+
+    meta = model_store.export_linear_model(model, feature_names, output / name, source=model_path)
+    if meta is None:
+        print(f"{name}: {type(model).__name__} n'est pas linéaire, servi par pickle")
+        return False
+    print(f"{name}: {meta['model_type']} ({len(feature_names)} coefficients) -> {output / name}")
+    return True
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=settings.MODEL_EXPORT_DIR, help="Répertoire d'export")
+    parser.add_argument('--candidate', action='store_true', help="Exporter le modèle candidat (shadow / canary)")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    pickup_path, delivery_path = settings.PICKUP_MODEL_PATH, settings.DELIVERY_MODEL_PATH
+    if args.candidate:
+        output = output / 'candidate'
+        pickup_path, delivery_path = settings.CANDIDATE_PICKUP_MODEL_PATH, settings.CANDIDATE_DELIVERY_MODEL_PATH
+    if pickup_path:
+        export('pickup', pickup_path, ModelManager.PICKUP_FEATURE_NAMES, output)
+    if delivery_path:
+        export('delivery', delivery_path, ModelManager.DELIVERY_FEATURE_NAMES, output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Entraînement hors mémoire des modèles Lasso pickup / delivery
+
+Usage : python scripts/train_models.py INPUT [INPUT...] [--model delivery] [--alpha 0.1]
+                                       [--update] [--decay 1.0] [--candidate] [--output PATH]
+Les fichiers (CSV, JSONL, Parquet) sont lus par blocs ; seules les
+statistiques suffisantes (X'X, X'y, moyennes) sont gardées en mémoire, puis
+le Lasso est résolu par descente de coordonnées. Le pickle écrit est celui
+que charge ModelManager (DELIVERY_MODEL_PATH / PICKUP_MODEL_PATH, ou les
+chemins CANDIDATE_* avec --candidate), avec l'export mappable à jour et les
+statistiques à côté (<modèle>.stats.npz). Avec --output, seul le pickle est écrit.
+Avec --update, les nouvelles lignes (par exemple les livraisons terminées
+de la veille) sont ajoutées aux statistiques existantes, éventuellement
+pondérées par --decay, et le modèle est réajusté à partir des coefficients
+courants, sans relire l'historique.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services import training  # noqa: E402
+from src.utils.chunked_io import file_format, read_chunks  # noqa: E402
+from src.utils.config import get_settings  # noqa: E402
+from src.utils.features import FEATURE_NAMES  # noqa: E402
+
+
+def model_paths(settings, name, candidate):
+    if candidate:
+        model_path = getattr(settings, f"CANDIDATE_{name.upper()}_MODEL_PATH")
+        if not model_path:
+            raise ValueError(f"CANDIDATE_{name.upper()}_MODEL_PATH non configuré")
+        return Path(model_path), Path(settings.MODEL_EXPORT_DIR) / 'candidate'
+    return Path(getattr(settings, f"{name.upper()}_MODEL_PATH")), Path(settings.MODEL_EXPORT_DIR)
+
+
+def chunks(paths, chunk_size, input_format):
+    for path in paths:
+        yield from read_chunks(path, file_format(path, input_format), chunk_size)
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help="Fichiers de livraisons terminées (.csv, .jsonl, .parquet)")
+    parser.add_argument('--model', choices=sorted(FEATURE_NAMES), default='delivery')
+    parser.add_argument('--target', help="Colonne cible en minutes (ETA_delivery / ETA_pickup par défaut)")
+    parser.add_argument('--alpha', type=float, default=0.1, help="Pénalité L1 (comme Lasso(alpha=...))")
+    parser.add_argument('--chunk-size', type=int, default=200000, help="Lignes par bloc")
+    parser.add_argument('--update', action='store_true', help="Ajouter aux statistiques du modèle existant")
+    parser.add_argument('--decay', type=float, default=1.0, help="Poids de l'historique avec --update (0 < decay <= 1)")
+    parser.add_argument('--candidate', action='store_true', help="Écrire le modèle candidat (shadow / canary)")
+    parser.add_argument('--output', help="Chemin du pickle (remplace le chemin configuré)")
+    parser.add_argument('--no-export', action='store_true', help="Ne pas écrire l'export mappable")
+    parser.add_argument('--max-iter', type=int, default=1000)
+    parser.add_argument('--tol', type=float, default=1e-4)
+    parser.add_argument('--input-format', choices=['csv', 'jsonl', 'parquet'])
+    args = parser.parse_args()
+
+    try:
+        model_path, export_dir = model_paths(settings, args.model, args.candidate)
+        if args.output:
+            # L'export mappable correspond aux chemins configurés : pas d'export pour un autre pickle
+            model_path, export_dir = Path(args.output), None
+        if not 0 < args.decay <= 1:
+            raise ValueError("--decay doit être dans ]0, 1]")
+
+        stats, coef_init = None, None
+        if args.update:
+            stats, coef_init = training.load_existing(model_path)
+            stats.decay(args.decay)
+            print(f"Mise à jour de {model_path} ({stats.count:.0f} lignes pondérées dans l'historique)")
+
+        started = time.perf_counter()
+        stats, counts = training.accumulate(args.model, chunks(args.inputs, args.chunk_size, args.input_format),
+                                            target=args.target, stats=stats)
+        read_seconds = time.perf_counter() - started
+        coef, intercept, n_iter = training.solve_lasso(stats, args.alpha, coef_init, args.max_iter, args.tol)
+        model = training.build_model(args.model, coef, intercept, args.alpha, n_iter)
+        saved = training.save_model(args.model, model, stats, model_path, None if args.no_export else export_dir)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        return 1
+
+    error = training.training_error(stats, coef)
+    print(f"{counts['rows']} lignes lues en {read_seconds:.1f} s "
+          f"({counts['rows'] / read_seconds if read_seconds > 0 else 0:.0f} lignes/s, {counts['chunks']} blocs), "
+          f"{counts['used']} retenues")
+    print(f"Lasso alpha={args.alpha} : {n_iter} itérations, {int(np.count_nonzero(coef))}/{len(coef)} coefficients "
+          f"non nuls, RMSE {error['rmse']:.3f} min, R² {error['r2']:.4f}")
+    print(f"Modèle écrit dans {saved['model_path']} (statistiques : {saved['stats_path']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
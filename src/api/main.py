@@ -2,8 +2,12 @@ from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 import logging
+import threading
 from .routes import prediction, health, monitoring
 from .middleware.cors import setup_cors
+from .dependencies import get_prediction_service
+from ..services.prediction_service import model_manager
+from ..utils.config import get_settings
 from flask import Blueprint, render_template
 
 main_bp = Blueprint('main', __name__)
@@ -37,6 +41,28 @@ app.include_router(prediction.router, prefix="/predict", tags=["predictions"])
 app.include_router(health.router, tags=["health"])
 app.include_router(monitoring.router, prefix="/debug", tags=["monitoring"])
 
+@app.on_event("startup")
+def start_model_watcher():
+    """Surveille les fichiers des modèles et installe les nouvelles versions sans interruption"""
+    interval = get_settings().MODEL_WATCH_INTERVAL
+    if interval > 0:
+        model_manager.registry.start_watching(interval)
+        if model_manager.shadow is not None:
+            model_manager.shadow.candidate.start_watching(interval)
+
+@app.on_event("startup")
+def load_demand_history():
+    """Charge les agrégats de demande en arrière-plan : la première prévision n'attend pas la lecture de l'historique"""
+    threading.Thread(target=get_prediction_service().forecaster.load, name="demand-history", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_model_watcher():
+    model_manager.registry.stop_watching()
+    if model_manager.shadow is not None:
+        model_manager.shadow.candidate.stop_watching()
+        model_manager.shadow.shutdown()
+    get_prediction_service().shutdown()
+
 @app.get("/")
 def root():
     """Route racine de l'API"""
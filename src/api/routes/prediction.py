@@ -1,11 +1,18 @@
 
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
 from typing import List, Optional
 import logging
 
 from ...utils.helpers import ResponseHelper
-from ...services.prediction_service import PredictionService
+from ...services.prediction_service import PredictionService, model_manager, delivery_batcher, pickup_batcher
+from ...services.cache_service import get_prediction_cache
+from ...services.pools import PoolSaturatedError
+from ...services.forecast_service import UnknownZoneError
 from ..schemas.prediction import (
+    DeliveryFeatures,
+    PickupFeatures,
+    DeliveryBatchRequest,
+    PickupBatchRequest,
     DeliveryPredictionRequest,
     DeliveryPredictionResponse,
     RouteOptimizationRequest,
@@ -13,6 +20,8 @@ from ..schemas.prediction import (
     DemandForecastRequest,
     DemandForecastResponse
 )
+from ..schemas.response import BatchPredictionResponse, PredictionResponse
+from ..schemas.columnar import ColumnarPredictionResponse, ColumnarValidator, DELIVERY_COLUMNS, PICKUP_COLUMNS
 from ..dependencies import get_prediction_service
 
 router = APIRouter()
@@ -38,6 +47,9 @@ async def predict_delivery_time(
             factors=prediction['factors']
         )
         
+    except PoolSaturatedError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Erreur lors de la prédiction: {str(e)}")
         raise HTTPException(
@@ -45,6 +57,198 @@ async def predict_delivery_time(
             detail=f"Erreur lors de la prédiction: {str(e)}"
         )
 
+@router.post("/delivery", response_model=PredictionResponse)
+async def predict_delivery(features: DeliveryFeatures) -> PredictionResponse:
+    """Prédire le temps de livraison d'une commande (cache, sinon regroupée avec les requêtes concurrentes)"""
+    try:
+        cache = get_prediction_cache()
+        key = cache.delivery_key(features)
+        result = cache.get(key)
+        if result is None:
+            result = await delivery_batcher.submit(features)
+            # Les réponses du modèle candidat (canary) ne sont pas servies aux autres requêtes
+            if not result["canary"]:
+                cache.set(key, result)
+        return PredictionResponse(**result)
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la prédiction: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la prédiction: {str(e)}"
+        )
+
+@router.post("/pickup", response_model=PredictionResponse)
+async def predict_pickup(features: PickupFeatures) -> PredictionResponse:
+    """Prédire le temps de collecte d'une commande (cache, sinon regroupée avec les requêtes concurrentes)"""
+    try:
+        cache = get_prediction_cache()
+        key = cache.pickup_key(features)
+        result = cache.get(key)
+        if result is None:
+            result = await pickup_batcher.submit(features)
+            # Les réponses du modèle candidat (canary) ne sont pas servies aux autres requêtes
+            if not result["canary"]:
+                cache.set(key, result)
+        return PredictionResponse(**result)
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la prédiction: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la prédiction: {str(e)}"
+        )
+
+@router.get("/batching/stats")
+async def batching_stats() -> dict:
+    """Histogrammes taille de lot / attente en file du regroupement des prédictions"""
+    return {
+        "delivery": delivery_batcher.stats(),
+        "pickup": pickup_batcher.stats()
+    }
+
+@router.get("/cache/stats")
+async def cache_stats() -> dict:
+    """Compteurs hits / misses / évictions du cache de prédictions"""
+    return get_prediction_cache().stats()
+
+@router.get("/models")
+async def models_info() -> dict:
+    """Version servie et historique des versions du registre de modèles"""
+    return model_manager.registry.stats()
+
+@router.post("/models/reload")
+def reload_models() -> dict:
+    """Charger, préchauffer et installer la version actuelle des fichiers de modèles"""
+    try:
+        return model_manager.reload_models().describe()
+        
+    except Exception as e:
+        logger.error(f"Erreur lors du rechargement des modèles: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors du rechargement des modèles: {str(e)}"
+        )
+
+@router.get("/city-models/stats")
+async def city_models_stats() -> dict:
+    """Modèles par ville chargés, taux de hit, latence de chargement et replis sur le modèle global"""
+    if model_manager.city_models is None:
+        return {"enabled": False}
+    return {"enabled": True, **model_manager.city_models.stats()}
+
+@router.get("/shadow/stats")
+async def shadow_stats() -> dict:
+    """Compteurs shadow / canary et écarts entre modèle servi et modèle candidat"""
+    if model_manager.shadow is None:
+        return {"enabled": False}
+    return {"enabled": True, **model_manager.shadow.stats()}
+
+@router.get("/shadow/records")
+async def shadow_records(limit: int = 100, model: Optional[str] = None) -> list:
+    """Derniers couples de prédictions (servie, candidate) enregistrés"""
+    if model_manager.shadow is None:
+        return []
+    return model_manager.shadow.recorder.records(limit=limit, model=model)
+
+@router.get("/pools/stats")
+async def pools_stats(prediction_service: PredictionService = Depends(get_prediction_service)) -> dict:
+    """Occupation des pools de calcul (threads / processus) : tâches en cours, file d'attente, saturation"""
+    return prediction_service.stats()
+
+@router.post("/delivery-time/batch", response_model=BatchPredictionResponse)
+async def predict_delivery_time_batch(
+    request: DeliveryBatchRequest,
+    prediction_service: PredictionService = Depends(get_prediction_service)
+) -> BatchPredictionResponse:
+    """Prédire le temps de livraison d'un lot de commandes (un seul appel au modèle)"""
+    try:
+        logger.info(f"Prédiction temps de livraison pour un lot de {len(request.rows)} commandes")
+        return BatchPredictionResponse(**await prediction_service.predict_batch('delivery', request.rows))
+        
+    except PoolSaturatedError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors de la prédiction par lot: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la prédiction par lot: {str(e)}"
+        )
+
+@router.post("/pickup-time/batch", response_model=BatchPredictionResponse)
+async def predict_pickup_time_batch(
+    request: PickupBatchRequest,
+    prediction_service: PredictionService = Depends(get_prediction_service)
+) -> BatchPredictionResponse:
+    """Prédire le temps de collecte d'un lot de commandes (un seul appel au modèle)"""
+    try:
+        logger.info(f"Prédiction temps de collecte pour un lot de {len(request.rows)} commandes")
+        return BatchPredictionResponse(**await prediction_service.predict_batch('pickup', request.rows))
+        
+    except PoolSaturatedError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors de la prédiction par lot: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la prédiction par lot: {str(e)}"
+        )
+
+async def _predict_columns(request: Request, name: str, validator: ColumnarValidator,
+                           prediction_service: PredictionService) -> dict:
+    """Lot au format colonnes : validation vectorisée puis un seul appel au modèle sur les lignes valides"""
+    try:
+        columns = await request.json()
+        batch = validator.validate(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    try:
+        logger.info(f"Prédiction {name} au format colonnes : {len(batch.valid)} lignes, {batch.error_count} rejetées")
+        result = await prediction_service.predict_features(name, batch.features)
+        predictions = [None] * len(batch.valid)
+        confidences = [None] * len(batch.valid)
+        for row, prediction, confidence in zip(batch.valid.nonzero()[0].tolist(), result["predictions"],
+                                               result["confidence_scores"]):
+            predictions[row] = prediction
+            confidences[row] = confidence
+        return {
+            "predictions": predictions,
+            "confidence_scores": confidences,
+            "model_version": result["model_version"],
+            "count": result["count"],
+            "error_count": batch.error_count,
+            "errors": batch.errors
+        }
+        
+    except PoolSaturatedError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors de la prédiction au format colonnes: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la prédiction au format colonnes: {str(e)}"
+        )
+
+@router.post("/delivery-time/columns", response_model=ColumnarPredictionResponse)
+async def predict_delivery_time_columns(
+    request: Request,
+    prediction_service: PredictionService = Depends(get_prediction_service)
+) -> dict:
+    """Prédire un lot de livraisons au format colonnes ({champ: [valeurs...]}), sans modèle pydantic par ligne"""
+    return await _predict_columns(request, 'delivery', DELIVERY_COLUMNS, prediction_service)
+
+@router.post("/pickup-time/columns", response_model=ColumnarPredictionResponse)
+async def predict_pickup_time_columns(
+    request: Request,
+    prediction_service: PredictionService = Depends(get_prediction_service)
+) -> dict:
+    """Prédire un lot de collectes au format colonnes (datetimes en secondes epoch)"""
+    return await _predict_columns(request, 'pickup', PICKUP_COLUMNS, prediction_service)
+
 @router.post("/optimize-route", response_model=RouteOptimizationResponse)
 async def optimize_route(
     request: RouteOptimizationRequest,
@@ -65,6 +269,9 @@ async def optimize_route(
             savings_vs_original=optimization['savings']
         )
         
+    except PoolSaturatedError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Erreur lors de l'optimisation: {str(e)}")
         raise HTTPException(
@@ -91,10 +298,43 @@ async def forecast_demand(
             peak_hours=forecast['peak_hours'],
             confidence_interval=forecast['confidence_interval']
         )
+    except UnknownZoneError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except PoolSaturatedError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Erreur lors de la prévision: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Erreur lors de la prévision: {str(e)}"
         )
-        
\ No newline at end of file
+        
+@router.post("/demand-forecast/deliveries")
+async def record_completed_deliveries(
+    request: Request,
+    prediction_service: PredictionService = Depends(get_prediction_service)
+) -> dict:
+    """Livraisons terminées au format colonnes (city_encoded, aoi_id, accept_time en secondes epoch) : agrégats et historique"""
+    try:
+        columns = await request.json()
+        return await prediction_service.record_deliveries(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except PoolSaturatedError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors de l'enregistrement des livraisons: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de l'enregistrement des livraisons: {str(e)}"
+        )
+
+@router.get("/demand-forecast/stats")
+async def demand_forecast_stats(prediction_service: PredictionService = Depends(get_prediction_service)) -> dict:
+    """État des agrégats de demande : zones, fin de l'historique, dernier ajustement"""
+    return prediction_service.forecaster.stats()
+
@@ -0,0 +1,184 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from .prediction import DeliveryFeatures, PickupFeatures
+from ...utils.features import DELIVERY_FEATURE_NAMES, day_of_week, hour_of_day
+
+BOUND_OPERATORS = ('gt', 'ge', 'lt', 'le')
+# Nombre maximal d'erreurs détaillées renvoyées (le total est toujours donné)
+MAX_REPORTED_ERRORS = 1000
+
+
+def field_specs(model: type) -> Dict[str, Dict[str, Any]]:
+    """Type, caractère obligatoire et bornes (ge/le/gt/lt) de chaque champ, en pydantic v1 ou v2"""
+    specs = {}
+    fields = getattr(model, 'model_fields', None)
+    if fields is not None:
+        # pydantic v2 : les bornes sont des annotated_types.Ge / Le... dans metadata
+        for name, field in fields.items():
+            bounds = {}
+            for item in field.metadata:
+                for op in BOUND_OPERATORS:
+                    if getattr(item, op, None) is not None:
+                        bounds[op] = getattr(item, op)
+            specs[name] = {'type': field.annotation, 'required': field.is_required(), 'bounds': bounds}
+    else:
+        # pydantic v1
+        for name, field in model.__fields__.items():
+            bounds = {op: getattr(field.field_info, op) for op in BOUND_OPERATORS
+                      if getattr(field.field_info, op, None) is not None}
+            specs[name] = {'type': field.outer_type_, 'required': field.required, 'bounds': bounds}
+    return specs
+
+
+def _kind(annotation: Any) -> str:
+    if annotation is int:
+        return 'int'
+    if annotation is float:
+        return 'float'
+    if annotation is datetime:
+        return 'datetime'
+    return 'str'
+
+
+class ColumnarBatch(NamedTuple):
+    features: np.ndarray  # (lignes valides, n_features), ordre de l'API
+    valid: np.ndarray  # masque des lignes valides, sur toutes les lignes
+    errors: List[Dict[str, Any]]
+    error_count: int
+
+
+class ColumnarValidator:
+    """Validation vectorisée d'un lot au format colonnes ({champ: [valeurs...]})
+
+    Applique en une passe numpy par colonne les bornes déclarées dans le schéma
+    pydantic (ge/le/gt/lt), le type entier, et les règles inter-champs ; les
+    erreurs sont rapportées par indice de ligne et les lignes valides sortent
+    directement en matrice de features. Les champs datetime sont transmis en
+    secondes epoch (UTC), comme les *_seconds de DeliveryFeatures. Les champs
+    texte, qui n'entrent pas dans le modèle, ne sont pas exigés.
+    """
+
+    def __init__(self, model: type, features: Sequence[Tuple[str, str, Optional[str]]],
+                 rules: Sequence[Tuple[str, Callable[[Dict[str, np.ndarray]], np.ndarray], str]] = ()):
+        self.model = model
+        self.features = list(features)
+        self.rules = list(rules)
+        self.fields = {
+            name: {**spec, 'kind': _kind(spec['type'])}
+            for name, spec in field_specs(model).items()
+            if _kind(spec['type']) != 'str'
+        }
+        self.required = [name for name, spec in self.fields.items() if spec['required']]
+
+    def validate(self, columns: Dict[str, Sequence[Any]]) -> ColumnarBatch:
+        if not isinstance(columns, dict) or not columns:
+            raise ValueError("Format attendu : {champ: [valeurs...]}")
+        missing = [name for name in self.required if name not in columns]
+        if missing:
+            raise ValueError(f"Colonnes manquantes : {missing}")
+        lengths = {len(columns[name]) for name in self.required}
+        if len(lengths) != 1:
+            raise ValueError(f"Les colonnes doivent avoir la même longueur (longueurs : {sorted(lengths)})")
+        count = lengths.pop()
+        if count == 0:
+            raise ValueError("Aucune ligne à prédire")
+
+        errors = []
+        invalid = np.zeros(count, dtype=bool)
+        arrays = {}
+
+        def fail(mask: np.ndarray, field: str, message: str) -> None:
+            rows = np.flatnonzero(mask & ~invalid)
+            invalid[rows] = True
+            errors.extend({'row': int(row), 'field': field, 'msg': message} for row in rows[:MAX_REPORTED_ERRORS])
+
+        for name in self.required:
+            values = self._to_array(columns[name], name, fail)
+            spec = self.fields[name]
+            if spec['kind'] == 'int':
+                fail(np.isfinite(values) & (values != np.floor(values)), name, "Entier attendu")
+            for op, bound in spec['bounds'].items():
+                with np.errstate(invalid='ignore'):
+                    bad = {'gt': values <= bound, 'ge': values < bound, 'lt': values >= bound, 'le': values > bound}[op]
+                symbol = {'gt': '>', 'ge': '>=', 'lt': '<', 'le': '<='}[op]
+                fail(bad, name, f"La valeur doit être {symbol} {bound}")
+            arrays[name] = values
+
+        for field, rule, message in self.rules:
+            with np.errstate(invalid='ignore'):
+                fail(rule(arrays), field, message)
+
+        valid = ~invalid
+        features = np.column_stack([self._feature(arrays[source], transform)[valid]
+                                    for _, source, transform in self.features])
+        return ColumnarBatch(features, valid, errors[:MAX_REPORTED_ERRORS], int(invalid.sum()))
+
+    @staticmethod
+    def _to_array(values: Sequence[Any], name: str, fail: Callable) -> np.ndarray:
+        try:
+            array = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            # Chemin lent seulement en cas d'erreur : trouver les lignes non numériques
+            array = np.empty(len(values))
+            bad = np.zeros(len(values), dtype=bool)
+            for i, value in enumerate(values):
+                try:
+                    array[i] = float(value) if value is not None and not isinstance(value, bool) else np.nan
+                except (TypeError, ValueError):
+                    array[i], bad[i] = np.nan, True
+            fail(bad, name, "Valeur numérique attendue")
+        if array.ndim != 1:
+            raise ValueError(f"Colonne {name} : liste de valeurs scalaires attendue")
+        fail(~np.isfinite(array), name, "Valeur manquante ou non finie")
+        return array
+
+    @staticmethod
+    def _feature(values: np.ndarray, transform: Optional[str]) -> np.ndarray:
+        if transform == 'hour':
+            return hour_of_day(values)
+        if transform == 'weekday':
+            return day_of_week(values)
+        return values
+
+
+# Features dans l'ordre de DeliveryFeatures.to_feature_array (order_id n'entre pas dans le modèle)
+DELIVERY_COLUMNS = ColumnarValidator(DeliveryFeatures, [(name, name, None) for name in DELIVERY_FEATURE_NAMES])
+
+# Features dans l'ordre de PickupFeatures.to_model_input (datetimes en secondes epoch)
+PICKUP_COLUMNS = ColumnarValidator(PickupFeatures, [
+    ('city_encoded', 'city_encoded', None),
+    ('lng', 'lng', None),
+    ('lat', 'lat', None),
+    ('aoi_id', 'aoi_id', None),
+    ('accept_time_seconds', 'accept_time', None),
+    ('time_window_start_seconds', 'time_window_start', None),
+    ('time_window_end_seconds', 'time_window_end', None),
+    ('pickup_time_seconds', 'pickup_time', None),
+    ('pickup_gps_time_seconds', 'pickup_gps_time', None),
+    ('pickup_gps_lng', 'pickup_gps_lng', None),
+    ('pickup_gps_lat', 'pickup_gps_lat', None),
+    ('accept_gps_time_seconds', 'accept_gps_time', None),
+    ('accept_gps_lng', 'accept_gps_lng', None),
+    ('accept_gps_lat', 'accept_gps_lat', None),
+    ('waiting_time_minutes', 'waiting_time_minutes', None),
+    ('pickup_hour', 'pickup_time', 'hour'),
+    ('pickup_weekday', 'pickup_time', 'weekday')
+], rules=[
+    # Même règle que le validator de PickupFeatures
+    ('time_window_end', lambda c: c['time_window_end'] <= c['time_window_start'],
+     "time_window_end doit être postérieur à time_window_start")
+])
+
+
+class ColumnarPredictionResponse(BaseModel):
+    """Réponse au format colonnes : une prédiction par ligne, None pour les lignes rejetées"""
+    predictions: List[Optional[float]]
+    confidence_scores: List[Optional[float]]
+    model_version: Optional[str]
+    count: int
+    error_count: int
+    errors: List[Dict[str, Any]]
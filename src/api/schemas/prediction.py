@@ -1,7 +1,9 @@
 
 from pydantic import BaseModel, Field, validator
-from typing import Optional, Dict, Any
-from datetime import datetime
+from typing import Optional, Dict, Any, List
+from datetime import date, datetime
+
+from ...utils.features import datetime_seconds, day_of_week, hour_of_day
 
 
 class PickupFeatures(BaseModel):
@@ -34,25 +36,36 @@ class PickupFeatures(BaseModel):
         return v
    
     def to_model_input(self) -> Dict[str, Any]:
-        """Convertit les features en format d'entrée pour le modèle"""
+        """Convertit les features en format d'entrée pour le modèle
+
+        Horodatages, heure et jour de collecte dérivés par utils/features.py,
+        comme le format colonnes et l'entraînement (datetime sans fuseau lu comme UTC).
+        """
+        pickup_seconds = datetime_seconds(self.pickup_time)
         return {
             'city_encoded': self.city_encoded,
             'lng': self.lng,
             'lat': self.lat,
             'aoi_id': self.aoi_id,
-            'accept_time_seconds': self.accept_time.timestamp(),
-            'time_window_start_seconds': self.time_window_start.timestamp(),
-            'time_window_end_seconds': self.time_window_end.timestamp(),
-            'pickup_time_seconds': self.pickup_time.timestamp(),
-            'pickup_gps_time_seconds': self.pickup_gps_time.timestamp(),
+            'accept_time_seconds': datetime_seconds(self.accept_time),
+            'time_window_start_seconds': datetime_seconds(self.time_window_start),
+            'time_window_end_seconds': datetime_seconds(self.time_window_end),
+            'pickup_time_seconds': pickup_seconds,
+            'pickup_gps_time_seconds': datetime_seconds(self.pickup_gps_time),
             'pickup_gps_lng': self.pickup_gps_lng,
             'pickup_gps_lat': self.pickup_gps_lat,
-            'accept_gps_time_seconds': self.accept_gps_time.timestamp(),
+            'accept_gps_time_seconds': datetime_seconds(self.accept_gps_time),
             'accept_gps_lng': self.accept_gps_lng,
             'accept_gps_lat': self.accept_gps_lat,
-            'waiting_time_minutes': self.waiting_time_minutes
+            'waiting_time_minutes': self.waiting_time_minutes,
+            'pickup_hour': int(hour_of_day(pickup_seconds)),
+            'pickup_weekday': int(day_of_week(pickup_seconds))
         }
 
+    def to_feature_array(self) -> list:
+        """Convertit les features en array pour le modèle (ordre de to_model_input)"""
+        return list(self.to_model_input().values())
+
 
 class DeliveryFeatures(BaseModel):
     order_id: int = Field(..., description="ID de la commande")
@@ -111,6 +124,89 @@ class DeliveryFeatures(BaseModel):
         ]
 
 
+class PickupBatchRequest(BaseModel):
+    """Lot de collectes prédites en un seul appel au modèle"""
+    rows: List[PickupFeatures] = Field(..., description="Features des collectes")
+
+
+class DeliveryBatchRequest(BaseModel):
+    """Lot de livraisons prédites en un seul appel au modèle"""
+    rows: List[DeliveryFeatures] = Field(..., description="Features des livraisons")
+
+
+class DeliveryPredictionRequest(BaseModel):
+    """Prédiction du temps de livraison à partir des adresses (coordonnées optionnelles)"""
+    pickup_address: str = Field(..., description="Adresse de collecte")
+    delivery_address: str = Field(..., description="Adresse de livraison")
+    pickup_lat: Optional[float] = Field(None, ge=-90, le=90, description="Latitude de collecte")
+    pickup_lng: Optional[float] = Field(None, ge=-180, le=180, description="Longitude de collecte")
+    delivery_lat: Optional[float] = Field(None, ge=-90, le=90, description="Latitude de livraison")
+    delivery_lng: Optional[float] = Field(None, ge=-180, le=180, description="Longitude de livraison")
+    order_time: Optional[datetime] = Field(None, description="Heure de la commande (maintenant par défaut)")
+    courier_id: int = Field(0, description="ID du coursier")
+    aoi_id: int = Field(0, description="ID de la zone d'intérêt")
+    city_encoded: int = Field(0, description="Code de la ville")
+    traffic_level: str = Field("normal", description="Niveau de trafic (low, normal, high)")
+    weather_condition: str = Field("clear", description="Météo (clear, rainy...)")
+
+
+class DeliveryPredictionResponse(BaseModel):
+    success: bool = Field(..., description="Succès de la prédiction")
+    message: str = Field(..., description="Message")
+    predicted_duration_minutes: float = Field(..., description="Durée prédite en minutes")
+    estimated_arrival_time: datetime = Field(..., description="Heure d'arrivée estimée")
+    confidence_score: float = Field(..., description="Score de confiance")
+    factors: Dict[str, Any] = Field(default_factory=dict, description="Facteurs pris en compte")
+
+
+class RouteStop(BaseModel):
+    id: Optional[str] = Field(None, description="Identifiant de l'arrêt")
+    lat: float = Field(..., ge=-90, le=90, description="Latitude")
+    lng: float = Field(..., ge=-180, le=180, description="Longitude")
+    address: Optional[str] = Field(None, description="Adresse")
+    demand: Optional[float] = Field(None, ge=0, description="Demande (active le mode capacitaire)")
+
+
+class RouteOptimizationRequest(BaseModel):
+    """Optimisation des tournées ; `time_budget_ms` active le mode anytime (meilleure solution dans le budget)"""
+    deliveries: List[RouteStop] = Field(..., min_length=1, description="Arrêts à desservir")
+    num_vehicles: int = Field(1, ge=1, description="Nombre de véhicules")
+    vehicle_capacity: Optional[float] = Field(None, gt=0, description="Capacité par véhicule (mode capacitaire)")
+    departure_time: Optional[datetime] = Field(None, description="Heure de départ (maintenant par défaut)")
+    time_budget_ms: Optional[int] = Field(None, gt=0, le=60000, description="Budget de calcul en ms (mode anytime)")
+    cluster_key: Optional[str] = Field(None, description="Dépôt / zone, pour réutiliser le clustering en cache")
+
+
+class RouteOptimizationResponse(BaseModel):
+    success: bool = Field(..., description="Succès de l'optimisation")
+    message: str = Field(..., description="Message")
+    optimized_route: List[Dict[str, Any]] = Field(..., description="Tournées optimisées, une par véhicule")
+    total_distance_km: float = Field(..., description="Distance totale en km")
+    estimated_total_time_minutes: float = Field(..., description="Durée totale estimée en minutes")
+    savings_vs_original: Dict[str, float] = Field(default_factory=dict, description="Gain par rapport à l'ordre soumis")
+
+
+class DemandForecastRequest(BaseModel):
+    zone: str = Field(..., description="Zone (ville, aoi...)")
+    start_date: date = Field(..., description="Premier jour de la prévision")
+    end_date: date = Field(..., description="Dernier jour de la prévision")
+
+    @validator('end_date')
+    def validate_dates(cls, v, values):
+        if 'start_date' in values and v < values['start_date']:
+            raise ValueError(f"end_date ({v}) doit être postérieure ou égale à start_date ({values['start_date']})")
+        return v
+
+
+class DemandForecastResponse(BaseModel):
+    success: bool = Field(..., description="Succès de la prévision")
+    message: str = Field(..., description="Message")
+    zone: str = Field(..., description="Zone")
+    forecasted_deliveries: List[Dict[str, Any]] = Field(..., description="Livraisons prévues par période")
+    peak_hours: List[int] = Field(default_factory=list, description="Heures de pointe")
+    confidence_interval: Dict[str, Any] = Field(default_factory=dict, description="Intervalle de confiance")
+
+
 # Schémas simplifiés pour l'interface web
 class SimplePickupRequest(BaseModel):
     """Version simplifiée pour l'interface web"""
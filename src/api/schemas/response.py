@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 
 class PredictionResponse(BaseModel):
@@ -10,6 +10,15 @@ class PredictionResponse(BaseModel):
     confidence_score: Optional[float] = Field(None, description="Score de confiance de la prédiction")
 
 
+class BatchPredictionResponse(BaseModel):
+    predictions: List[float] = Field(..., description="Valeurs prédites en minutes, dans l'ordre des lignes")
+    confidence_scores: List[float] = Field(..., description="Score de confiance de chaque prédiction")
+    model_version: str = Field(..., description="Version du modèle utilisé ('mixed' si plusieurs)")
+    model_versions: Optional[List[str]] = Field(None, description="Version du modèle de chaque ligne")
+    count: int = Field(..., description="Nombre de lignes prédites")
+    timestamp: datetime = Field(default_factory=datetime.now, description="Timestamp de la prédiction")
+
+
 class HealthResponse(BaseModel):
     status: str = Field(..., description="Statut de l'API")
     pickup_model_loaded: bool = Field(..., description="Modèle pickup chargé")
@@ -0,0 +1,123 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Bornes des histogrammes (style Prometheus : nombre d'observations <= borne)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+QUEUE_WAIT_MS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                'buckets': buckets,
+                'count': self.count,
+                'sum': round(self.sum, 3),
+                'mean': round(self.sum / self.count, 3) if self.count else None
+            }
+
+
+class MicroBatcher:
+    """Regroupe les requêtes concurrentes en un seul appel batch au modèle
+
+    Chaque appel à `submit` met une ligne en attente ; le lot part dès qu'il
+    atteint `max_batch_size` lignes ou que la plus ancienne attend depuis
+    `max_wait_ms`. `batch_fn(rows)` renvoie un résultat par ligne, dans
+    l'ordre, et chaque appelant récupère le sien. Si le lot échoue, les lignes
+    sont rejouées une à une pour n'attribuer l'erreur qu'aux lignes fautives.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 64,
+                 max_wait_ms: float = 2.0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+        self._pending = []  # (ligne, future, heure d'arrivée)
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, row: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+            self._run(batch)
+
+    def _run(self, batch: List[tuple]) -> None:
+        started = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for _, _, queued_at in batch:
+            self.queue_wait_ms.observe((started - queued_at) * 1000)
+
+        rows = [row for row, _, _ in batch]
+        try:
+            results = self.batch_fn(rows)
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch[0][1], exception=e)
+                return
+            logger.warning(f"Échec du lot de {len(batch)} lignes, reprise ligne par ligne : {e}")
+            for row, future, _ in batch:
+                try:
+                    self._resolve(future, self.batch_fn([row])[0])
+                except Exception as row_error:
+                    self._resolve(future, exception=row_error)
+            return
+        for (_, future, _), result in zip(batch, results):
+            self._resolve(future, result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, exception: Optional[Exception] = None) -> None:
+        # L'appelant a pu abandonner (timeout, déconnexion)
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms,
+            'pending': len(self._pending),
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_wait_ms': self.queue_wait_ms.snapshot()
+        }
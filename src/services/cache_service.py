@@ -0,0 +1,237 @@
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from ..utils.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryBackend:
+    """Stand-in du backend partagé (même interface que RedisBackend), pour les tests"""
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            return item[1]
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """Backend partagé entre processus / instances (service redis du docker-compose)"""
+
+    def __init__(self, url: str, prefix: str = "pred:"):
+        import redis  # dépendance optionnelle
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        self.client.setex(self.prefix + key, ttl, value)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+class PredictionCache:
+    """Cache des prédictions : LRU borné en mémoire + TTL, backend partagé optionnel
+
+    Les clés quantifient chaque feature lue par le modèle : coordonnées en
+    cellule de grille, horodatages en tranche horaire, durées et distance en
+    tranches, identifiants (coursier, aoi, ville) et heures / jours exacts.
+    Des demandes voisines partagent donc une entrée, mais deux demandes qui
+    diffèrent sur une feature (ex. temps d'attente) au-delà de sa tranche non.
+    Le backend partagé est consulté en cas d'absence locale ; ses erreurs sont
+    comptées puis ignorées (le cache ne doit jamais faire échouer une prédiction).
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: int = 3600, grid_deg: float = 0.005,
+                 hour_bucket: int = 1, minutes_bucket: float = 5.0, backend: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.grid_deg = grid_deg
+        self.hour_bucket = hour_bucket
+        self.minutes_bucket = minutes_bucket
+        self.backend = backend
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+                         'backend_hits': 0, 'backend_errors': 0}
+
+    @classmethod
+    def from_settings(cls, settings=None) -> 'PredictionCache':
+        settings = settings or get_settings()
+        backend = None
+        if settings.REDIS_URL:
+            try:
+                backend = RedisBackend(settings.REDIS_URL)
+            except ImportError:
+                logger.warning("REDIS_URL défini mais le paquet redis n'est pas installé : cache local uniquement")
+        return cls(max_entries=settings.CACHE_MAX_ENTRIES, ttl=settings.CACHE_TTL, grid_deg=settings.CACHE_GRID_DEG,
+                   minutes_bucket=settings.CACHE_MINUTES_BUCKET, backend=backend)
+
+    # ------------------------------------------------------------------ clés
+
+    def _cell(self, lat: float, lng: float) -> str:
+        return f"{math.floor(lat / self.grid_deg)}:{math.floor(lng / self.grid_deg)}"
+
+    def _hour(self, seconds: float) -> int:
+        return math.floor(seconds / (3600 * self.hour_bucket))
+
+    def _minutes(self, minutes: float) -> int:
+        return math.floor(minutes / self.minutes_bucket)
+
+    def _km(self, km: float) -> int:
+        # Même pas que la grille (1° de latitude ~ 111 km)
+        return math.floor(km / (self.grid_deg * 111.0))
+
+    def delivery_key(self, features: Any) -> str:
+        f = features
+        parts = (
+            f"c{f.courier_id}", f"aoi{f.aoi_id}", f"city{f.city_encoded}",
+            self._cell(f.lat, f.lng), self._cell(f.accept_gps_lat, f.accept_gps_lng),
+            self._cell(f.delivery_gps_lat, f.delivery_gps_lng),
+            self._hour(f.accept_time_seconds), self._hour(f.accept_gps_time_seconds),
+            self._hour(f.delivery_time_seconds), self._hour(f.delivery_gps_time_seconds),
+            f"m{self._minutes(f.delivery_time_minutes)}",
+            f"t{self._minutes(f.task_duration_seconds / 60)}:{self._minutes(f.task_duration_seconds_conv / 60)}",
+            # log de la durée : tranche d'un dixième (~10 % de la durée)
+            f"l{math.floor(f.log_task_duration * 10)}",
+            f"d{self._km(f.distance)}",
+            f"a{f.accept_hour}:{f.accept_day}", f"w{f.day_of_week}:{f.hour_of_day}",
+            f"r{f.delivery_hour}:{f.delivery_weekday}"
+        )
+        return "delivery|" + "|".join(map(str, parts))
+
+    def pickup_key(self, features: Any) -> str:
+        f = features.to_model_input()
+        parts = (
+            f"aoi{f['aoi_id']}", f"city{f['city_encoded']}",
+            self._cell(f['lat'], f['lng']), self._cell(f['pickup_gps_lat'], f['pickup_gps_lng']),
+            self._cell(f['accept_gps_lat'], f['accept_gps_lng']),
+            self._hour(f['accept_time_seconds']), self._hour(f['time_window_start_seconds']),
+            self._hour(f['time_window_end_seconds']), self._hour(f['pickup_time_seconds']),
+            self._hour(f['pickup_gps_time_seconds']), self._hour(f['accept_gps_time_seconds']),
+            f"m{self._minutes(f['waiting_time_minutes'])}",
+            f"p{f['pickup_hour']}:{f['pickup_weekday']}"
+        )
+        return "pickup|" + "|".join(map(str, parts))
+
+    # ----------------------------------------------------------------- accès
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                if item[0] > now:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return item[1]
+                del self._entries[key]
+                self.counters['expirations'] += 1
+
+        value = self._backend_get(key)
+        with self._lock:
+            if value is None:
+                self.counters['misses'] += 1
+                return None
+            self.counters['hits'] += 1
+            self.counters['backend_hits'] += 1
+        self._store(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._store(key, value)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, json.dumps(value), self.ttl)
+            except Exception as e:
+                self.counters['backend_errors'] += 1
+                logger.warning(f"Cache partagé indisponible (écriture) : {e}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def _store(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def _backend_get(self, key: str) -> Optional[Any]:
+        if self.backend is None:
+            return None
+        try:
+            raw = self.backend.get(key)
+            return json.loads(raw) if raw is not None else None
+        except Exception as e:
+            self.counters['backend_errors'] += 1
+            logger.warning(f"Cache partagé indisponible (lecture) : {e}")
+            return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            try:
+                self.backend.clear()
+            except Exception as e:
+                # Les entrées partagées expireront avec leur TTL
+                self.counters['backend_errors'] += 1
+                logger.warning(f"Cache partagé indisponible (purge) : {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hit_rate': round(self.counters['hits'] / lookups, 4) if lookups else None,
+                'backend': type(self.backend).__name__ if self.backend is not None else None
+            }
+
+
+# Instance globale du cache (créée à la première utilisation)
+_prediction_cache = None
+
+
+def get_prediction_cache() -> PredictionCache:
+    """Retourne le cache de prédictions (singleton)"""
+    global _prediction_cache
+    if _prediction_cache is None:
+        _prediction_cache = PredictionCache.from_settings()
+    return _prediction_cache
@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .model_registry import ModelBundle
+
+logger = logging.getLogger(__name__)
+
+
+class CityModelRegistry:
+    """Modèles spécifiques par ville, chargés au premier usage et gardés dans un LRU borné en mémoire
+
+    Disposition : <directory>/<pickup|delivery>/city_<code>.pkl, ou l'export
+    mappable <directory>/<pickup|delivery>/city_<code>/ (coef.npy + meta.json).
+    `get` renvoie None pour une ville sans modèle dédié : l'appelant retombe
+    sur le modèle global. Les absences sont mémorisées jusqu'au prochain `clear`.
+    """
+
+    def __init__(self, directory: Path, feature_names: Dict[str, List[str]], max_bytes: int):
+        self.directory = Path(directory)
+        self.feature_names = feature_names
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, ModelBundle]" = OrderedDict()
+        self._sizes: Dict[tuple, int] = {}
+        self._missing = set()
+        self._loading: Dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[tuple, Dict[str, float]] = {}
+        self.fallbacks = {name: 0 for name in feature_names}
+        self.evictions = 0
+
+    def _paths(self, name: str, city: int):
+        base = self.directory / name
+        return base / f"city_{city}.pkl", base / f"city_{city}"
+
+    def _model_stats(self, key: tuple) -> Dict[str, float]:
+        return self._stats.setdefault(key, {'hits': 0, 'loads': 0, 'evictions': 0, 'load_ms_total': 0.0,
+                                            'last_load_ms': 0.0})
+
+    def get(self, name: str, city: int) -> Optional[ModelBundle]:
+        key = (name, city)
+        with self._lock:
+            bundle = self._entries.get(key)
+            if bundle is not None:
+                self._entries.move_to_end(key)
+                self._model_stats(key)['hits'] += 1
+                return bundle
+            if key in self._missing or name not in self.feature_names:
+                self.fallbacks[name] = self.fallbacks.get(name, 0) + 1
+                return None
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Un seul chargement par modèle ; les autres villes restent servies pendant ce temps
+        with key_lock:
+            with self._lock:
+                bundle = self._entries.get(key)
+                if bundle is not None:
+                    self._model_stats(key)['hits'] += 1
+                    return bundle
+            bundle = self._load(name, city)
+            with self._lock:
+                self._loading.pop(key, None)
+                if bundle is None:
+                    self._missing.add(key)
+                    self.fallbacks[name] += 1
+                    return None
+                self._entries[key] = bundle
+                self._sizes[key] = bundle.memory_bytes()
+                self._evict(keep=key)
+            return bundle
+
+    def _load(self, name: str, city: int) -> Optional[ModelBundle]:
+        model_path, export_dir = self._paths(name, city)
+        if not model_path.exists() and not export_dir.exists():
+            return None
+        started = time.perf_counter()
+        bundle = ModelBundle({name: (model_path, export_dir)}, {name: self.feature_names[name]}, tag=f"_city{city}")
+        try:
+            if not bundle.warm():
+                return None
+        except Exception as e:
+            logger.error(f"Erreur chargement du modèle {name} de la ville {city} : {e}")
+            return None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            stats = self._model_stats((name, city))
+            stats['loads'] += 1
+            stats['load_ms_total'] += elapsed_ms
+            stats['last_load_ms'] = elapsed_ms
+        logger.info(f"Modèle {name} de la ville {city} chargé en {elapsed_ms:.1f} ms")
+        return bundle
+
+    def _evict(self, keep: tuple) -> None:
+        """Évince les modèles les moins récemment utilisés au-delà du budget mémoire (verrou tenu)"""
+        while sum(self._sizes.values()) > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            del self._entries[key]
+            del self._sizes[key]
+            self._model_stats(key)['evictions'] += 1
+            self.evictions += 1
+            logger.info(f"Modèle {key[0]} de la ville {key[1]} évincé du cache")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._missing.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {}
+            for (name, city), stats in self._stats.items():
+                lookups = stats['hits'] + stats['loads']
+                models[f"{name}/{city}"] = {
+                    'loaded': (name, city) in self._entries,
+                    'hits': stats['hits'],
+                    'loads': stats['loads'],
+                    'evictions': stats['evictions'],
+                    'hit_rate': round(stats['hits'] / lookups, 4) if lookups else None,
+                    'mean_load_ms': round(stats['load_ms_total'] / stats['loads'], 3) if stats['loads'] else None,
+                    'last_load_ms': round(stats['last_load_ms'], 3)
+                }
+            return {
+                'directory': str(self.directory),
+                'loaded': len(self._entries),
+                'memory_bytes': sum(self._sizes.values()),
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'fallbacks': dict(self.fallbacks),
+                'missing': sorted(f"{name}/{city}" for name, city in self._missing),
+                'models': models
+            }
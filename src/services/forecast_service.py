@@ -0,0 +1,314 @@
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import numpy as np
+
+from ..utils.config import get_settings
+from ..utils.database import DeliveryStore, get_delivery_store
+from ..utils.features import to_epoch_seconds
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+HOURS_PER_WEEK = 168
+# Quantile de la loi normale pour l'intervalle de confiance à 95 %
+Z_95 = 1.959964
+PEAK_HOURS = 3
+STORE_COLUMNS = ['city_encoded', 'aoi_id', 'accept_time_seconds']
+
+
+class UnknownZoneError(LookupError):
+    """Zone sans aucune livraison dans l'historique"""
+
+
+def normalize_zone(zone: str) -> str:
+    """'3' ou 'city:3' -> 'city:3' ; 'aoi:12' ; 'all' pour toutes les villes"""
+    zone = zone.strip().lower()
+    if zone.isdigit():
+        return f"city:{int(zone)}"
+    return zone
+
+
+class HourlyRollup:
+    """Nombre de livraisons par zone et par heure, dans une fenêtre glissante
+
+    Une matrice (zones, heures) d'entiers : ajouter un lot de livraisons
+    incrémente les cellules touchées, et la fenêtre avance d'un décalage de colonnes quand arrive
+    une heure plus récente. Chaque livraison compte pour sa ville
+    ('city:<code>'), son aoi ('aoi:<id>') et 'all'.
+    """
+
+    def __init__(self, hours: int):
+        self.hours = hours
+        self.zones: Dict[str, int] = {}
+        self.counts = np.zeros((0, hours), dtype=np.int32)
+        self.first_hour = np.zeros(0, dtype=np.int64)
+        self.end_hour: Optional[int] = None  # heure epoch (exclue) de la fin de la fenêtre
+        self.recorded = 0
+        self.dropped = 0
+
+    def _zone_rows(self, kind: str, codes: np.ndarray) -> np.ndarray:
+        values, inverse = np.unique(codes, return_inverse=True)
+        rows = np.array([self._zone(f"{kind}:{int(value)}") for value in values], dtype=np.int64)
+        return rows[inverse]
+
+    def _zone(self, name: str) -> int:
+        row = self.zones.get(name)
+        if row is None:
+            row = self.zones[name] = len(self.zones)
+            if row >= len(self.counts):
+                # Croissance par doublement : pas de réallocation à chaque nouvelle zone
+                grown = np.zeros((max(16, 2 * len(self.counts)), self.hours), dtype=np.int32)
+                grown[:len(self.counts)] = self.counts
+                self.counts = grown
+                first = np.full(len(grown), np.iinfo(np.int64).max, dtype=np.int64)
+                first[:len(self.first_hour)] = self.first_hour
+                self.first_hour = first
+        return row
+
+    def add(self, cities: np.ndarray, aois: Optional[np.ndarray], seconds: np.ndarray) -> int:
+        """Compte des livraisons (ville, aoi, heure d'acceptation en secondes epoch)"""
+        cities = np.asarray(cities, dtype=np.float64)
+        seconds = np.asarray(seconds, dtype=np.float64)
+        valid = np.isfinite(cities) & np.isfinite(seconds)
+        if not valid.any():
+            return 0
+        hours = np.floor_divide(seconds[valid], 3600).astype(np.int64)
+        cities = cities[valid]
+
+        newest = int(hours.max()) + 1
+        if self.end_hour is None:
+            self.end_hour = newest
+        elif newest > self.end_hour:
+            self._advance(newest)
+        start = self.end_hour - self.hours
+        recent = hours >= start
+        self.dropped += int((~recent).sum())
+
+        zone_rows = [self._zone_rows('city', cities), np.full(len(hours), self._zone('all'), dtype=np.int64)]
+        if aois is not None:
+            aois = np.asarray(aois, dtype=np.float64)[valid]
+            known = np.isfinite(aois)
+            aoi_rows = np.full(len(hours), -1, dtype=np.int64)
+            if known.any():
+                aoi_rows[known] = self._zone_rows('aoi', aois[known])
+            zone_rows.append(aoi_rows)
+
+        for rows in zone_rows:
+            keep = recent & (rows >= 0)
+            np.minimum.at(self.first_hour, rows[keep], hours[keep])
+            # Cellules (zone, heure) touchées seulement : le coût suit le lot, pas la taille de la matrice
+            cells, counts = np.unique(rows[keep] * self.hours + (hours[keep] - start), return_counts=True)
+            self.counts.reshape(-1)[cells] += counts.astype(np.int32)
+        self.recorded += int(recent.sum())
+        return int(recent.sum())
+
+    def _advance(self, end_hour: int) -> None:
+        shift = end_hour - self.end_hour
+        if shift >= self.hours:
+            self.counts[:] = 0
+        else:
+            self.counts[:, :-shift] = self.counts[:, shift:]
+            self.counts[:, -shift:] = 0
+        self.end_hour = end_hour
+
+    def memory_bytes(self) -> int:
+        return self.counts.nbytes + self.first_hour.nbytes
+
+
+class DemandForecaster:
+    """Prévision de la demande horaire par zone, servie depuis un état précalculé
+
+    Modèle saisonnier hebdomadaire ajusté pour toutes les zones d'un coup :
+    pour chaque heure de la semaine, moyenne et variance des semaines passées,
+    pondérées par `week_decay` (la semaine la plus récente pèse le plus). Le
+    réajustement est vectorisé (zones x semaines x 168) et n'a lieu qu'après
+    de nouvelles livraisons, au plus toutes les `refit_seconds` ; une
+    prévision n'est qu'une indexation dans les profils ajustés.
+    """
+
+    def __init__(self, store: Optional[DeliveryStore] = None, history_weeks: int = 8, week_decay: float = 0.8,
+                 refit_seconds: float = 60.0, max_days: int = 92):
+        self.store = store
+        self.history_weeks = history_weeks
+        self.week_decay = week_decay
+        self.refit_seconds = refit_seconds
+        self.max_days = max_days
+        # Une semaine de marge : la fenêtre d'ajustement exclut l'heure en cours
+        self.rollup = HourlyRollup((history_weeks + 1) * HOURS_PER_WEEK)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # (moyenne, variance, zones) publiés d'un seul bloc : une prévision lit toujours un ajustement complet
+        self._profiles: Optional[Tuple[np.ndarray, np.ndarray, Dict[str, int]]] = None
+        self._dirty = True
+        self.loaded = False
+        self.fitted_at: Optional[float] = None
+        self.fit_ms: Optional[float] = None
+
+    @classmethod
+    def from_settings(cls) -> 'DemandForecaster':
+        return cls(get_delivery_store(), settings.FORECAST_HISTORY_WEEKS, settings.FORECAST_WEEK_DECAY,
+                   settings.FORECAST_REFIT_SECONDS, settings.FORECAST_MAX_DAYS)
+
+    def load(self) -> int:
+        """Remplit les agrégats depuis l'historique, une seule fois (seules les colonnes ville, aoi et heure sont lues)"""
+        with self._load_lock:
+            if self.loaded:
+                return 0
+            rows = 0
+            if self.store is not None:
+                start = date.today() - timedelta(weeks=self.history_weeks + 1)
+                for chunk in self.store.scan(STORE_COLUMNS, start=start):
+                    with self._lock:
+                        rows += self.rollup.add(chunk['city_encoded'], chunk['aoi_id'], chunk['accept_time_seconds'])
+            with self._lock:
+                self._dirty = True
+                self.loaded = True
+        logger.info(f"Prévision de la demande : {rows} livraisons chargées, {len(self.rollup.zones)} zones")
+        return rows
+
+    def record(self, columns: Mapping[str, Any], persist: bool = False) -> int:
+        """Livraisons terminées : mise à jour des agrégats (et de l'historique si `persist`)"""
+        if 'city_encoded' not in columns:
+            raise ValueError("Colonne city_encoded manquante")
+        if 'accept_time_seconds' in columns:
+            seconds = to_epoch_seconds(columns['accept_time_seconds'])
+        elif 'accept_time' in columns:
+            seconds = to_epoch_seconds(columns['accept_time'])
+        else:
+            raise ValueError("Colonne accept_time (ou accept_time_seconds) manquante")
+        # Historique chargé d'abord : une livraison écrite pendant le chargement serait comptée deux fois
+        self.load()
+        if persist and self.store is not None:
+            self.store.append({**columns, 'accept_time_seconds': seconds})
+        with self._lock:
+            added = self.rollup.add(columns['city_encoded'], columns.get('aoi_id'), seconds)
+            self._dirty = True
+        return added
+
+    def fit(self) -> None:
+        """Profils hebdomadaires (moyenne, variance) de toutes les zones en une passe numpy"""
+        started = time.perf_counter()
+        with self._lock:
+            rollup = self.rollup
+            if rollup.end_hour is None:
+                self._profiles = None
+                self._dirty = False
+                return
+            zone_count = len(rollup.zones)
+            weeks = self.history_weeks
+            # Semaines complètes se terminant juste avant l'heure en cours (incomplète)
+            end = rollup.hours - 1
+            window = rollup.counts[:zone_count, end - weeks * HOURS_PER_WEEK:end].astype(np.float64)
+            first_hour = rollup.first_hour[:zone_count].copy()
+            window_start = rollup.end_hour - 1 - weeks * HOURS_PER_WEEK
+            zones = dict(rollup.zones)
+            self._dirty = False
+
+        blocks = window.reshape(zone_count, weeks, HOURS_PER_WEEK)
+        week_ends = window_start + HOURS_PER_WEEK * np.arange(1, weeks + 1)
+        # Poids décroissants vers le passé ; une semaine antérieure à la première livraison de la zone ne compte pas
+        weights = self.week_decay ** np.arange(weeks - 1, -1, -1, dtype=np.float64)
+        weights = weights[None, :] * (week_ends[None, :] > first_hour[:, None])
+        total = weights.sum(axis=1, keepdims=True)
+        total[total == 0] = 1.0
+        mean = np.einsum('zk,zkh->zh', weights, blocks) / total
+        variance = np.einsum('zk,zkh->zh', weights, (blocks - mean[:, None, :]) ** 2) / total
+
+        # Colonnes de la fenêtre -> heure de la semaine (0 = lundi 0h, UTC)
+        first_of_week = self.hour_of_week(np.array([window_start]))[0]
+        order = (np.arange(HOURS_PER_WEEK) - first_of_week) % HOURS_PER_WEEK
+        with self._lock:
+            self._profiles = (mean[:, order], variance[:, order], zones)
+            self.fitted_at = time.time()
+            self.fit_ms = (time.perf_counter() - started) * 1000
+
+    @staticmethod
+    def hour_of_week(epoch_hours: np.ndarray) -> np.ndarray:
+        # 1970-01-01 était un jeudi (jour 3)
+        return ((np.floor_divide(epoch_hours, 24) + 3) % 7) * 24 + epoch_hours % 24
+
+    def _ensure_fitted(self) -> None:
+        if not self.loaded:
+            self.load()
+        stale = self.fitted_at is None or time.time() - self.fitted_at >= self.refit_seconds
+        if (self._profiles is None and self.rollup.end_hour is not None) or (self._dirty and stale):
+            self.fit()
+
+    def forecast(self, zone: str, start: date, end: date) -> Dict[str, Any]:
+        """Livraisons prévues par jour, heures de pointe et intervalle de confiance à 95 %"""
+        days = (end - start).days + 1
+        if days <= 0:
+            raise ValueError("end_date doit être postérieure ou égale à start_date")
+        if days > self.max_days:
+            raise ValueError(f"Horizon limité à {self.max_days} jours")
+        self._ensure_fitted()
+
+        name = normalize_zone(zone)
+        profiles = self._profiles
+        if profiles is None or name not in profiles[2]:
+            raise UnknownZoneError(f"Zone inconnue : {zone} (exemples : 'city:3', 'aoi:12', 'all')")
+        mean, variance, zones = profiles
+        row = zones[name]
+
+        first_hour = (start - date(1970, 1, 1)).days * 24
+        how = self.hour_of_week(first_hour + np.arange(days * 24))
+        hourly = mean[row, how].reshape(days, 24)
+        # Variance au moins poissonnienne : une heure stable mais rare reste incertaine
+        hourly_variance = np.maximum(variance[row, how], mean[row, how]).reshape(days, 24)
+        daily = hourly.sum(axis=1)
+        daily_sigma = np.sqrt(hourly_variance.sum(axis=1))
+
+        profile = hourly.mean(axis=0)
+        peaks = [int(hour) for hour in np.argsort(-profile, kind='stable')[:PEAK_HOURS] if profile[hour] > 0]
+        total = float(daily.sum())
+        total_sigma = float(np.sqrt(hourly_variance.sum()))
+        return {
+            'forecasted_deliveries': [
+                {
+                    'date': (start + timedelta(days=i)).isoformat(),
+                    'deliveries': round(float(daily[i]), 1),
+                    'lower': round(max(0.0, float(daily[i] - Z_95 * daily_sigma[i])), 1),
+                    'upper': round(float(daily[i] + Z_95 * daily_sigma[i]), 1)
+                }
+                for i in range(days)
+            ],
+            'peak_hours': peaks,
+            'confidence_interval': {
+                'level': 0.95,
+                'total': round(total, 1),
+                'lower': round(max(0.0, total - Z_95 * total_sigma), 1),
+                'upper': round(total + Z_95 * total_sigma, 1)
+            }
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        rollup = self.rollup
+        return {
+            'loaded': self.loaded,
+            'zones': len(rollup.zones),
+            'history_weeks': self.history_weeks,
+            'history_end': ((datetime(1970, 1, 1) + timedelta(hours=rollup.end_hour)).isoformat()
+                            if rollup.end_hour is not None else None),
+            'recorded': rollup.recorded,
+            'dropped': rollup.dropped,
+            'memory_bytes': rollup.memory_bytes(),
+            'fitted_at': datetime.fromtimestamp(self.fitted_at).isoformat() if self.fitted_at else None,
+            'fit_ms': round(self.fit_ms, 3) if self.fit_ms is not None else None
+        }
+
+
+_forecaster: Optional[DemandForecaster] = None
+_forecaster_lock = threading.Lock()
+
+
+def get_demand_forecaster() -> DemandForecaster:
+    global _forecaster
+    if _forecaster is None:
+        with _forecaster_lock:
+            if _forecaster is None:
+                _forecaster = DemandForecaster.from_settings()
+    return _forecaster
@@ -0,0 +1,54 @@
+import logging
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LinearScorer:
+    """Score d'un modèle linéaire (Lasso...) par simple produit scalaire
+
+    Les coefficients sont extraits et permutés une seule fois dans l'ordre des
+    features de l'API ; les features du modèle absentes de l'API (order_id...)
+    sont ignorées, ce qui équivaut au reindex avec fill_value=0. Aucun
+    DataFrame ni validation sklearn au moment du score.
+    """
+
+    def __init__(self, coef: np.ndarray, intercept: float, feature_names: List[str]):
+        # Sans copie pour un export float64 mappé en mémoire : les pages restent partagées entre processus
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.feature_names = list(feature_names)
+
+    @classmethod
+    def from_model(cls, model: Any, feature_names: List[str]) -> Optional['LinearScorer']:
+        """Compiler un régresseur linéaire ; None si le modèle n'est pas linéaire (repli sklearn)"""
+        coef = getattr(model, 'coef_', None)
+        intercept = getattr(model, 'intercept_', None)
+        if coef is None or intercept is None or np.ndim(coef) != 1 or np.ndim(intercept) != 0:
+            return None
+        if getattr(model, '_estimator_type', 'regressor') != 'regressor':
+            return None
+
+        coef = np.asarray(coef, dtype=np.float64)
+        model_features = getattr(model, 'feature_names_in_', None)
+        if model_features is None:
+            # Sans noms de features, le modèle attend exactement l'ordre de l'API
+            if len(coef) != len(feature_names):
+                return None
+            return cls(coef, intercept, feature_names)
+
+        weight = dict(zip(model_features, coef.tolist()))
+        ignored = [name for name in model_features if name not in feature_names]
+        if ignored:
+            logger.info(f"Features du modèle absentes de l'API (valeur 0) : {ignored}")
+        return cls(np.array([weight.get(name, 0.0) for name in feature_names]), intercept, feature_names)
+
+    def score(self, row: Sequence[float]) -> float:
+        """Prédiction pour une ligne (ordre des features de l'API)"""
+        return float(np.dot(np.asarray(row, dtype=np.float64), self.coef)) + self.intercept
+
+    def score_batch(self, matrix: np.ndarray) -> np.ndarray:
+        """Prédictions pour une matrice (N, n_features) dans l'ordre de l'API"""
+        return np.asarray(matrix, dtype=np.float64) @ self.coef + self.intercept
@@ -0,0 +1,279 @@
+import logging
+import pickle
+import threading
+import warnings
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import model_store
+from .linear_scorer import LinearScorer
+
+logger = logging.getLogger(__name__)
+
+# Nombre de versions gardées dans l'historique du registre
+HISTORY_SIZE = 20
+
+
+def fingerprint(sources: Dict[str, Tuple[Path, Path]]) -> Tuple:
+    """Empreinte (taille, mtime) des fichiers d'un jeu de modèles, pour détecter un changement"""
+    files = []
+    for name in sorted(sources):
+        model_path, export_dir = sources[name]
+        for path in (model_path, export_dir / model_store.META_FILE, export_dir / model_store.COEF_FILE):
+            try:
+                stat = path.stat()
+                files.append((str(path), stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                files.append((str(path), None, None))
+    return tuple(files)
+
+
+class ModelBundle:
+    """Une version des modèles pickup / delivery
+
+    Chargée paresseusement (export mappé en mémoire, sinon pickle), puis
+    jamais modifiée : le registre remplace le bundle entier, et une requête
+    qui a lu `registry.current` utilise la même version du début à la fin.
+    """
+
+    def __init__(self, sources: Dict[str, Tuple[Path, Path]], feature_names: Dict[str, List[str]], tag: str = ''):
+        self.sources = sources
+        self.feature_names = feature_names
+        self.tag = tag
+        self.fingerprint = fingerprint(sources)
+        self.loaded_at = datetime.now()
+        self._models = {}
+        self._scorers = {}
+        self._origins = {}
+        self._versions = {}
+        self._column_maps = {}
+        self._lock = threading.RLock()
+
+    def model(self, name: str):
+        """Modèle sklearn (pickle), chargé au premier appel ; None s'il est absent"""
+        if name not in self._models:
+            with self._lock:
+                if name not in self._models:
+                    self._models[name] = self._unpickle(name)
+        return self._models[name]
+
+    def _unpickle(self, name: str):
+        model_path, _ = self.sources[name]
+        if not model_path.exists():
+            logger.warning(f"Fichier {model_path} introuvable")
+            return None
+        try:
+            with open(model_path, 'rb') as f:
+                model = pickle.load(f)
+            logger.info(f"Modèle {name} chargé avec succès depuis {model_path}")
+            return model
+        except Exception as e:
+            logger.error(f"Erreur chargement {model_path} : {e}")
+            return None
+
+    def scorer(self, name: str) -> Optional[LinearScorer]:
+        """Score linéaire : export mappé en mémoire s'il est à jour, sinon compilé depuis le pickle"""
+        if name not in self._scorers:
+            with self._lock:
+                if name not in self._scorers:
+                    self._scorers[name] = self._load_scorer(name)
+        return self._scorers[name]
+
+    def _load_scorer(self, name: str) -> Optional[LinearScorer]:
+        model_path, export_dir = self.sources[name]
+        meta = model_store.read_meta(export_dir)
+        if meta is not None and model_store.is_stale(meta, model_path):
+            logger.warning(f"Export {export_dir} plus ancien que {model_path}, repli sur le pickle")
+        elif meta is not None:
+            scorer = model_store.load_linear_scorer(export_dir, self.feature_names[name])
+            if scorer is not None:
+                logger.info(f"Modèle {name} mappé en mémoire depuis {export_dir}")
+                self._origins[name] = 'mmap'
+                self._versions[name] = self._version(name + self.tag, meta['model_type'], meta.get('source_sha256'))
+                return scorer
+
+        # Modèles linéaires : produit scalaire direct, sinon repli sur sklearn
+        model = self.model(name)
+        if model is None:
+            self._origins[name] = None
+            return None
+        self._origins[name] = 'pickle'
+        self._versions[name] = self._version(name + self.tag, type(model).__name__, model_store.file_sha256(model_path))
+        return LinearScorer.from_model(model, self.feature_names[name])
+
+    @staticmethod
+    def _version(name: str, model_type: str, sha256: Optional[str]) -> str:
+        # Version dérivée du contenu du pickle : deux processus servant le même fichier l'annoncent pareil
+        return f"{model_type.lower()}_{name}_{sha256[:12] if sha256 else 'unknown'}"
+
+    def available(self, name: str) -> bool:
+        if name not in self.sources:
+            return False
+        return self.scorer(name) is not None or self.model(name) is not None
+
+    def origin(self, name: str) -> Optional[str]:
+        self.scorer(name)
+        return self._origins.get(name)
+
+    def version(self, name: str) -> Optional[str]:
+        self.scorer(name)
+        return self._versions.get(name)
+
+    def memory_bytes(self) -> int:
+        """Estimation de la mémoire occupée : coefficients mappés, sinon taille du pickle"""
+        total = 0
+        for name, (model_path, _) in self.sources.items():
+            scorer = self._scorers.get(name)
+            if self._origins.get(name) == 'mmap' and scorer is not None:
+                total += scorer.coef.nbytes
+            elif self._models.get(name) is not None:
+                total += model_path.stat().st_size
+        return total
+
+    def predict_matrix(self, name: str, features: np.ndarray) -> np.ndarray:
+        """Un seul predict sur une matrice (N, n_features) remise dans l'ordre du modèle"""
+        scorer = self.scorer(name)
+        if scorer is not None:
+            return scorer.score_batch(features)
+        model = self.model(name)
+        columns = self._column_map(name, model)
+        if columns is not None:
+            # Colonnes attendues par le modèle, à zéro si l'API ne les fournit pas
+            matrix = np.zeros((len(features), len(columns)))
+            present = columns >= 0
+            matrix[:, present] = features[:, columns[present]]
+            features = matrix
+        with warnings.catch_warnings():
+            # Matrice numpy sans noms de colonnes : l'ordre est déjà celui du modèle
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            return np.asarray(model.predict(features), dtype=np.float64).ravel()
+
+    def _column_map(self, name: str, model) -> Optional[np.ndarray]:
+        """Indice de chaque feature du modèle dans l'ordre de l'API (-1 si absente), calculé une fois"""
+        if not hasattr(model, 'feature_names_in_'):
+            return None
+        if name not in self._column_maps:
+            position = {feature: i for i, feature in enumerate(self.feature_names[name])}
+            self._column_maps[name] = np.array([position.get(feature, -1) for feature in model.feature_names_in_])
+        return self._column_maps[name]
+
+    def warm(self) -> List[str]:
+        """Charge les modèles et fait une prédiction à blanc ; renvoie les modèles disponibles"""
+        loaded = []
+        for name, feature_names in self.feature_names.items():
+            if not self.available(name):
+                continue
+            self.predict_matrix(name, np.zeros((1, len(feature_names))))
+            loaded.append(name)
+        return loaded
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            name: {'version': self.version(name), 'source': self.origin(name)}
+            for name in self.feature_names
+        }
+
+
+class ModelRegistry:
+    """Registre versionné : le bundle courant est remplacé d'un bloc
+
+    Une nouvelle version est chargée et préchauffée à côté de la version
+    servie, puis installée par une seule affectation de référence : les
+    requêtes en cours finissent sur l'ancienne, aucune ne voit d'état
+    intermédiaire. Un thread de surveillance peut recharger automatiquement
+    quand les fichiers des modèles changent.
+    """
+
+    def __init__(self, bundle_factory: Callable[[], ModelBundle],
+                 on_swap: Optional[Callable[[ModelBundle], None]] = None):
+        self._factory = bundle_factory
+        self._on_swap = on_swap
+        self._current = bundle_factory()
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.swaps = 0
+        self.failed_reloads = 0
+
+    @property
+    def current(self) -> ModelBundle:
+        return self._current
+
+    def reload(self) -> ModelBundle:
+        """Charge, préchauffe puis installe une nouvelle version (l'ancienne reste servie en cas d'échec)"""
+        with self._reload_lock:
+            bundle = self._factory()
+            loaded = bundle.warm()
+            previous = [name for name in self._current.feature_names if self._current.available(name)]
+            missing = [name for name in previous if name not in loaded]
+            if missing:
+                self.failed_reloads += 1
+                raise ValueError(f"Nouvelle version incomplète (modèles absents : {missing}), version courante conservée")
+
+            self._current = bundle
+            self.swaps += 1
+            self.history.append({'activated_at': datetime.now().isoformat(), 'models': bundle.describe()})
+            logger.info(f"Nouvelle version des modèles installée : {bundle.describe()}")
+
+        if self._on_swap is not None:
+            self._on_swap(bundle)
+        return bundle
+
+    def reload_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self._safe_reload, name="model-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def _safe_reload(self) -> None:
+        try:
+            self.reload()
+        except Exception as e:
+            logger.error(f"Erreur rechargement des modèles : {e}")
+
+    def start_watching(self, interval: float) -> None:
+        """Surveille les fichiers des modèles toutes les `interval` secondes"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval: float) -> None:
+        pending, failed = None, None
+        while not self._stop_watching.wait(interval):
+            current = fingerprint(self._current.sources)
+            if current == self._current.fingerprint or current == failed:
+                pending = None
+                continue
+            # Attendre une empreinte stable sur deux passages : la copie du fichier est peut-être en cours
+            if current != pending:
+                pending = current
+                continue
+            logger.info("Fichiers des modèles modifiés, rechargement")
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Erreur rechargement des modèles : {e}")
+                failed = current
+            pending = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'current': self._current.describe(),
+            'loaded_at': self._current.loaded_at.isoformat(),
+            'swaps': self.swaps,
+            'failed_reloads': self.failed_reloads,
+            'watching': self._watcher is not None and self._watcher.is_alive(),
+            'history': list(self.history)
+        }
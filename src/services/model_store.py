@@ -0,0 +1,83 @@
+import hashlib
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .linear_scorer import LinearScorer
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+COEF_FILE = "coef.npy"
+META_FILE = "meta.json"
+
+
+def export_linear_model(model: Any, feature_names: List[str], directory: Path,
+                        source: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """Exporte un modèle linéaire en coef.npy + meta.json (None si le modèle n'est pas linéaire)
+
+    Les coefficients sont écrits déjà permutés dans l'ordre des features de
+    l'API, en float64 contigu : le fichier peut être mappé tel quel.
+    """
+    scorer = LinearScorer.from_model(model, feature_names)
+    if scorer is None:
+        return None
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    np.save(directory / COEF_FILE, scorer.coef)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "model_type": type(model).__name__,
+        "intercept": scorer.intercept,
+        "feature_names": scorer.feature_names,
+        "source": str(source) if source is not None else None,
+        "source_mtime": Path(source).stat().st_mtime if source is not None else None,
+        "source_sha256": file_sha256(source) if source is not None else None,
+        "exported_at": datetime.now().isoformat()
+    }
+    # Écriture atomique : un lecteur ne voit jamais un meta.json partiel
+    tmp = directory / (META_FILE + ".tmp")
+    tmp.write_text(json.dumps(meta, indent=2))
+    tmp.replace(directory / META_FILE)
+    return meta
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_meta(directory: Path) -> Optional[Dict[str, Any]]:
+    path = Path(directory) / META_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def is_stale(meta: Dict[str, Any], source: Path) -> bool:
+    """Le pickle source a changé depuis l'export"""
+    source = Path(source)
+    return (source.exists() and meta.get("source_mtime") is not None
+            and source.stat().st_mtime > meta["source_mtime"])
+
+
+def load_linear_scorer(directory: Path, feature_names: List[str]) -> Optional[LinearScorer]:
+    """Charge un export en mémoire mappée (pages partagées entre processus) ; None si absent ou incompatible"""
+    directory = Path(directory)
+    meta = read_meta(directory)
+    if meta is None:
+        return None
+    if meta.get("format_version") != FORMAT_VERSION or meta.get("feature_names") != list(feature_names):
+        logger.warning(f"Export {directory} incompatible avec les features de l'API, ignoré")
+        return None
+
+    coef = np.load(directory / COEF_FILE, mmap_mode='r')
+    return LinearScorer(coef, meta["intercept"], meta["feature_names"])
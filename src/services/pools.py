@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .batching import Histogram, QUEUE_WAIT_MS_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+RUN_MS_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolSaturatedError(RuntimeError):
+    """File du pool pleine : la requête est refusée plutôt que mise en attente sans limite"""
+
+
+def _timed(fn: Callable, args: tuple, kwargs: dict):
+    # Exécuté dans le worker (thread ou processus) : heure de début murale, comparable entre processus
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time() - started, result
+
+
+class BoundedPool:
+    """Pool de threads ou de processus à file bornée, utilisable depuis la boucle asyncio
+
+    Au plus `workers` tâches tournent et `max_queue` attendent ; au-delà,
+    `run` lève PoolSaturatedError immédiatement. L'exécuteur est créé au
+    premier usage. Pour un pool de processus, la fonction et ses arguments
+    doivent être picklables (fonction de module).
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int, kind: str = 'thread'):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Type de pool inconnu : {kind}")
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.counters = {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0}
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+        self.run_ms = Histogram(RUN_MS_BUCKETS)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == 'process':
+                # spawn : pas de fork d'un processus qui a déjà des threads (watcher, shadow...)
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.counters['rejected'] += 1
+                raise PoolSaturatedError(f"Pool {self.name} saturé ({self.in_flight} tâches en cours ou en attente)")
+            self.in_flight += 1
+            self.counters['submitted'] += 1
+            executor = self._get_executor()
+
+        submitted = time.time()
+        try:
+            started, elapsed, result = await asyncio.wrap_future(executor.submit(_timed, fn, args, kwargs))
+        except Exception:
+            with self._lock:
+                self.counters['failed'] += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        with self._lock:
+            self.counters['completed'] += 1
+        self.queue_wait_ms.observe(max(0.0, started - submitted) * 1000)
+        self.run_ms.observe(elapsed * 1000)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self.in_flight
+            counters = dict(self.counters)
+        return {
+            'kind': self.kind,
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'running': min(in_flight, self.workers),
+            'queued': max(0, in_flight - self.workers),
+            'saturation': round(in_flight / (self.workers + self.max_queue), 3),
+            **counters,
+            'queue_wait_ms': self.queue_wait_ms.snapshot(),
+            'run_ms': self.run_ms.snapshot()
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
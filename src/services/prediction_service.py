@@ -1,87 +1,224 @@
-import pickle
-import pandas as pd
+import numpy as np
 import logging
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
+from datetime import datetime, timedelta
 
-from ..api.schemas.prediction import PickupFeatures, DeliveryFeatures
+from ..api.schemas.prediction import (
+    PickupFeatures,
+    DeliveryFeatures,
+    DeliveryPredictionRequest,
+    RouteOptimizationRequest,
+    DemandForecastRequest
+)
 from ..utils.config import get_settings
+from ..utils.features import DELIVERY_FEATURE_NAMES, PICKUP_FEATURE_NAMES, delivery_features, feature_matrix
+from .linear_scorer import LinearScorer
+from .model_registry import ModelBundle, ModelRegistry
+from .shadow import PredictionRecorder, ShadowScorer
+from .city_models import CityModelRegistry
+from .pools import BoundedPool
+from .forecast_service import DemandForecaster, get_demand_forecaster
+from .batching import MicroBatcher
+from .cache_service import get_prediction_cache
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
 class ModelManager:
+    """Modèles pickup / delivery chargés à la demande
+
+    L'import du module ne charge rien : au premier usage, on mappe en mémoire
+    l'export numpy (scripts/export_models.py) s'il est à jour, ce qui partage
+    les pages entre les workers ; sinon on retombe sur le pickle. Les modèles
+    vivent dans un bundle versionné que `reload_models` remplace d'un bloc.
+    """
+
+    # Ordre des features de l'API, partagé avec l'entraînement (utils/features.py)
+    DELIVERY_FEATURE_NAMES = DELIVERY_FEATURE_NAMES
+    PICKUP_FEATURE_NAMES = PICKUP_FEATURE_NAMES
+
     def __init__(self):
-        self.model_pickup = None
-        self.model_delivery = None
-        self.pickup_feature_names = None
-        self.delivery_feature_names = None
-        self.model_load_time = None
-        self._load_models()
-
-    def _load_models(self):
-        """Charge les modèles pickle"""
-        self.model_load_time = datetime.now()
-        
-        # Chargement du modèle pickup
-        pickup_path = Path(settings.PICKUP_MODEL_PATH)
-        if pickup_path.exists():
-            try:
-                with open(pickup_path, 'rb') as f:
-                    self.model_pickup = pickle.load(f)
-                logger.info(f"Modèle pickup chargé avec succès depuis {pickup_path}")
-            except Exception as e:
-                logger.error(f"Erreur chargement {pickup_path} : {e}")
-        else:
-            logger.warning(f"Fichier {pickup_path} introuvable")
-
-        # Chargement du modèle delivery
-        delivery_path = Path(settings.DELIVERY_MODEL_PATH)
-        if delivery_path.exists():
-            try:
-                with open(delivery_path, 'rb') as f:
-                    self.model_delivery = pickle.load(f)
-                logger.info(f"Modèle delivery chargé avec succès depuis {delivery_path}")
-            except Exception as e:
-                logger.error(f"Erreur chargement {delivery_path} : {e}")
+        self.pickup_feature_names = list(self.PICKUP_FEATURE_NAMES)
+        self.delivery_feature_names = list(self.DELIVERY_FEATURE_NAMES)
+        self.registry = ModelRegistry(self._new_bundle, on_swap=self._on_swap)
+        self.shadow = self._new_shadow()
+        self.city_models = self._new_city_models()
+
+    def _new_bundle(self) -> ModelBundle:
+        return self._bundle(
+            {'pickup': settings.PICKUP_MODEL_PATH, 'delivery': settings.DELIVERY_MODEL_PATH},
+            Path(settings.MODEL_EXPORT_DIR)
+        )
+
+    def _new_candidate_bundle(self) -> ModelBundle:
+        return self._bundle(
+            {'pickup': settings.CANDIDATE_PICKUP_MODEL_PATH, 'delivery': settings.CANDIDATE_DELIVERY_MODEL_PATH},
+            Path(settings.MODEL_EXPORT_DIR) / 'candidate'
+        )
+
+    def _bundle(self, model_paths: Dict[str, str], export_dir: Path) -> ModelBundle:
+        names = [name for name, path in model_paths.items() if path]
+        sources = {name: (Path(model_paths[name]), export_dir / name) for name in names}
+        feature_names = {'pickup': self.pickup_feature_names, 'delivery': self.delivery_feature_names}
+        return ModelBundle(sources, {name: feature_names[name] for name in names})
+
+    def _new_shadow(self) -> Optional[ShadowScorer]:
+        """Modèle candidat (shadow / canary), seulement si un chemin candidat est configuré"""
+        if not (settings.CANDIDATE_PICKUP_MODEL_PATH or settings.CANDIDATE_DELIVERY_MODEL_PATH):
+            return None
+        return ShadowScorer(
+            ModelRegistry(self._new_candidate_bundle),
+            PredictionRecorder(settings.SHADOW_MAX_RECORDS),
+            shadow_fraction=settings.SHADOW_FRACTION,
+            canary_fraction=settings.CANARY_FRACTION,
+            max_queue=settings.SHADOW_QUEUE_SIZE,
+            workers=settings.SHADOW_WORKERS
+        )
+
+    def _new_city_models(self) -> Optional[CityModelRegistry]:
+        """Modèles par ville, seulement si le répertoire existe"""
+        directory = Path(settings.CITY_MODEL_DIR) if settings.CITY_MODEL_DIR else None
+        if directory is None or not directory.is_dir():
+            return None
+        return CityModelRegistry(
+            directory,
+            {'pickup': self.pickup_feature_names, 'delivery': self.delivery_feature_names},
+            max_bytes=int(settings.CITY_MODEL_MAX_MB * 1024 * 1024)
+        )
+
+    def _city_bundle(self, name: str, city: int, bundle: ModelBundle, canary: bool) -> ModelBundle:
+        """Modèle dédié à la ville s'il existe, sinon le modèle global (le trafic canary reste sur le candidat)"""
+        if canary or self.city_models is None:
+            return bundle
+        return self.city_models.get(name, int(city)) or bundle
+
+    def _predict_by_city(self, name: str, bundle: ModelBundle, features: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+        """Prédictions d'une matrice, chaque groupe de lignes d'une même ville par le modèle de la ville"""
+        if self.city_models is None:
+            return bundle.predict_matrix(name, features), [bundle.version(name)] * len(features)
+        cities = features[:, self._feature_names(name).index('city_encoded')].astype(np.int64)
+        predictions = np.empty(len(features))
+        versions = np.empty(len(features), dtype=object)
+        for city in np.unique(cities):
+            rows = np.flatnonzero(cities == city)
+            city_bundle = self._city_bundle(name, city, bundle, False)
+            predictions[rows] = city_bundle.predict_matrix(name, features[rows])
+            versions[rows] = city_bundle.version(name)
+        return predictions, versions.tolist()
+
+    def _feature_names(self, name: str) -> List[str]:
+        return self.pickup_feature_names if name == 'pickup' else self.delivery_feature_names
+
+    @staticmethod
+    def _batch_version(versions: List[str]) -> str:
+        return versions[0] if len(set(versions)) == 1 else "mixed"
+
+    def _predict_rows(self, name: str, features: np.ndarray) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """Prédictions d'une matrice : les lignes tirées pour le canary par le candidat, les autres par le modèle servi
+
+        Renvoie les prédictions, la version de chaque ligne et le masque des
+        lignes canary ; seules les lignes servies peuvent être rejouées en shadow.
+        """
+        bundle = self.registry.current
+        if not bundle.available(name):
+            raise ValueError(f"Modèle {name} non disponible")
+        candidate, canary = (self.shadow.canary_rows(name, len(features)) if self.shadow is not None
+                             else (None, np.zeros(len(features), dtype=bool)))
+        predictions = np.empty(len(features))
+        versions = np.empty(len(features), dtype=object)
+        primary = ~canary
+        if primary.any():
+            predictions[primary], versions[primary] = self._predict_by_city(name, bundle, features[primary])
+            self._after_prediction(name, bundle, False, features[primary], predictions[primary])
+        if canary.any():
+            predictions[canary] = candidate.predict_matrix(name, features[canary])
+            versions[canary] = candidate.version(name)
+            self._after_prediction(name, candidate, True, features[canary], predictions[canary])
+        return predictions, versions.tolist(), canary
+
+    def _serving_bundle(self, name: str) -> Tuple[ModelBundle, bool]:
+        """Bundle qui sert la requête : le candidat pour la part canary du trafic"""
+        if self.shadow is not None:
+            bundle = self.shadow.canary_bundle(name)
+            if bundle is not None:
+                return bundle, True
+        return self.registry.current, False
+
+    def _after_prediction(self, name: str, bundle: ModelBundle, canary: bool, rows, predictions) -> None:
+        """Enregistre la prédiction canary, ou la rejoue en shadow (sans attendre le candidat)"""
+        if self.shadow is None:
+            return
+        if canary:
+            self.shadow.record_canary(name, predictions, bundle.version(name))
         else:
-            logger.warning(f"Fichier {delivery_path} introuvable")
-
-        # Définition des noms de features pour delivery
-        self.delivery_feature_names = [
-            'courier_id', 'lng', 'lat', 'aoi_id',
-            'accept_time_seconds', 'accept_gps_time_seconds', 'accept_gps_lng', 'accept_gps_lat',
-            'delivery_time_seconds', 'delivery_gps_time_seconds', 'delivery_gps_lng', 'delivery_gps_lat',
-            'delivery_time_minutes', 'accept_hour', 'accept_day', 'city_encoded', 'distance',
-            'day_of_week', 'hour_of_day', 'task_duration_seconds', 'log_task_duration',
-            'delivery_hour', 'delivery_weekday', 'task_duration_seconds_conv'
-        ]
+            self.shadow.observe(name, rows, predictions, bundle.version(name))
+
+    def _on_swap(self, bundle: ModelBundle) -> None:
+        # Les prédictions en cache viennent de l'ancienne version
+        get_prediction_cache().clear()
+        if self.city_models is not None:
+            self.city_models.clear()
+
+    @property
+    def model_pickup(self):
+        return self.registry.current.model('pickup')
+
+    @property
+    def model_delivery(self):
+        return self.registry.current.model('delivery')
+
+    @property
+    def pickup_scorer(self) -> Optional[LinearScorer]:
+        return self.registry.current.scorer('pickup')
+
+    @property
+    def delivery_scorer(self) -> Optional[LinearScorer]:
+        return self.registry.current.scorer('delivery')
+
+    @property
+    def model_load_time(self) -> datetime:
+        return self.registry.current.loaded_at
 
     def predict_pickup(self, features: PickupFeatures) -> Dict[str, Any]:
         """Prédiction pour pickup avec métadonnées"""
-        if self.model_pickup is None:
+        # Une seule lecture du bundle : la requête reste sur cette version même si un swap survient
+        # (candidat pour la part canary du trafic)
+        bundle, canary = self._serving_bundle('pickup')
+        if not bundle.available('pickup'):
             raise ValueError("Modèle pickup non disponible")
+        bundle = self._city_bundle('pickup', features.city_encoded, bundle, canary)
 
         try:
             input_data = features.to_model_input()
-            feature_names = list(input_data.keys())
-            input_df = pd.DataFrame([list(input_data.values())], columns=feature_names)
-            
-            prediction = self.model_pickup.predict(input_df)
-            prediction_value = float(prediction[0])
+            scorer = bundle.scorer('pickup')
+            if scorer is not None:
+                prediction_value = scorer.score(list(input_data.values()))
+            else:
+                import pandas as pd
+
+                feature_names = list(input_data.keys())
+                model = bundle.model('pickup')
+                input_df = pd.DataFrame([list(input_data.values())], columns=feature_names)
+                if hasattr(model, 'feature_names_in_'):
+                    input_df = input_df.reindex(columns=list(model.feature_names_in_), fill_value=0)
+                
+                prediction = model.predict(input_df)
+                prediction_value = float(prediction[0])
             
             # Calcul du score de confiance basique
             confidence_score = self._calculate_confidence_score(
                 prediction_value, 
                 features.waiting_time_minutes
             )
+            self._after_prediction('pickup', bundle, canary, [list(input_data.values())], [prediction_value])
             
             return {
                 "prediction": prediction_value,
                 "confidence_score": confidence_score,
-                "model_version": "lasso_pickup_v1.0",
+                "model_version": bundle.version('pickup'),
                 "features_count": len(input_data)
             }
             
@@ -91,40 +228,124 @@ class ModelManager:
 
     def predict_delivery(self, features: DeliveryFeatures) -> Dict[str, Any]:
         """Prédiction pour delivery avec métadonnées"""
-        if self.model_delivery is None:
+        bundle, canary = self._serving_bundle('delivery')
+        if not bundle.available('delivery'):
             raise ValueError("Modèle delivery non disponible")
+        bundle = self._city_bundle('delivery', features.city_encoded, bundle, canary)
 
         try:
             feature_array = features.to_feature_array()
-            input_df = pd.DataFrame([feature_array], columns=self.delivery_feature_names)
-            
-            # Vérifier si le modèle a un attribut feature_names_in_
-            if hasattr(self.model_delivery, 'feature_names_in_'):
-                model_features = list(self.model_delivery.feature_names_in_)
-                input_df = input_df.reindex(columns=model_features, fill_value=0)
-            
-            prediction = self.model_delivery.predict(input_df)
-            prediction_value = float(prediction[0])
+            scorer = bundle.scorer('delivery')
+            if scorer is not None:
+                prediction_value = scorer.score(feature_array)
+            else:
+                import pandas as pd
+
+                model = bundle.model('delivery')
+                input_df = pd.DataFrame([feature_array], columns=self.delivery_feature_names)
+                
+                # Vérifier si le modèle a un attribut feature_names_in_
+                if hasattr(model, 'feature_names_in_'):
+                    model_features = list(model.feature_names_in_)
+                    input_df = input_df.reindex(columns=model_features, fill_value=0)
+                
+                prediction = model.predict(input_df)
+                prediction_value = float(prediction[0])
             
             # Calcul du score de confiance
             confidence_score = self._calculate_confidence_score(
                 prediction_value, 
                 features.distance
             )
+            self._after_prediction('delivery', bundle, canary, [feature_array], [prediction_value])
             
             return {
                 "prediction": prediction_value,
                 "confidence_score": confidence_score,
-                "model_version": "lasso_delivery_v1.0",
+                "model_version": bundle.version('delivery'),
                 "features_count": len(feature_array)
             }
             
         except Exception as e:
             logger.error(f"Erreur prédiction delivery : {e}")
-            if hasattr(self.model_delivery, 'feature_names_in_'):
-                logger.error(f"Features attendues: {list(self.model_delivery.feature_names_in_)}")
+            if bundle.scorer('delivery') is None and hasattr(bundle.model('delivery'), 'feature_names_in_'):
+                logger.error(f"Features attendues: {list(bundle.model('delivery').feature_names_in_)}")
             raise ValueError(f"Erreur prédiction delivery : {str(e)}")
 
+    def predict_pickup_batch(self, rows: List[PickupFeatures]) -> Dict[str, Any]:
+        """Prédiction pickup pour N lignes en un seul appel au modèle"""
+        if not rows:
+            raise ValueError("Aucune ligne à prédire")
+
+        try:
+            features = np.array([row.to_feature_array() for row in rows], dtype=np.float64)
+            return self.predict_features('pickup', features)
+
+        except Exception as e:
+            logger.error(f"Erreur prédiction pickup (lot) : {e}")
+            raise ValueError(f"Erreur prédiction pickup (lot) : {str(e)}")
+
+    def predict_delivery_batch(self, rows: List[DeliveryFeatures]) -> Dict[str, Any]:
+        """Prédiction delivery pour N lignes en un seul appel au modèle"""
+        if not rows:
+            raise ValueError("Aucune ligne à prédire")
+
+        try:
+            features = np.array([row.to_feature_array() for row in rows], dtype=np.float64)
+            return self.predict_features('delivery', features)
+
+        except Exception as e:
+            logger.error(f"Erreur prédiction delivery (lot) : {e}")
+            raise ValueError(f"Erreur prédiction delivery (lot) : {str(e)}")
+
+    def predict_features(self, name: str, features: np.ndarray) -> Dict[str, Any]:
+        """Prédiction pour une matrice (N, n_features) déjà dans l'ordre de l'API (lots, format colonnes)
+
+        `canary` indique, ligne par ligne, les prédictions servies par le modèle candidat.
+        """
+        if len(features) == 0:
+            bundle = self.registry.current
+            if not bundle.available(name):
+                raise ValueError(f"Modèle {name} non disponible")
+            return {"predictions": [], "confidence_scores": [], "model_version": bundle.version(name),
+                    "model_versions": [], "count": 0, "canary": []}
+
+        predictions, versions, canary = self._predict_rows(name, features)
+        return {
+            "predictions": predictions.tolist(),
+            "confidence_scores": self.confidence_scores(predictions).tolist(),
+            "model_version": self._batch_version(versions),
+            "model_versions": versions,
+            "count": len(features),
+            "canary": canary.tolist()
+        }
+
+    def predict_values(self, name: str, features: np.ndarray) -> np.ndarray:
+        """Prédictions brutes pour une matrice (N, n_features) dans l'ordre de l'API, sans conversion en listes"""
+        features = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        return self._predict_rows(name, features)[0]
+
+    def predict_primary_values(self, name: str, features: np.ndarray) -> np.ndarray:
+        """Prédictions du modèle servi (et des modèles par ville) seul, sans canary ni shadow : scoring hors ligne"""
+        features = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        bundle = self.registry.current
+        if not bundle.available(name):
+            raise ValueError(f"Modèle {name} non disponible")
+        return self._predict_by_city(name, bundle, features)[0]
+
+    def predict_delivery_values(self, features: np.ndarray) -> np.ndarray:
+        """Prédictions delivery brutes pour une matrice (N, n_features) dans l'ordre de l'API"""
+        return self.predict_values('delivery', features)
+
+    @staticmethod
+    def confidence_scores(predictions: np.ndarray) -> np.ndarray:
+        """Version vectorisée de _calculate_confidence_score"""
+        return np.select(
+            [predictions < 0, predictions < 30, predictions < 60],
+            [0.1, 0.9, 0.7],
+            default=0.5
+        )
+
     def _calculate_confidence_score(self, prediction: float, reference_value: float) -> float:
         """Calcule un score de confiance basique"""
         # Score de confiance basé sur la cohérence de la prédiction
@@ -139,18 +360,27 @@ class ModelManager:
 
     def get_model_info(self) -> Dict[str, Any]:
         """Retourne les informations sur les modèles chargés"""
+        bundle = self.registry.current
         return {
             "pickup_model": {
-                "loaded": self.is_pickup_available(),
-                "type": "Lasso Regression" if self.model_pickup else None,
-                "features_count": len(self.pickup_feature_names) if self.pickup_feature_names else 0
+                "loaded": bundle.available('pickup'),
+                "type": "Lasso Regression" if bundle.available('pickup') else None,
+                "features_count": len(self.pickup_feature_names) if self.pickup_feature_names else 0,
+                "version": bundle.version('pickup'),
+                "source": bundle.origin('pickup')
             },
             "delivery_model": {
-                "loaded": self.is_delivery_available(),
-                "type": "Lasso Regression" if self.model_delivery else None,
-                "features_count": len(self.delivery_feature_names) if self.delivery_feature_names else 0
+                "loaded": bundle.available('delivery'),
+                "type": "Lasso Regression" if bundle.available('delivery') else None,
+                "features_count": len(self.delivery_feature_names) if self.delivery_feature_names else 0,
+                "version": bundle.version('delivery'),
+                "source": bundle.origin('delivery')
+            },
+            "linear_scoring": {
+                "pickup": bundle.scorer('pickup') is not None,
+                "delivery": bundle.scorer('delivery') is not None
             },
-            "load_time": self.model_load_time.isoformat() if self.model_load_time else None
+            "load_time": bundle.loaded_at.isoformat()
         }
 
     def get_uptime(self) -> Optional[float]:
@@ -160,17 +390,243 @@ class ModelManager:
         return None
 
     def is_pickup_available(self) -> bool:
-        return self.model_pickup is not None
+        return self.registry.current.available('pickup')
 
     def is_delivery_available(self) -> bool:
-        return self.model_delivery is not None
+        return self.registry.current.available('delivery')
 
-    def reload_models(self):
-        """Recharge les modèles (utile pour les mises à jour)"""
+    def reload_models(self, background: bool = False):
+        """Charge et préchauffe une nouvelle version puis l'installe d'un bloc (sans interruption)"""
         logger.info("Rechargement des modèles...")
-        self._load_models()
+        if background:
+            return self.registry.reload_in_background()
+        bundle = self.registry.reload()
         logger.info("Rechargement terminé")
+        return bundle
+
+
+# Instance globale du gestionnaire de modèles (aucun chargement à l'import)
+model_manager = ModelManager()
+
+
+def _split_batch(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Résultat d'une prédiction par lot -> un résultat par ligne"""
+    return [
+        {"prediction": prediction, "confidence_score": confidence, "model_version": version, "canary": canary}
+        for prediction, confidence, version, canary in zip(result["predictions"], result["confidence_scores"],
+                                                           result["model_versions"], result["canary"])
+    ]
+
+
+# Regroupement des requêtes concurrentes en un seul appel au modèle
+delivery_batcher = MicroBatcher(
+    lambda rows: _split_batch(model_manager.predict_delivery_batch(rows)),
+    max_batch_size=settings.BATCH_MAX_SIZE,
+    max_wait_ms=settings.BATCH_MAX_WAIT_MS
+)
+pickup_batcher = MicroBatcher(
+    lambda rows: _split_batch(model_manager.predict_pickup_batch(rows)),
+    max_batch_size=settings.BATCH_MAX_SIZE,
+    max_wait_ms=settings.BATCH_MAX_WAIT_MS
+)
+
+
+# Ajustements appliqués à la prédiction du modèle (minutes), comme dans l'interface web
+TRAFFIC_MINUTES = {'low': -5.0, 'normal': 0.0, 'high': 10.0}
+WEATHER_MINUTES = {'rainy': 5.0, 'snowy': 10.0}
+# Durée de référence d'une course tant que l'heure de livraison réelle n'est pas connue
+BASELINE_DELIVERY_MINUTES = 30
+
+# Un optimiseur par thread du pool (l'optimiseur garde l'état de la requête en cours),
+# cache de clustering partagé par le processus
+_route_local = threading.local()
+_route_cluster_cache = None
+_route_cluster_lock = threading.Lock()
+
+
+def _route_clusters():
+    """Cache de clustering du processus (celui du parent fait foi avec un pool de processus)"""
+    global _route_cluster_cache
+    from models.clustering import ClusterCache
+
+    with _route_cluster_lock:
+        if _route_cluster_cache is None:
+            _route_cluster_cache = ClusterCache()
+        return _route_cluster_cache
+
+
+def _route_optimizer():
+    from models.route_optimizer import RouteOptimizer
+
+    if getattr(_route_local, 'optimizer', None) is None:
+        _route_local.optimizer = RouteOptimizer(cluster_cache=_route_clusters())
+    return _route_local.optimizer
+
+
+def _optimize_routes(locations: List[Dict[str, Any]], num_vehicles: int, vehicle_capacity: Optional[float],
+                     departure_time: Optional[datetime], time_budget_ms: Optional[int],
+                     cluster_key: Optional[str], cluster_entry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Optimisation exécutée dans le pool de routes (fonction de module : picklable pour un pool de processus)
 
+    `cluster_entry` est l'entrée du cache de clustering du parent pour
+    `cluster_key` ; l'entrée mise à jour revient dans `cluster_entry`.
+    """
+    from models.distance import coords_from_locations, haversine_pairs
+
+    optimizer = _route_optimizer()
+    if cluster_key is not None and cluster_entry is not None:
+        optimizer.cluster_cache.load(cluster_key, cluster_entry)
+    if time_budget_ms:
+        result = optimizer.optimize_anytime(locations, num_vehicles, time_budget_ms, departure_time,
+                                            cluster_key=cluster_key)
+    else:
+        result = optimizer.optimize_with_clusters(
+            locations, num_vehicles,
+            vehicle_capacity=vehicle_capacity or 50,
+            capacitated=True if vehicle_capacity else None,
+            departure_time=departure_time,
+            cluster_key=cluster_key
+        )
+    if isinstance(result, list):
+        # Un arrêt par véhicule : l'optimiseur renvoie directement les tournées
+        result = {'routes': result, 'total_distance': round(sum(r['total_distance'] for r in result), 2)}
+
+    # Gain par rapport à l'ordre soumis, parcouru par un seul véhicule
+    coords = coords_from_locations(locations)
+    original = float(haversine_pairs(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1]).sum())
+    saved = original - result['total_distance']
+    return {
+        'route': result['routes'],
+        'total_distance': result['total_distance'],
+        'total_time': round(sum(route['estimated_duration'] for route in result['routes']), 1),
+        'savings': {
+            'distance_km': round(saved, 2),
+            'percent': round(100 * saved / original, 1) if original > 0 else 0.0
+        },
+        'anytime': result.get('anytime'),
+        'cluster_entry': optimizer.cluster_cache.entry(cluster_key) if cluster_key is not None else None
+    }
+
+
+class PredictionService:
+    """Façade asynchrone des prédictions et de l'optimisation pour les routes FastAPI
+
+    Les prédictions unitaires (quelques µs avec le score linéaire) tournent
+    directement dans la boucle ; les gros lots et l'optimisation de routes
+    partent dans des pools bornés pour ne jamais bloquer uvicorn. Un pool
+    saturé refuse la tâche (PoolSaturatedError) au lieu d'allonger la file.
+    """
+
+    def __init__(self, manager: Optional[ModelManager] = None, forecaster: Optional[DemandForecaster] = None):
+        self.model_manager = manager or model_manager
+        self.forecaster = forecaster or get_demand_forecaster()
+        self.route_pool = BoundedPool('route', settings.ROUTE_WORKERS, settings.ROUTE_QUEUE_SIZE,
+                                      kind=settings.ROUTE_POOL_KIND)
+        self.predict_pool = BoundedPool('predict', settings.PREDICT_WORKERS, settings.PREDICT_QUEUE_SIZE)
+        self.inline_rows = settings.INLINE_BATCH_ROWS
+
+    async def predict_delivery_time(self, request: DeliveryPredictionRequest) -> Dict[str, Any]:
+        """Temps de livraison à partir des adresses / coordonnées (calcul en ligne, sous la milliseconde)"""
+        features, distance, order_time = self._delivery_features(request)
+        result = self.model_manager.predict_features('delivery', features[None, :])
+
+        model_minutes = result['predictions'][0]
+        traffic_minutes = TRAFFIC_MINUTES.get(request.traffic_level, 0.0)
+        weather_minutes = WEATHER_MINUTES.get(request.weather_condition, 0.0)
+        duration = max(0.0, model_minutes + traffic_minutes + weather_minutes)
+        return {
+            'duration_minutes': round(duration, 1),
+            'estimated_arrival': order_time + timedelta(minutes=duration),
+            'confidence': result['confidence_scores'][0],
+            'factors': {
+                'model_minutes': round(model_minutes, 1),
+                'traffic_minutes': traffic_minutes,
+                'weather_minutes': weather_minutes,
+                'distance_km': round(distance, 2),
+                'model_version': result['model_version']
+            }
+        }
+
+    def _delivery_features(self, request: DeliveryPredictionRequest) -> Tuple[np.ndarray, float, datetime]:
+        pickup = (request.pickup_lat, request.pickup_lng)
+        delivery = (request.delivery_lat, request.delivery_lng)
+        if None in pickup or None in delivery:
+            # Géocodage simulé de l'interface web (import tardif : ce module l'importe)
+            from .simplified_prediction_service import geocode_address
+            if None in pickup:
+                pickup = geocode_address(request.pickup_address)
+            if None in delivery:
+                delivery = geocode_address(request.delivery_address)
+
+        order_time = request.order_time or datetime.now()
+        # Heure murale de la commande, lue comme UTC comme à l'entraînement
+        accepted = np.datetime64(order_time.replace(tzinfo=None), 'us')
+        values = delivery_features({
+            'courier_id': [request.courier_id], 'aoi_id': [request.aoi_id], 'city_encoded': [request.city_encoded],
+            'accept_time': [accepted],
+            'delivery_time': [accepted + np.timedelta64(BASELINE_DELIVERY_MINUTES, 'm')],
+            'accept_gps_lat': [pickup[0]], 'accept_gps_lng': [pickup[1]],
+            'delivery_gps_lat': [delivery[0]], 'delivery_gps_lng': [delivery[1]]
+        })
+        features = feature_matrix(values, self.model_manager.delivery_feature_names)[0]
+        distance = float(values['distance'][0])
+        return features, distance, order_time
+
+    async def predict_features(self, name: str, features: np.ndarray) -> Dict[str, Any]:
+        """Lot déjà sous forme de matrice : en ligne s'il est petit, sinon dans le pool de prédiction"""
+        if len(features) <= self.inline_rows:
+            return self.model_manager.predict_features(name, features)
+        return await self.predict_pool.run(self.model_manager.predict_features, name, features)
+
+    async def predict_batch(self, name: str, rows: List[Any]) -> Dict[str, Any]:
+        """Lot de features pydantic : la conversion ligne à ligne des gros lots part dans le pool"""
+        predict = self.model_manager.predict_pickup_batch if name == 'pickup' else self.model_manager.predict_delivery_batch
+        if len(rows) <= self.inline_rows:
+            return predict(rows)
+        return await self.predict_pool.run(predict, rows)
+
+    async def optimize_route(self, request: RouteOptimizationRequest) -> Dict[str, Any]:
+        """Optimisation de tournées dans le pool de routes (jamais dans la boucle)"""
+        locations = []
+        for i, stop in enumerate(request.deliveries):
+            location = {'id': stop.id if stop.id is not None else str(i), 'lat': stop.lat, 'lng': stop.lng}
+            if stop.address is not None:
+                location['address'] = stop.address
+            if stop.demand is not None:
+                location['demand'] = stop.demand
+            locations.append(location)
+        # Un processus du pool n'a pas le cache des requêtes servies par les autres :
+        # l'entrée du parent part avec la tâche et la version mise à jour y revient
+        clusters = _route_clusters()
+        key = request.cluster_key
+        result = await self.route_pool.run(
+            _optimize_routes, locations, request.num_vehicles, request.vehicle_capacity,
+            request.departure_time, request.time_budget_ms, key, clusters.entry(key) if key is not None else None
+        )
+        entry = result.pop('cluster_entry')
+        if entry is not None:
+            clusters.load(key, entry)
+        return result
+
+    async def forecast_demand(self, request: DemandForecastRequest) -> Dict[str, Any]:
+        """Prévision lue dans les profils précalculés (en ligne) ; le premier chargement de l'historique part dans le pool"""
+        if not self.forecaster.loaded:
+            await self.predict_pool.run(self.forecaster.load)
+        return self.forecaster.forecast(request.zone, request.start_date, request.end_date)
+
+    async def record_deliveries(self, columns: Dict[str, Any]) -> Dict[str, Any]:
+        """Livraisons terminées : agrégats de demande et historique (écriture disque dans le pool)"""
+        recorded = await self.predict_pool.run(self.forecaster.record, columns, True)
+        return {'recorded': recorded, 'zones': len(self.forecaster.rollup.zones)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'inline_rows': self.inline_rows,
+            'route': self.route_pool.stats(),
+            'predict': self.predict_pool.stats(),
+            'forecast': self.forecaster.stats()
+        }
 
-# Instance globale du gestionnaire de modèles
-model_manager = ModelManager()
\ No newline at end of file
+    def shutdown(self) -> None:
+        self.route_pool.shutdown()
+        self.predict_pool.shutdown()
@@ -0,0 +1,352 @@
+import heapq
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from models.capacitated import DEFAULT_DEMAND, DEFAULT_VEHICLE_TYPE, VEHICLE_PROFILES
+from models.distance import haversine_pairs
+from models.local_search import repair_window
+from models.route_optimizer import RouteOptimizer
+from models.scheduling import DEFAULT_SPEED_KMH, schedule_route
+from models.spatial_index import GridIndex
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'arrêts voisins (index spatial) examinés pour l'insertion au moindre coût
+INSERTION_CANDIDATES = 8
+# Demi-largeur de la fenêtre de réparation locale autour d'un arrêt modifié
+REPAIR_RADIUS = 6
+
+
+class RoutePlan:
+    """Tournées en cours d'un dépôt, modifiables arrêt par arrêt
+
+    Les arrêts sont numérotés dans l'ordre d'arrivée ; ce numéro est aussi leur
+    position dans l'index spatial, qui contient tous les arrêts non annulés.
+    `route_of` / `position` donnent la route et le rang de chaque arrêt ; deux
+    tas (toutes les routes, routes vides) rangés par réserve de capacité, aux
+    entrées périmées écartées à la lecture, désignent la route la plus libre
+    sans parcourir la flotte.
+    """
+
+    def __init__(self, locations: List[Dict[str, Any]], routes: List[List[int]],
+                 vehicles: List[Dict[str, Any]], departure_time: datetime):
+        self.locations = list(locations)
+        self.coords = [[float(loc['lat']), float(loc['lng'])] for loc in self.locations]
+        self.routes = [list(route) for route in routes]
+        self.vehicles = vehicles
+        self.departure_time = departure_time
+        self.ids = {}
+        self.route_of = [-1] * len(self.locations)
+        self.position = [-1] * len(self.locations)
+        for i, location in enumerate(self.locations):
+            self.ids[location.get('id', i)] = i
+        for r, route in enumerate(self.routes):
+            for i in route:
+                self.route_of[i] = r
+            self.renumber(r)
+        self.loads = [sum(self.demand(i) for i in route) for route in self.routes]
+        self._rebuild_reserves()
+
+        self.grid = GridIndex(self.coords)
+        # Dictionnaire utilisé comme ensemble ordonné (ordre d'arrivée conservé)
+        self.unassigned = {i: None for i, r in enumerate(self.route_of) if r < 0}
+
+    def demand(self, index: int) -> float:
+        return float(self.locations[index].get('demand', DEFAULT_DEMAND))
+
+    def remaining(self, route: int) -> float:
+        capacity = self.vehicles[route]['capacity']
+        return np.inf if capacity is None else capacity - self.loads[route]
+
+    def fits(self, route: int, demand: float) -> bool:
+        capacity = self.vehicles[route]['capacity']
+        return capacity is None or self.loads[route] + demand <= capacity
+
+    def renumber(self, route: int, start: int = 0) -> None:
+        """Rangs des arrêts de la route à partir de `start` (après une insertion, un retrait ou une réparation)"""
+        stops = self.routes[route]
+        for p in range(start, len(stops)):
+            self.position[stops[p]] = p
+
+    def track(self, route: int) -> None:
+        """Charge ou arrêts de la route modifiés : nouvelle entrée dans les tas de réserve"""
+        entry = (-self.remaining(route), route)
+        heapq.heappush(self._reserves, entry)
+        if not self.routes[route]:
+            heapq.heappush(self._empty, entry)
+        if len(self._reserves) > 4 * len(self.routes) + 16:
+            self._rebuild_reserves()
+
+    def roomiest(self, demand: float, empty: bool = False) -> int:
+        """Route (vide si `empty`) qui a le plus de réserve, si elle peut prendre `demand` ; -1 sinon"""
+        heap = self._empty if empty else self._reserves
+        while heap:
+            reserve, route = heap[0]
+            if -reserve == self.remaining(route) and not (empty and self.routes[route]):
+                return route if self.fits(route, demand) else -1
+            heapq.heappop(heap)
+        return -1
+
+    def _rebuild_reserves(self) -> None:
+        # Purge des entrées périmées : coût proportionnel à la flotte, amorti sur autant d'événements
+        self._reserves = [(-self.remaining(r), r) for r in range(len(self.routes))]
+        self._empty = [entry for entry in self._reserves if not self.routes[entry[1]]]
+        heapq.heapify(self._reserves)
+        heapq.heapify(self._empty)
+
+    def add_location(self, location: Dict[str, Any]) -> int:
+        index = self.grid.insert(float(location['lat']), float(location['lng']))
+        self.locations.append(location)
+        self.coords.append([float(location['lat']), float(location['lng'])])
+        self.route_of.append(-1)
+        self.position.append(-1)
+        self.ids[location.get('id', index)] = index
+        return index
+
+    def index_of(self, stop_id: Any) -> int:
+        index = self.ids.get(stop_id)
+        if index is None or self.locations[index] is None:
+            raise ValueError(f"Arrêt inconnu: {stop_id}")
+        return index
+
+
+class RouteService:
+    """Service de tournées avec état : insertions, annulations et réordonnancements incrémentaux
+
+    Un plan est optimisé complètement une seule fois (`create_plan`), puis
+    chaque événement est appliqué par insertion au moindre coût parmi les
+    arrêts voisins (index spatial) et réparation locale 2-opt / Or-opt d'une
+    fenêtre de la seule route touchée : le coût d'un événement ne dépend pas
+    de la taille de la flotte.
+    """
+
+    def __init__(self, optimizer: Optional[RouteOptimizer] = None,
+                 insertion_candidates: int = INSERTION_CANDIDATES, repair_radius: int = REPAIR_RADIUS):
+        self.optimizer = optimizer or RouteOptimizer()
+        self.insertion_candidates = insertion_candidates
+        self.repair_radius = repair_radius
+        self.plans: Dict[str, RoutePlan] = {}
+        self._lock = threading.Lock()
+
+    def create_plan(self, plan_id: str, locations: List[Dict[str, Any]], num_vehicles: int = 1,
+                    fleet: Optional[List[Any]] = None, departure_time: Optional[datetime] = None) -> Dict[str, Any]:
+        """Optimisation complète initiale d'un plan (clustering ou VRP capacitaire)"""
+        departure_time = departure_time or datetime.now().replace(microsecond=0)
+        try:
+            if fleet is not None:
+                result = self.optimizer.optimize_capacitated(locations, fleet=fleet, departure_time=departure_time)
+            else:
+                result = self.optimizer.optimize_with_clusters(locations, num_vehicles=num_vehicles,
+                                                               departure_time=departure_time)
+            formatted = result['routes'] if isinstance(result, dict) else result
+
+            position = {id(location): i for i, location in enumerate(locations)}
+            routes = [[position[id(stop['location'])] for stop in route['stops']] for route in formatted]
+            vehicles = [self._vehicle(route) for route in formatted]
+            # Véhicules sans arrêt : disponibles pour de nouvelles commandes
+            while len(routes) < max(num_vehicles, len(fleet or [])):
+                routes.append([])
+                vehicles.append(self._vehicle({}))
+
+            with self._lock:
+                self.plans[plan_id] = RoutePlan(locations, routes, vehicles, departure_time)
+            return self.get_plan(plan_id)
+
+        except Exception as e:
+            logger.error(f"Erreur lors de la création du plan {plan_id}: {e}")
+            raise
+
+    @staticmethod
+    def _vehicle(route: Dict[str, Any]) -> Dict[str, Any]:
+        vehicle_type = route.get('vehicle_type', DEFAULT_VEHICLE_TYPE)
+        return {
+            'vehicle_type': vehicle_type,
+            'capacity': route.get('capacity'),
+            'speed_kmh': VEHICLE_PROFILES[vehicle_type]['speed_kmh'] if 'vehicle_type' in route else DEFAULT_SPEED_KMH
+        }
+
+    def get_plan(self, plan_id: str) -> Dict[str, Any]:
+        plan = self._plan(plan_id)
+        with self._lock:
+            return {
+                'plan_id': plan_id,
+                'routes': [self._format_route(plan, r) for r in range(len(plan.routes))],
+                'unassigned': [plan.locations[i] for i in plan.unassigned]
+            }
+
+    def delete_plan(self, plan_id: str) -> None:
+        with self._lock:
+            self.plans.pop(plan_id, None)
+
+    def apply_event(self, plan_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Appliquer un événement {'type': 'insert' | 'cancel' | 'reorder', ...}"""
+        event_type = event.get('type')
+        if event_type == 'insert':
+            return self.insert_stop(plan_id, event['location'])
+        if event_type == 'cancel':
+            return self.cancel_stop(plan_id, event['stop_id'])
+        if event_type == 'reorder':
+            return self.reorder_stop(plan_id, event['stop_id'], event.get('vehicle_id'), event.get('position'))
+        raise ValueError(f"Type d'événement inconnu: {event_type}")
+
+    def insert_stop(self, plan_id: str, location: Dict[str, Any]) -> Dict[str, Any]:
+        """Insérer une nouvelle commande au moindre coût, puis réparer localement sa route"""
+        plan = self._plan(plan_id)
+        with self._lock:
+            index = plan.add_location(location)
+            route = self._insert(plan, index)
+            return self._event_result(plan, 'insert', location.get('id', index), index, [route] if route >= 0 else [])
+
+    def cancel_stop(self, plan_id: str, stop_id: Any) -> Dict[str, Any]:
+        """Retirer un arrêt annulé et réparer la route autour du trou"""
+        plan = self._plan(plan_id)
+        with self._lock:
+            index = plan.index_of(stop_id)
+            route = self._detach(plan, index, repair=True)
+            plan.grid.remove(index)
+            plan.locations[index] = None
+            return self._event_result(plan, 'cancel', stop_id, index, [route] if route >= 0 else [])
+
+    def reorder_stop(self, plan_id: str, stop_id: Any, vehicle_id: Optional[int] = None,
+                     position: Optional[int] = None) -> Dict[str, Any]:
+        """Déplacer un arrêt : à la place imposée si `vehicle_id` est donné, sinon au moindre coût"""
+        plan = self._plan(plan_id)
+        with self._lock:
+            index = plan.index_of(stop_id)
+            if vehicle_id is not None and not 1 <= vehicle_id <= len(plan.routes):
+                raise ValueError(f"Véhicule inconnu: {vehicle_id}")
+            previous = self._detach(plan, index, repair=True)
+            if vehicle_id is None:
+                route = self._insert(plan, index)
+            else:
+                # Choix du répartiteur : respecté tel quel, sans réparation
+                route = vehicle_id - 1
+                stops = plan.routes[route]
+                rank = len(stops) if position is None else max(0, min(position - 1, len(stops)))
+                stops.insert(rank, index)
+                plan.renumber(route, rank)
+                self._attach(plan, index, route)
+            affected = [r for r in dict.fromkeys((previous, route)) if r >= 0]
+            return self._event_result(plan, 'reorder', stop_id, index, affected)
+
+    def _plan(self, plan_id: str) -> RoutePlan:
+        plan = self.plans.get(plan_id)
+        if plan is None:
+            raise ValueError(f"Plan inconnu: {plan_id}")
+        return plan
+
+    def _insert(self, plan: RoutePlan, index: int) -> int:
+        """Insertion au moindre coût parmi les positions voisines des arrêts les plus proches"""
+        demand = plan.demand(index)
+
+        # Positions candidates : avant / après chacun des arrêts voisins planifiés
+        positions = []
+        for neighbour in plan.grid.k_nearest(index, self.insertion_candidates):
+            r = plan.route_of[neighbour]
+            if r < 0 or not plan.fits(r, demand):
+                continue
+            p = plan.position[neighbour]
+            positions.extend(((r, p), (r, p + 1)))
+        positions = list(dict.fromkeys(positions))
+
+        if positions:
+            costs = self._insertion_costs(plan, index, positions)
+            route, position = positions[int(np.argmin(costs))]
+        else:
+            # Aucun voisin utilisable : véhicule vide, sinon celui qui a le plus de réserve
+            route = plan.roomiest(demand, empty=True)
+            if route < 0:
+                route = plan.roomiest(demand)
+            if route < 0:
+                plan.unassigned[index] = None
+                return -1
+            position = len(plan.routes[route])
+
+        plan.routes[route].insert(position, index)
+        self._attach(plan, index, route)
+        self._repair(plan, route, position)
+        return route
+
+    @staticmethod
+    def _insertion_costs(plan: RoutePlan, index: int, positions: List[tuple]) -> np.ndarray:
+        """Surcoût (km) d'insertion de `index` à chaque position (route, rang) d'une route ouverte"""
+        before, after = [], []
+        for r, p in positions:
+            stops = plan.routes[r]
+            before.append(stops[p - 1] if p > 0 else -1)
+            after.append(stops[p] if p < len(stops) else -1)
+        coords = np.array(plan.coords[index])
+        points = np.array([plan.coords[i] for i in before + after]).reshape(-1, 2)
+        to_new = haversine_pairs(points[:, 0], points[:, 1], coords[0], coords[1])
+        to_new[np.array(before + after) < 0] = 0.0
+        before_new, new_after = to_new[:len(positions)], to_new[len(positions):]
+
+        both = np.array([b >= 0 and a >= 0 for b, a in zip(before, after)])
+        replaced = np.zeros(len(positions))
+        if both.any():
+            pairs = np.array([[plan.coords[b], plan.coords[a]] for b, a in zip(before, after) if b >= 0 and a >= 0])
+            replaced[both] = haversine_pairs(pairs[:, 0, 0], pairs[:, 0, 1], pairs[:, 1, 0], pairs[:, 1, 1])
+        return before_new + new_after - replaced
+
+    def _attach(self, plan: RoutePlan, index: int, route: int) -> None:
+        plan.route_of[index] = route
+        plan.loads[route] += plan.demand(index)
+        plan.track(route)
+
+    def _detach(self, plan: RoutePlan, index: int, repair: bool) -> int:
+        """Retirer un arrêt de sa route ; renvoie l'indice de la route (-1 s'il n'était pas planifié)"""
+        route = plan.route_of[index]
+        if route < 0:
+            plan.unassigned.pop(index, None)
+            return -1
+        stops = plan.routes[route]
+        position = plan.position[index]
+        del stops[position]
+        plan.route_of[index] = -1
+        plan.position[index] = -1
+        plan.loads[route] -= plan.demand(index)
+        plan.track(route)
+        if repair and stops:
+            self._repair(plan, route, max(0, position - 1))
+        else:
+            plan.renumber(route, position)
+        return route
+
+    def _repair(self, plan: RoutePlan, route: int, position: int) -> None:
+        """Réparation locale autour de `position` ; les rangs changent à partir du début de la fenêtre"""
+        plan.routes[route] = repair_window(plan.routes[route], plan.coords, position, self.repair_radius)
+        plan.renumber(route, max(0, position - self.repair_radius))
+
+    def _event_result(self, plan: RoutePlan, event_type: str, stop_id: Any, index: int,
+                      routes: List[int]) -> Dict[str, Any]:
+        route = plan.route_of[index]
+        return {
+            'event': event_type,
+            'stop_id': stop_id,
+            'vehicle_id': route + 1 if route >= 0 else None,
+            'position': plan.position[index] + 1 if route >= 0 else None,
+            'routes': [self._format_route(plan, r) for r in routes]
+        }
+
+    def _format_route(self, plan: RoutePlan, route: int) -> Dict[str, Any]:
+        stops = plan.routes[route]
+        locations = [plan.locations[i] for i in stops]
+        legs = np.zeros(len(stops))
+        if len(stops) > 1:
+            points = np.array([plan.coords[i] for i in stops])
+            legs[1:] = haversine_pairs(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+        schedule = schedule_route(locations, legs, plan.departure_time, speed_kmh=plan.vehicles[route]['speed_kmh'],
+                                  travel_time_model=self.optimizer.travel_time_model,
+                                  service_minutes=self.optimizer.service_minutes, with_locations=True) if stops else None
+        return {
+            'vehicle_id': route + 1,
+            'vehicle_type': plan.vehicles[route]['vehicle_type'],
+            'stops': schedule['stops'] if schedule else [],
+            'load': round(plan.loads[route], 2),
+            'total_distance': round(float(legs.sum()), 2),
+            'estimated_duration': schedule['estimated_duration'] if schedule else 0.0
+        }
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .model_registry import ModelBundle, ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionRecorder:
+    """Garde en mémoire les couples (prédiction servie, prédiction candidate) pour comparaison hors ligne"""
+
+    def __init__(self, max_records: int = 10000):
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records.append(entry)
+
+    def records(self, limit: Optional[int] = None, model: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            records = [entry for entry in self._records if model is None or entry['model'] == model]
+        return records[-limit:] if limit else records
+
+    def summary(self) -> Dict[str, Any]:
+        """Écarts candidat - servi par modèle, sur les enregistrements en mémoire"""
+        summary = {}
+        for entry in self.records():
+            if entry['mode'] != 'shadow':
+                continue
+            stats = summary.setdefault(entry['model'], {'count': 0, 'diff_sum': 0.0, 'abs_diff_sum': 0.0})
+            diff = entry['candidate'] - entry['primary']
+            stats['count'] += 1
+            stats['diff_sum'] += diff
+            stats['abs_diff_sum'] += abs(diff)
+        return {
+            model: {
+                'count': stats['count'],
+                'mean_diff': round(stats['diff_sum'] / stats['count'], 4),
+                'mean_abs_diff': round(stats['abs_diff_sum'] / stats['count'], 4)
+            }
+            for model, stats in summary.items()
+        }
+
+
+class ShadowScorer:
+    """Évaluation d'un modèle candidat sur le trafic réel, hors du chemin de la requête
+
+    Mode shadow : une fraction des lignes est rejouée sur le candidat dans un
+    pool de threads, après le calcul de la réponse servie. La file est bornée :
+    si elle est pleine, le travail shadow est abandonné (et compté), jamais la
+    requête. Mode canary : une fraction des lignes est servie par le candidat.
+    Le tirage est fait ligne par ligne : un micro-lot qui regroupe des requêtes
+    concurrentes n'est pas envoyé en bloc au candidat.
+    """
+
+    def __init__(self, candidate: ModelRegistry, recorder: PredictionRecorder, shadow_fraction: float = 0.0,
+                 canary_fraction: float = 0.0, max_queue: int = 1000, workers: int = 1, seed: Optional[int] = None):
+        self.candidate = candidate
+        self.recorder = recorder
+        self.shadow_fraction = shadow_fraction
+        self.canary_fraction = canary_fraction
+        self.max_queue = max_queue
+        self._rng = np.random.default_rng(seed)
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shadow")
+        self._lock = threading.Lock()
+        self.counters = {'submitted': 0, 'completed': 0, 'dropped': 0, 'errors': 0, 'canary': 0}
+
+    def _count(self, key: str, count: int = 1) -> None:
+        with self._lock:
+            self.counters[key] += count
+
+    def _sample(self, fraction: float, count: int) -> np.ndarray:
+        """Masque des lignes tirées, indépendamment, avec la probabilité `fraction`"""
+        if fraction <= 0:
+            return np.zeros(count, dtype=bool)
+        with self._lock:
+            return self._rng.random(count) < fraction
+
+    def canary_rows(self, name: str, count: int) -> Tuple[Optional[ModelBundle], np.ndarray]:
+        """Bundle candidat et masque des lignes servies par lui (aucune si le candidat est absent)"""
+        selected = self._sample(self.canary_fraction, count)
+        if not selected.any():
+            return None, selected
+        bundle = self.candidate.current
+        if not bundle.available(name):
+            return None, np.zeros(count, dtype=bool)
+        self._count('canary', int(selected.sum()))
+        return bundle, selected
+
+    def canary_bundle(self, name: str) -> Optional[ModelBundle]:
+        """Bundle candidat si cette requête (une ligne) fait partie du trafic canary, sinon None"""
+        return self.canary_rows(name, 1)[0]
+
+    def observe(self, name: str, rows: Sequence[Sequence[float]], predictions: Sequence[float],
+                primary_version: Optional[str]) -> None:
+        """Rejoue éventuellement une partie des lignes sur le candidat (ne bloque jamais)"""
+        selected = self._sample(self.shadow_fraction, len(predictions))
+        if not selected.any():
+            return
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))[selected]
+        predictions = np.asarray(predictions, dtype=np.float64)[selected]
+        if not self._slots.acquire(blocking=False):
+            self._count('dropped')
+            return
+        self._count('submitted')
+        try:
+            self._executor.submit(self._score, name, rows, predictions, primary_version, time.time())
+        except RuntimeError:
+            # Pool arrêté (fin du processus)
+            self._slots.release()
+            self._count('dropped')
+
+    def _score(self, name: str, rows, predictions, primary_version: Optional[str], requested_at: float) -> None:
+        try:
+            bundle = self.candidate.current
+            if not bundle.available(name):
+                raise ValueError(f"Modèle candidat {name} non disponible")
+            candidate = bundle.predict_matrix(name, rows)
+            timestamp = datetime.fromtimestamp(requested_at).isoformat()
+            for primary_value, candidate_value in zip(predictions, candidate.tolist()):
+                self.recorder.record({
+                    'timestamp': timestamp,
+                    'model': name,
+                    'mode': 'shadow',
+                    'primary_version': primary_version,
+                    'candidate_version': bundle.version(name),
+                    'primary': float(primary_value),
+                    'candidate': candidate_value
+                })
+            self._count('completed')
+        except Exception as e:
+            self._count('errors')
+            logger.warning(f"Erreur scoring shadow {name} : {e}")
+        finally:
+            self._slots.release()
+
+    def record_canary(self, name: str, predictions: Sequence[float], version: Optional[str]) -> None:
+        timestamp = datetime.now().isoformat()
+        for value in predictions:
+            self.recorder.record({
+                'timestamp': timestamp,
+                'model': name,
+                'mode': 'canary',
+                'primary_version': None,
+                'candidate_version': version,
+                'primary': None,
+                'candidate': float(value)
+            })
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            **counters,
+            'shadow_fraction': self.shadow_fraction,
+            'canary_fraction': self.canary_fraction,
+            'max_queue': self.max_queue,
+            'candidate': self.candidate.current.describe(),
+            'comparison': self.recorder.summary()
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
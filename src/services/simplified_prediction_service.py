@@ -1,22 +1,12 @@
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import logging
 
 from .prediction_service import model_manager  # Importer le model_manager existant
+from ..utils.features import DELIVERY_FEATURE_NAMES, delivery_features, feature_matrix
 
 logger = logging.getLogger(__name__)
 
-# Liste des features attendues par le modèle de livraison, copiée de prediction_service.py
-DELIVERY_FEATURE_NAMES = [
-    'courier_id', 'lng', 'lat', 'aoi_id',
-    'accept_time_seconds', 'accept_gps_time_seconds', 'accept_gps_lng', 'accept_gps_lat',
-    'delivery_time_seconds', 'delivery_gps_time_seconds', 'delivery_gps_lng', 'delivery_gps_lat',
-    'delivery_time_minutes', 'accept_hour', 'accept_day', 'city_encoded', 'distance',
-    'day_of_week', 'hour_of_day', 'task_duration_seconds', 'log_task_duration',
-    'delivery_hour', 'delivery_weekday', 'task_duration_seconds_conv'
-]
-
 def geocode_address(address: str):
     """
     Fonction de simulation pour convertir une adresse en coordonnées (lat, lng)
@@ -38,14 +28,6 @@ def geocode_address(address: str):
         # Valeurs par défaut
         return 48.86, 2.36 + np.random.rand() * 0.1 # Autour de Paris
 
-def calculate_distance(pickup_coords, delivery_coords):
-    """
-    Calcule une distance euclidienne approximative.
-    Ne remplace pas un vrai calcul de distance routière.
-    """
-    return np.sqrt((pickup_coords[0] - delivery_coords[0])**2 + (pickup_coords[1] - delivery_coords[1])**2) * 100
-
-
 def predict_delivery_time_simplified(form_data: dict):
     """
     Prépare les données à partir du formulaire web et prédit le temps de livraison.
@@ -59,55 +41,31 @@ def predict_delivery_time_simplified(form_data: dict):
     pickup_lat, pickup_lng = geocode_address(form_data['pickup_address'])
     delivery_lat, delivery_lng = geocode_address(form_data['delivery_address'])
     
-    distance = calculate_distance((pickup_lat, pickup_lng), (delivery_lat, delivery_lng))
-
-    # --- 2. Création de features simulées pour correspondre au modèle ---
-    
-    # Créer un dictionnaire avec des valeurs par défaut pour toutes les features
-    feature_dict = {feature: 0.0 for feature in DELIVERY_FEATURE_NAMES}
+    # --- 2. Features calculées comme à l'entraînement (colonnes d'une ligne) ---
     
-    # Remplacer avec les valeurs que nous pouvons calculer ou simuler
-    feature_dict.update({
-        'distance': distance,
-        'lat': delivery_lat,
-        'lng': delivery_lng,
-        'delivery_gps_lat': delivery_lat,
-        'delivery_gps_lng': delivery_lng,
-        'accept_gps_lat': pickup_lat,
-        'accept_gps_lng': pickup_lng,
-        'delivery_time_minutes': 30,  # Valeur de base qui pourrait être ajustée
-        'hour_of_day': now.hour,
-        'day_of_week': now.weekday(),
-        'delivery_hour': now.hour,
-        'delivery_weekday': now.weekday(),
-        'accept_hour': now.hour,
-        'accept_day': now.day,
-        'courier_id': 100,  # Simulé
-        'aoi_id': 1, # Simulé
-        'city_encoded': 1 if "paris" in form_data['delivery_address'].lower() else 2, # Simulé
-        
-        # Simulation des timestamps en secondes
-        'accept_time_seconds': (now - datetime(1970, 1, 1)).total_seconds(),
-        'delivery_time_seconds': (now - datetime(1970, 1, 1)).total_seconds() + 1800, # +30 mins
+    accepted = np.datetime64(now, 'us')
+    features = delivery_features({
+        'courier_id': [100],  # Simulé
+        'aoi_id': [1],  # Simulé
+        'city_encoded': [1 if "paris" in form_data['delivery_address'].lower() else 2],  # Simulé
+        'accept_time': [accepted],
+        'delivery_time': [accepted + np.timedelta64(30, 'm')],  # Durée de base qui pourrait être ajustée
+        'accept_gps_lat': [pickup_lat],
+        'accept_gps_lng': [pickup_lng],
+        'delivery_gps_lat': [delivery_lat],
+        'delivery_gps_lng': [delivery_lng]
     })
+    distance = float(features['distance'][0])
 
-    # --- 3. Création du DataFrame pour le modèle ---
+    # --- 3. Ligne de features dans l'ordre de l'API ---
     
-    # Créer le DataFrame avec les colonnes dans le bon ordre
-    input_df = pd.DataFrame([feature_dict], columns=DELIVERY_FEATURE_NAMES)
-    
-    # S'assurer que les colonnes correspondent exactement à celles du modèle
-    if hasattr(model_manager.model_delivery, 'feature_names_in_'):
-        model_features = list(model_manager.model_delivery.feature_names_in_)
-        input_df = input_df.reindex(columns=model_features, fill_value=0)
-    else:
-        # Si le modèle n'a pas cette information, on utilise notre liste
-        input_df = input_df[DELIVERY_FEATURE_NAMES]
+    feature_row = feature_matrix(features, DELIVERY_FEATURE_NAMES)[0]
 
     # --- 4. Prédiction ---
     
     try:
-        prediction_array = model_manager.model_delivery.predict(input_df)
+        # Score linéaire mappé en mémoire si disponible (le pickle n'est chargé qu'en repli)
+        prediction_array = model_manager.predict_delivery_values(feature_row)
         predicted_time_minutes = float(prediction_array[0])
 
         # Ajouter des ajustements basés sur le formulaire pour rendre la démo plus crédible
@@ -0,0 +1,222 @@
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from . import model_store
+from ..utils.features import FEATURE_NAMES, model_feature_matrix
+
+logger = logging.getLogger(__name__)
+
+# Colonnes cibles (minutes) des notebooks d'entraînement
+TARGET_COLUMNS = {'delivery': 'ETA_delivery', 'pickup': 'ETA_pickup'}
+STATS_SUFFIX = ".stats.npz"
+
+
+class SufficientStatistics:
+    """Moyennes et produits croisés centrés (X, y) accumulés bloc par bloc
+
+    Taille fixe (n_features²) quel que soit le nombre de lignes. Chaque bloc
+    est centré sur sa propre moyenne puis fusionné (formule de Chan) : pas de
+    perte de précision sur des features de l'ordre de 1e9 (horodatages).
+    """
+
+    def __init__(self, feature_names: List[str]):
+        size = len(feature_names)
+        self.feature_names = list(feature_names)
+        self.count = 0.0
+        self.mean_x = np.zeros(size)
+        self.mean_y = 0.0
+        self.xx = np.zeros((size, size))
+        self.xy = np.zeros(size)
+        self.yy = 0.0
+
+    def update(self, features: np.ndarray, target: np.ndarray) -> int:
+        """Ajoute un bloc ; les lignes non finies sont ignorées. Renvoie le nombre de lignes retenues"""
+        features = np.asarray(features, dtype=np.float64)
+        target = np.asarray(target, dtype=np.float64)
+        valid = np.isfinite(features).all(axis=1) & np.isfinite(target)
+        features, target = features[valid], target[valid]
+        count = len(target)
+        if count == 0:
+            return 0
+
+        mean_x = features.mean(axis=0)
+        mean_y = target.mean()
+        centered_x = features - mean_x
+        centered_y = target - mean_y
+        self._merge(count, mean_x, mean_y, centered_x.T @ centered_x, centered_x.T @ centered_y,
+                    float(centered_y @ centered_y))
+        return count
+
+    def merge(self, other: 'SufficientStatistics') -> None:
+        if other.feature_names != self.feature_names:
+            raise ValueError("Statistiques calculées sur des features différentes")
+        if other.count:
+            self._merge(other.count, other.mean_x, other.mean_y, other.xx, other.xy, other.yy)
+
+    def _merge(self, count, mean_x, mean_y, xx, xy, yy) -> None:
+        total = self.count + count
+        delta_x = mean_x - self.mean_x
+        delta_y = mean_y - self.mean_y
+        weight = self.count * count / total
+        self.xx += xx + weight * np.outer(delta_x, delta_x)
+        self.xy += xy + weight * delta_x * delta_y
+        self.yy += yy + weight * delta_y * delta_y
+        self.mean_x += delta_x * count / total
+        self.mean_y += delta_y * count / total
+        self.count = total
+
+    def decay(self, factor: float) -> None:
+        """Réduit le poids de l'historique (factor < 1) avant d'ajouter les nouvelles données"""
+        self.count *= factor
+        self.xx *= factor
+        self.xy *= factor
+        self.yy *= factor
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, feature_names=np.array(self.feature_names), count=self.count, mean_x=self.mean_x,
+                 mean_y=self.mean_y, xx=self.xx, xy=self.xy, yy=self.yy)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'SufficientStatistics':
+        with np.load(path) as data:
+            stats = cls(data['feature_names'].tolist())
+            stats.count = float(data['count'])
+            stats.mean_x = data['mean_x'].copy()
+            stats.mean_y = float(data['mean_y'])
+            stats.xx = data['xx'].copy()
+            stats.xy = data['xy'].copy()
+            stats.yy = float(data['yy'])
+        return stats
+
+
+def solve_lasso(stats: SufficientStatistics, alpha: float, coef_init: Optional[np.ndarray] = None,
+                max_iter: int = 1000, tol: float = 1e-4) -> Tuple[np.ndarray, float, int]:
+    """Descente de coordonnées sur les statistiques suffisantes
+
+    Même objectif que sklearn.linear_model.Lasso (avec intercept) :
+    1 / (2n) ||y - Xw - b||² + alpha ||w||₁, sans jamais relire les données.
+    Renvoie (coef, intercept, itérations).
+    """
+    if stats.count <= 0:
+        raise ValueError("Aucune donnée d'entraînement")
+    gram = stats.xx
+    size = len(stats.feature_names)
+    coef = np.zeros(size) if coef_init is None else np.array(coef_init, dtype=np.float64)
+    diagonal = np.diag(gram)
+    threshold = alpha * stats.count
+    # Gradient courant (au facteur n près) : X'y - X'X w
+    residual = stats.xy - gram @ coef
+
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        max_change, max_coef = 0.0, 0.0
+        for j in range(size):
+            if diagonal[j] == 0:
+                continue
+            old = coef[j]
+            rho = residual[j] + diagonal[j] * old
+            new = np.sign(rho) * max(abs(rho) - threshold, 0.0) / diagonal[j]
+            if new != old:
+                residual -= gram[:, j] * (new - old)
+                coef[j] = new
+            max_change = max(max_change, abs(new - old))
+            max_coef = max(max_coef, abs(new))
+        # Critère d'arrêt de sklearn : plus grande variation relative au plus grand coefficient
+        if max_coef == 0.0 or max_change / max_coef < tol:
+            break
+    else:
+        logger.warning(f"Lasso : pas de convergence en {max_iter} itérations")
+
+    intercept = stats.mean_y - float(stats.mean_x @ coef)
+    return coef, intercept, iteration
+
+
+def accumulate(name: str, chunks: Iterable[Any], target: Optional[str] = None,
+               stats: Optional[SufficientStatistics] = None) -> Tuple[SufficientStatistics, Dict[str, int]]:
+    """Parcourt les blocs (DataFrames ou dicts de colonnes) et accumule les statistiques du modèle `name`"""
+    target = target or TARGET_COLUMNS[name]
+    stats = stats or SufficientStatistics(FEATURE_NAMES[name])
+    if stats.feature_names != FEATURE_NAMES[name]:
+        raise ValueError("Statistiques existantes incompatibles avec les features de l'API")
+    counts = {'rows': 0, 'used': 0, 'chunks': 0}
+    for chunk in chunks:
+        if target not in chunk:
+            raise ValueError(f"Colonne cible manquante : {target}")
+        features = model_feature_matrix(name, chunk)
+        counts['rows'] += len(features)
+        counts['used'] += stats.update(features, np.asarray(chunk[target], dtype=np.float64))
+        counts['chunks'] += 1
+    return stats, counts
+
+
+def build_model(name: str, coef: np.ndarray, intercept: float, alpha: float, n_iter: int):
+    """Lasso sklearn déjà ajusté, chargeable par ModelManager comme les modèles des notebooks"""
+    from sklearn.linear_model import Lasso
+
+    model = Lasso(alpha=alpha)
+    model.coef_ = coef
+    model.intercept_ = intercept
+    model.n_iter_ = n_iter
+    model.dual_gap_ = 0.0
+    model.n_features_in_ = len(coef)
+    model.feature_names_in_ = np.array(FEATURE_NAMES[name], dtype=object)
+    return model
+
+
+def stats_path(model_path: Path) -> Path:
+    """Statistiques rangées à côté du pickle : models/lasso_model.pkl -> models/lasso_model.stats.npz"""
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + STATS_SUFFIX)
+
+
+def save_model(name: str, model, stats: SufficientStatistics, model_path: Path,
+               export_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """Écrit le pickle (remplacement atomique), ses statistiques et l'export mappable
+
+    Le registre des modèles détecte le nouveau fichier et l'installe à chaud.
+    """
+    model_path = Path(model_path)
+    model_path.parent.mkdir(parents=True, exist_ok=True)
+    stats.save(stats_path(model_path))
+    tmp = model_path.with_name(model_path.name + ".tmp")
+    with open(tmp, 'wb') as f:
+        pickle.dump(model, f)
+    os.replace(tmp, model_path)
+
+    meta = None
+    if export_dir is not None:
+        meta = model_store.export_linear_model(model, FEATURE_NAMES[name], Path(export_dir) / name, source=model_path)
+    logger.info(f"Modèle {name} entraîné sur {stats.count:.0f} lignes écrit dans {model_path}")
+    return {'model_path': str(model_path), 'stats_path': str(stats_path(model_path)), 'export': meta}
+
+
+def load_existing(model_path: Path) -> Tuple[SufficientStatistics, Optional[np.ndarray]]:
+    """Statistiques et coefficients d'un modèle déjà entraîné par ce module (pour une mise à jour)"""
+    path = stats_path(model_path)
+    if not path.exists():
+        raise ValueError(f"Pas de statistiques {path} : entraîner d'abord sur l'historique complet")
+    stats = SufficientStatistics.load(path)
+    coef = None
+    if Path(model_path).exists():
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+        if list(getattr(model, 'feature_names_in_', [])) == stats.feature_names:
+            coef = np.asarray(model.coef_, dtype=np.float64)
+    return stats, coef
+
+
+def training_error(stats: SufficientStatistics, coef: np.ndarray) -> Dict[str, Optional[float]]:
+    """RMSE et R² sur les données d'entraînement, calculés depuis les statistiques"""
+    rss = max(stats.yy - 2 * float(coef @ stats.xy) + float(coef @ stats.xx @ coef), 0.0)
+    return {
+        'rmse': float(np.sqrt(rss / stats.count)) if stats.count else None,
+        'r2': 1 - rss / stats.yy if stats.yy > 0 else None
+    }
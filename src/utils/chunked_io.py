@@ -0,0 +1,74 @@
+"""Lecture et écriture de fichiers de commandes par blocs (CSV, JSONL, Parquet)
+
+Utilisé par les traitements hors ligne (score en masse, entraînement) : la
+mémoire dépend de la taille des blocs, pas de celle du fichier. Parquet
+nécessite pyarrow, importé seulement si ce format est demandé.
+"""
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pandas as pd
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl', '.parquet': 'parquet'}
+
+
+def file_format(path, forced: Optional[str] = None) -> str:
+    """Format déduit de l'extension, sauf s'il est imposé"""
+    fmt = forced or FORMATS.get(Path(path).suffix.lower())
+    if fmt is None:
+        raise ValueError(f"Format inconnu pour {path} (extensions : {sorted(FORMATS)})")
+    return fmt
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise ValueError("Le format Parquet nécessite pyarrow (pip install pyarrow)")
+
+
+def read_chunks(path, fmt: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Blocs de `chunk_size` lignes au plus, sans charger le fichier entier"""
+    if fmt == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif fmt == 'jsonl':
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        parquet = require_pyarrow().parquet.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+
+class ChunkWriter:
+    """Écriture incrémentale de blocs dans un fichier, au format demandé"""
+
+    def __init__(self, path, fmt: str):
+        self.path = Path(path)
+        self.fmt = fmt
+        self._parquet = None
+        self._first = True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt != 'parquet':
+            self._file = open(self.path, 'w', encoding='utf-8', newline='')
+
+    def write(self, frame: pd.DataFrame) -> None:
+        if self.fmt == 'csv':
+            frame.to_csv(self._file, header=self._first, index=False)
+        elif self.fmt == 'jsonl':
+            if len(frame):
+                self._file.write(frame.to_json(orient='records', lines=True, date_format='iso').rstrip('\n') + '\n')
+        else:
+            pyarrow = require_pyarrow()
+            table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        self._first = False
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+        elif self.fmt != 'parquet':
+            self._file.close()
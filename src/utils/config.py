@@ -15,7 +15,21 @@ class Config:
     # Chemins des modèles
     PICKUP_MODEL_PATH: str = "models/lasso_model_pickup.pkl"
     DELIVERY_MODEL_PATH: str = "models/lasso_model.pkl"
+    MODEL_EXPORT_DIR: str = "models/exported"  # coef.npy + meta.json (scripts/export_models.py)
+    MODEL_WATCH_INTERVAL: float = 10.0  # secondes entre deux vérifications des fichiers (0 : désactivé)
+    CITY_MODEL_DIR: str = "models/cities"  # <dir>/<pickup|delivery>/city_<code>.pkl
+    CITY_MODEL_MAX_MB: float = 256.0  # budget mémoire du LRU des modèles par ville
+    
+    # Modèle candidat évalué en shadow / canary (vide : désactivé)
+    CANDIDATE_PICKUP_MODEL_PATH: str = ""
+    CANDIDATE_DELIVERY_MODEL_PATH: str = ""
+    SHADOW_FRACTION: float = 0.0  # part des lignes rejouées sur le candidat
+    CANARY_FRACTION: float = 0.0  # part des lignes servies par le candidat
+    SHADOW_QUEUE_SIZE: int = 1000  # au-delà, le travail shadow est abandonné
+    SHADOW_WORKERS: int = 1
+    SHADOW_MAX_RECORDS: int = 10000
     DATA_DIR: str = "data"
+    DELIVERY_STORE_DIR: str = "data/deliveries"  # historique en colonnes, partitionné par ville et par jour
     LOGS_DIR: str = "monitoring/logs"
     
     # Configuration API
@@ -32,6 +46,28 @@ class Config:
     
     # Configuration cache
     CACHE_TTL: int = 3600  # 1 heure
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_GRID_DEG: float = 0.005  # cellule de ~500 m pour la clé de cache
+    CACHE_MINUTES_BUCKET: float = 5.0  # tranche des durées (minutes) pour la clé de cache
+    REDIS_URL: str = ""  # backend partagé du cache (vide : cache local uniquement)
+    
+    # Regroupement des prédictions concurrentes (micro-batching)
+    BATCH_MAX_SIZE: int = 64
+    BATCH_MAX_WAIT_MS: float = 2.0
+    
+    # Pools bornés du service de prédiction (travail CPU hors de la boucle asyncio)
+    ROUTE_WORKERS: int = 2
+    ROUTE_POOL_KIND: str = "process"  # process ou thread
+    ROUTE_QUEUE_SIZE: int = 32
+    PREDICT_WORKERS: int = 2
+    PREDICT_QUEUE_SIZE: int = 64
+    INLINE_BATCH_ROWS: int = 2000  # au-delà, un lot est prédit dans le pool
+    
+    # Prévision de la demande (agrégats horaires par zone)
+    FORECAST_HISTORY_WEEKS: int = 8
+    FORECAST_WEEK_DECAY: float = 0.8  # poids d'une semaine par rapport à la suivante
+    FORECAST_REFIT_SECONDS: float = 60.0  # délai minimal entre deux ajustements
+    FORECAST_MAX_DAYS: int = 92
     
     # Configuration sécurité
     API_KEY: str = ""
@@ -40,6 +76,18 @@ class Config:
         """Charge la configuration depuis les variables d'environnement"""
         self.PICKUP_MODEL_PATH = os.getenv("PICKUP_MODEL_PATH", self.PICKUP_MODEL_PATH)
         self.DELIVERY_MODEL_PATH = os.getenv("DELIVERY_MODEL_PATH", self.DELIVERY_MODEL_PATH)
+        self.MODEL_EXPORT_DIR = os.getenv("MODEL_EXPORT_DIR", self.MODEL_EXPORT_DIR)
+        self.MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", str(self.MODEL_WATCH_INTERVAL)))
+        self.CITY_MODEL_DIR = os.getenv("CITY_MODEL_DIR", self.CITY_MODEL_DIR)
+        self.CITY_MODEL_MAX_MB = float(os.getenv("CITY_MODEL_MAX_MB", str(self.CITY_MODEL_MAX_MB)))
+        
+        self.CANDIDATE_PICKUP_MODEL_PATH = os.getenv("CANDIDATE_PICKUP_MODEL_PATH", self.CANDIDATE_PICKUP_MODEL_PATH)
+        self.CANDIDATE_DELIVERY_MODEL_PATH = os.getenv("CANDIDATE_DELIVERY_MODEL_PATH", self.CANDIDATE_DELIVERY_MODEL_PATH)
+        self.SHADOW_FRACTION = float(os.getenv("SHADOW_FRACTION", str(self.SHADOW_FRACTION)))
+        self.CANARY_FRACTION = float(os.getenv("CANARY_FRACTION", str(self.CANARY_FRACTION)))
+        self.SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", str(self.SHADOW_QUEUE_SIZE)))
+        self.SHADOW_WORKERS = int(os.getenv("SHADOW_WORKERS", str(self.SHADOW_WORKERS)))
+        self.SHADOW_MAX_RECORDS = int(os.getenv("SHADOW_MAX_RECORDS", str(self.SHADOW_MAX_RECORDS)))
         self.DATA_DIR = os.getenv("DATA_DIR", self.DATA_DIR)
         self.LOGS_DIR = os.getenv("LOGS_DIR", self.LOGS_DIR)
         
@@ -52,6 +100,27 @@ class Config:
         self.LOG_LEVEL = os.getenv("LOG_LEVEL", self.LOG_LEVEL)
         
         self.CACHE_TTL = int(os.getenv("CACHE_TTL", str(self.CACHE_TTL)))
+        self.CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", str(self.CACHE_MAX_ENTRIES)))
+        self.CACHE_GRID_DEG = float(os.getenv("CACHE_GRID_DEG", str(self.CACHE_GRID_DEG)))
+        self.CACHE_MINUTES_BUCKET = float(os.getenv("CACHE_MINUTES_BUCKET", str(self.CACHE_MINUTES_BUCKET)))
+        self.REDIS_URL = os.getenv("REDIS_URL", self.REDIS_URL)
+        
+        self.BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", str(self.BATCH_MAX_SIZE)))
+        self.BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", str(self.BATCH_MAX_WAIT_MS)))
+        
+        self.ROUTE_WORKERS = int(os.getenv("ROUTE_WORKERS", str(self.ROUTE_WORKERS)))
+        self.ROUTE_POOL_KIND = os.getenv("ROUTE_POOL_KIND", self.ROUTE_POOL_KIND)
+        self.ROUTE_QUEUE_SIZE = int(os.getenv("ROUTE_QUEUE_SIZE", str(self.ROUTE_QUEUE_SIZE)))
+        self.PREDICT_WORKERS = int(os.getenv("PREDICT_WORKERS", str(self.PREDICT_WORKERS)))
+        self.PREDICT_QUEUE_SIZE = int(os.getenv("PREDICT_QUEUE_SIZE", str(self.PREDICT_QUEUE_SIZE)))
+        self.INLINE_BATCH_ROWS = int(os.getenv("INLINE_BATCH_ROWS", str(self.INLINE_BATCH_ROWS)))
+        
+        self.FORECAST_HISTORY_WEEKS = int(os.getenv("FORECAST_HISTORY_WEEKS", str(self.FORECAST_HISTORY_WEEKS)))
+        self.FORECAST_WEEK_DECAY = float(os.getenv("FORECAST_WEEK_DECAY", str(self.FORECAST_WEEK_DECAY)))
+        self.FORECAST_REFIT_SECONDS = float(os.getenv("FORECAST_REFIT_SECONDS", str(self.FORECAST_REFIT_SECONDS)))
+        self.FORECAST_MAX_DAYS = int(os.getenv("FORECAST_MAX_DAYS", str(self.FORECAST_MAX_DAYS)))
+        
+        self.DELIVERY_STORE_DIR = os.getenv("DELIVERY_STORE_DIR", self.DELIVERY_STORE_DIR)
         
         self.API_KEY = os.getenv("API_KEY", self.API_KEY)
 
@@ -0,0 +1,293 @@
+# src/utils/database.py
+"""Historique des livraisons en stockage colonnes, partitionné par ville et par jour
+
+Disposition : <root>/city=<code>/date=<AAAA-MM-JJ>/part-<id>/<colonne>.npy
+(+ _meta.json : nombre de lignes, min / max de chaque colonne). Une requête
+élimine d'abord les partitions par ville et par date (noms de répertoires),
+puis les parts dont les min / max excluent un filtre, et ne lit (en mémoire
+mappée) que les colonnes filtrées et projetées des parts restantes.
+La date de partition est le jour UTC de accept_time_seconds.
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .config import get_settings
+from .features import DELIVERY_FEATURE_NAMES, SECONDS_PER_DAY, delivery_features
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "_meta.json"
+PARTITION_COLUMNS = ('city_encoded', 'accept_time_seconds')
+# Colonnes brutes à partir desquelles les features de DeliveryFeatures sont dérivées
+RAW_COLUMNS = ('courier_id', 'aoi_id', 'city_encoded', 'accept_time', 'delivery_time',
+               'accept_gps_lat', 'accept_gps_lng', 'delivery_gps_lat', 'delivery_gps_lng')
+OPERATORS = ('==', '!=', '<', '<=', '>', '>=', 'in', 'between')
+
+Filter = Tuple[str, str, Any]
+DateLike = Union[date, datetime, str]
+
+
+def _to_date(value: DateLike) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def _row_mask(values: np.ndarray, op: str, operand: Any) -> np.ndarray:
+    with np.errstate(invalid='ignore'):
+        if op == '==':
+            return values == operand
+        if op == '!=':
+            return values != operand
+        if op == '<':
+            return values < operand
+        if op == '<=':
+            return values <= operand
+        if op == '>':
+            return values > operand
+        if op == '>=':
+            return values >= operand
+        if op == 'in':
+            return np.isin(values, list(operand))
+        low, high = operand
+        return (values >= low) & (values <= high)
+
+
+def _may_match(stats: Optional[Dict[str, float]], op: str, operand: Any) -> bool:
+    """Le filtre peut-il retenir une ligne de la part, d'après ses min / max ?"""
+    if stats is None or stats['min'] is None:
+        # Colonne absente ou entièrement NaN : aucune comparaison ne retient de ligne, sauf !=
+        return op == '!='
+    low, high = stats['min'], stats['max']
+    if op == '==':
+        return low <= operand <= high
+    if op == '!=':
+        return not (low == high == operand)
+    if op == '<':
+        return low < operand
+    if op == '<=':
+        return low <= operand
+    if op == '>':
+        return high > operand
+    if op == '>=':
+        return high >= operand
+    if op == 'in':
+        return any(low <= value <= high for value in operand)
+    return operand[0] <= high and operand[1] >= low
+
+
+class DeliveryStore:
+    """Magasin colonnes de l'historique des livraisons (KPIs, prévisions, entraînement)
+
+    `append` accepte un DataFrame ou un dict de colonnes : si les colonnes
+    brutes (horodatages, GPS) sont là, les colonnes de DeliveryFeatures en
+    sont dérivées par le même pipeline que le service. Seules les colonnes
+    numériques sont stockées. Chaque écriture crée une part par partition,
+    installée par un renommage atomique : un lecteur ne voit jamais une part
+    incomplète.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self.counters = {'queries': 0, 'partitions_scanned': 0, 'partitions_pruned': 0,
+                         'parts_read': 0, 'parts_skipped': 0, 'columns_read': 0, 'rows_returned': 0}
+
+    # --- Écriture ---
+
+    def append(self, columns: Mapping[str, Any]) -> Dict[str, Any]:
+        """Ajoute des livraisons ; renvoie le nombre de lignes et les partitions écrites"""
+        data = self._prepare(columns)
+        count = len(data['accept_time_seconds'])
+        if count == 0:
+            return {'rows': 0, 'partitions': []}
+
+        cities = data['city_encoded'].astype(np.float64)
+        days = np.floor_divide(data['accept_time_seconds'].astype(np.float64), SECONDS_PER_DAY)
+        valid = np.isfinite(cities) & np.isfinite(days)
+        if not valid.all():
+            logger.warning(f"{int((~valid).sum())} livraisons sans ville ou sans accept_time ignorées")
+        keys = np.stack([cities, days], axis=1)[valid]
+        rows = np.flatnonzero(valid)
+
+        written = []
+        # Tri par (ville, jour) : une tranche contiguë par partition
+        order = np.lexsort((keys[:, 1], keys[:, 0]))
+        keys, rows = keys[order], rows[order]
+        bounds = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(rows)]):
+            if start == end:
+                continue
+            city, day = int(keys[start, 0]), int(keys[start, 1])
+            partition = self._partition_dir(city, date(1970, 1, 1) + timedelta(days=day))
+            self._write_part(partition, {name: values[rows[start:end]] for name, values in data.items()})
+            written.append(str(partition.relative_to(self.root)))
+        return {'rows': int(len(rows)), 'partitions': written}
+
+    def _prepare(self, columns: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+        derived = {}
+        if not all(name in columns for name in DELIVERY_FEATURE_NAMES) and all(
+                name in columns or f"{name}_seconds" in columns for name in RAW_COLUMNS):
+            derived = delivery_features(columns)
+        data = {}
+        for name in columns.keys():
+            if name in derived:
+                continue
+            values = np.asarray(columns[name])
+            if values.dtype.kind in 'biuf':
+                data[name] = values
+            else:
+                logger.debug(f"Colonne non numérique {name} non stockée")
+        data.update(derived)
+        missing = [name for name in PARTITION_COLUMNS if name not in data]
+        if missing:
+            raise ValueError(f"Colonnes de partition manquantes : {missing}")
+        return data
+
+    def _partition_dir(self, city: int, day: date) -> Path:
+        return self.root / f"city={city}" / f"date={day.isoformat()}"
+
+    def _write_part(self, partition: Path, data: Dict[str, np.ndarray]) -> None:
+        partition.mkdir(parents=True, exist_ok=True)
+        name = f"part-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        tmp = partition / f".{name}.tmp"
+        tmp.mkdir()
+        meta = {'rows': len(next(iter(data.values()))), 'columns': {}}
+        for column, values in data.items():
+            np.save(tmp / f"{column}.npy", np.ascontiguousarray(values))
+            finite = values[np.isfinite(values)] if values.dtype.kind == 'f' else values
+            meta['columns'][column] = {
+                'dtype': values.dtype.str,
+                'min': float(finite.min()) if len(finite) else None,
+                'max': float(finite.max()) if len(finite) else None
+            }
+        (tmp / META_FILE).write_text(json.dumps(meta))
+        os.replace(tmp, partition / name)
+
+    # --- Lecture ---
+
+    def partitions(self, cities: Optional[Iterable[int]] = None, start: Optional[DateLike] = None,
+                   end: Optional[DateLike] = None) -> List[Tuple[int, date, Path]]:
+        """Partitions retenues par ville et par jour (bornes incluses), sans rien lire d'autre que les noms"""
+        cities = None if cities is None else {int(city) for city in cities}
+        start = _to_date(start) if start is not None else None
+        end = _to_date(end) if end is not None else None
+        selected, pruned = [], 0
+        if not self.root.exists():
+            return selected
+        for city_dir in sorted(self.root.iterdir()):
+            if not city_dir.name.startswith('city='):
+                continue
+            city = int(city_dir.name[5:])
+            date_dirs = [d for d in sorted(city_dir.iterdir()) if d.name.startswith('date=')]
+            if cities is not None and city not in cities:
+                pruned += len(date_dirs)
+                continue
+            for date_dir in date_dirs:
+                day = date.fromisoformat(date_dir.name[5:])
+                if (start is not None and day < start) or (end is not None and day > end):
+                    pruned += 1
+                    continue
+                selected.append((city, day, date_dir))
+        with self._lock:
+            self.counters['partitions_pruned'] += pruned
+        return selected
+
+    def scan(self, columns: Optional[Sequence[str]] = None, cities: Optional[Iterable[int]] = None,
+             start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+             filters: Sequence[Filter] = ()) -> Iterator[Dict[str, np.ndarray]]:
+        """Un bloc de colonnes par part retenue (mémoire bornée par la taille d'une part)
+
+        `filters` : liste de (colonne, opérateur, valeur), combinés par ET ;
+        opérateurs ==, !=, <, <=, >, >=, in (liste), between (bornes incluses).
+        `columns` : colonnes projetées (toutes si None).
+        """
+        for _, op, _ in filters:
+            if op not in OPERATORS:
+                raise ValueError(f"Opérateur inconnu : {op} (disponibles : {OPERATORS})")
+        partitions = self.partitions(cities, start, end)
+        with self._lock:
+            self.counters['partitions_scanned'] += len(partitions)
+
+        for _, _, partition in partitions:
+            for part in sorted(p for p in partition.iterdir() if p.name.startswith('part-')):
+                chunk = self._read_part(part, columns, filters)
+                if chunk is not None:
+                    yield chunk
+
+    def _read_part(self, part: Path, columns: Optional[Sequence[str]],
+                   filters: Sequence[Filter]) -> Optional[Dict[str, np.ndarray]]:
+        meta = json.loads((part / META_FILE).read_text())
+        stats = meta['columns']
+        if not all(_may_match(stats.get(column), op, operand) for column, op, operand in filters):
+            with self._lock:
+                self.counters['parts_skipped'] += 1
+            return None
+
+        loaded = {}
+
+        def load(column: str) -> np.ndarray:
+            if column not in loaded:
+                if column in stats:
+                    loaded[column] = np.load(part / f"{column}.npy", mmap_mode='r')
+                else:
+                    # Colonne apparue après l'écriture de cette part
+                    loaded[column] = np.full(meta['rows'], np.nan)
+            return loaded[column]
+
+        mask = None
+        for column, op, operand in filters:
+            condition = _row_mask(load(column), op, operand)
+            mask = condition if mask is None else mask & condition
+        projected = list(stats) if columns is None else list(columns)
+        result = {}
+        for column in projected:
+            values = load(column)
+            result[column] = np.array(values[mask] if mask is not None else values)
+        with self._lock:
+            self.counters['parts_read'] += 1
+            self.counters['columns_read'] += len(loaded)
+            self.counters['rows_returned'] += len(next(iter(result.values()))) if result else 0
+        return result
+
+    def query(self, columns: Optional[Sequence[str]] = None, cities: Optional[Iterable[int]] = None,
+              start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+              filters: Sequence[Filter] = ()) -> Dict[str, np.ndarray]:
+        """Comme `scan`, résultats concaténés en un dict {colonne: tableau}"""
+        with self._lock:
+            self.counters['queries'] += 1
+        chunks = list(self.scan(columns, cities, start, end, filters))
+        if not chunks:
+            return {column: np.empty(0) for column in (columns or [])}
+        names = list(columns) if columns is not None else sorted({name for chunk in chunks for name in chunk})
+        return {
+            name: np.concatenate([chunk[name] if name in chunk else np.full(len(next(iter(chunk.values()))), np.nan)
+                                  for chunk in chunks])
+            for name in names
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return {'root': str(self.root), **counters}
+
+
+_delivery_store: Optional[DeliveryStore] = None
+
+
+def get_delivery_store() -> DeliveryStore:
+    """Magasin de l'historique, dans DELIVERY_STORE_DIR"""
+    global _delivery_store
+    if _delivery_store is None:
+        _delivery_store = DeliveryStore(get_settings().DELIVERY_STORE_DIR)
+    return _delivery_store
@@ -0,0 +1,180 @@
+"""Features dérivées des modèles pickup / delivery, calculées par colonnes numpy
+
+Même code pour l'entraînement (DataFrame pandas) et le service (dicts de
+listes ou de tableaux) : les colonnes brutes (horodatages, GPS) deviennent la
+matrice de features dans l'ordre attendu par les modèles. Les horodatages sont
+acceptés en secondes epoch ou en datetime ; un datetime sans fuseau est lu
+comme UTC, comme dans le notebook de feature engineering.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+from models.distance import haversine_pairs
+
+# Ordre de DeliveryFeatures.to_feature_array
+DELIVERY_FEATURE_NAMES = [
+    'courier_id', 'lng', 'lat', 'aoi_id',
+    'accept_time_seconds', 'accept_gps_time_seconds', 'accept_gps_lng', 'accept_gps_lat',
+    'delivery_time_seconds', 'delivery_gps_time_seconds', 'delivery_gps_lng', 'delivery_gps_lat',
+    'delivery_time_minutes', 'accept_hour', 'accept_day', 'city_encoded', 'distance',
+    'day_of_week', 'hour_of_day', 'task_duration_seconds', 'log_task_duration',
+    'delivery_hour', 'delivery_weekday', 'task_duration_seconds_conv'
+]
+
+# Ordre de PickupFeatures.to_model_input
+PICKUP_FEATURE_NAMES = [
+    'city_encoded', 'lng', 'lat', 'aoi_id',
+    'accept_time_seconds', 'time_window_start_seconds', 'time_window_end_seconds',
+    'pickup_time_seconds', 'pickup_gps_time_seconds', 'pickup_gps_lng', 'pickup_gps_lat',
+    'accept_gps_time_seconds', 'accept_gps_lng', 'accept_gps_lat', 'waiting_time_minutes',
+    'pickup_hour', 'pickup_weekday'
+]
+
+FEATURE_NAMES = {'delivery': DELIVERY_FEATURE_NAMES, 'pickup': PICKUP_FEATURE_NAMES}
+
+SECONDS_PER_DAY = 86400
+
+
+def to_epoch_seconds(values: Any) -> np.ndarray:
+    """Secondes epoch (float64, NaN pour NaT) depuis des nombres, datetime64, datetimes ou chaînes ISO"""
+    array = np.asarray(values)
+    if array.dtype.kind in 'biuf':
+        return array.astype(np.float64)
+    if array.dtype.kind != 'M':
+        array = array.astype('datetime64[ns]')
+    seconds = array.astype('datetime64[ns]').astype(np.int64) / 1e9
+    seconds[np.isnat(array)] = np.nan
+    return seconds
+
+
+def datetime_seconds(value: datetime) -> float:
+    """Secondes epoch d'un datetime ; sans fuseau, il est lu comme UTC (comme dans to_epoch_seconds)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def hour_of_day(seconds: np.ndarray) -> np.ndarray:
+    return np.floor_divide(seconds, 3600) % 24
+
+
+def day_of_week(seconds: np.ndarray) -> np.ndarray:
+    """0 = lundi (1970-01-01 était un jeudi)"""
+    return (np.floor_divide(seconds, SECONDS_PER_DAY) + 3) % 7
+
+
+def day_of_month(seconds: np.ndarray) -> np.ndarray:
+    days = np.floor_divide(seconds, SECONDS_PER_DAY)
+    finite = np.isfinite(days)
+    dates = np.where(finite, days, 0).astype(np.int64).astype('datetime64[D]')
+    month_start = dates.astype('datetime64[M]').astype('datetime64[D]')
+    return np.where(finite, (dates - month_start).astype(np.float64) + 1, np.nan)
+
+
+def _column(columns: Mapping[str, Any], name: str, default: Optional[str] = None) -> np.ndarray:
+    if name not in columns and default is not None:
+        name = default
+    if name not in columns:
+        raise ValueError(f"Colonne manquante : {name}")
+    return np.asarray(columns[name], dtype=np.float64)
+
+
+def _time_column(columns: Mapping[str, Any], name: str, default: Optional[str] = None) -> np.ndarray:
+    # Colonne brute (datetime) ou déjà convertie (<name>_seconds)
+    for candidate in (name, f"{name}_seconds", default, f"{default}_seconds" if default else None):
+        if candidate is not None and candidate in columns:
+            return to_epoch_seconds(columns[candidate])
+    raise ValueError(f"Colonne manquante : {name}")
+
+
+def delivery_features(columns: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """Features delivery depuis les colonnes brutes
+
+    Attend courier_id, lng, lat, aoi_id, city_encoded, accept_time,
+    delivery_time et les positions GPS accept_gps_* / delivery_gps_*. Les
+    horodatages GPS valent par défaut accept_time / delivery_time. lng / lat
+    valent par défaut la position GPS de livraison.
+    """
+    accept = _time_column(columns, 'accept_time')
+    delivery = _time_column(columns, 'delivery_time')
+    accept_gps_lat = _column(columns, 'accept_gps_lat')
+    accept_gps_lng = _column(columns, 'accept_gps_lng')
+    delivery_gps_lat = _column(columns, 'delivery_gps_lat')
+    delivery_gps_lng = _column(columns, 'delivery_gps_lng')
+    duration = delivery - accept
+    accept_hour = hour_of_day(accept)
+
+    return {
+        'courier_id': _column(columns, 'courier_id'),
+        'lng': _column(columns, 'lng', 'delivery_gps_lng'),
+        'lat': _column(columns, 'lat', 'delivery_gps_lat'),
+        'aoi_id': _column(columns, 'aoi_id'),
+        'accept_time_seconds': accept,
+        'accept_gps_time_seconds': _time_column(columns, 'accept_gps_time', 'accept_time'),
+        'accept_gps_lng': accept_gps_lng,
+        'accept_gps_lat': accept_gps_lat,
+        'delivery_time_seconds': delivery,
+        'delivery_gps_time_seconds': _time_column(columns, 'delivery_gps_time', 'delivery_time'),
+        'delivery_gps_lng': delivery_gps_lng,
+        'delivery_gps_lat': delivery_gps_lat,
+        'delivery_time_minutes': duration / 60,
+        'accept_hour': accept_hour,
+        'accept_day': day_of_month(accept),
+        'city_encoded': _column(columns, 'city_encoded'),
+        'distance': haversine_pairs(accept_gps_lat, accept_gps_lng, delivery_gps_lat, delivery_gps_lng),
+        'day_of_week': day_of_week(accept),
+        'hour_of_day': accept_hour,
+        'task_duration_seconds': duration,
+        'log_task_duration': np.log1p(duration),
+        'delivery_hour': hour_of_day(delivery),
+        'delivery_weekday': day_of_week(delivery),
+        'task_duration_seconds_conv': duration
+    }
+
+
+def pickup_features(columns: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """Features pickup depuis les colonnes brutes (horodatages de PickupFeatures, en datetime ou en secondes)"""
+    pickup = _time_column(columns, 'pickup_time')
+    features = {
+        name: _column(columns, name)
+        for name in ('city_encoded', 'lng', 'lat', 'aoi_id', 'pickup_gps_lng', 'pickup_gps_lat',
+                     'accept_gps_lng', 'accept_gps_lat', 'waiting_time_minutes')
+    }
+    for name in ('accept_time', 'time_window_start', 'time_window_end', 'pickup_gps_time', 'accept_gps_time'):
+        features[f"{name}_seconds"] = _time_column(columns, name)
+    features['pickup_time_seconds'] = pickup
+    features['pickup_hour'] = hour_of_day(pickup)
+    features['pickup_weekday'] = day_of_week(pickup)
+    return features
+
+
+def feature_matrix(features: Mapping[str, np.ndarray], feature_names: Sequence[str]) -> np.ndarray:
+    """Matrice (N, n_features) float64 dans l'ordre `feature_names`
+
+    Rangée par colonnes (ordre Fortran) : chaque feature est copiée d'un bloc
+    contigu, bien plus vite qu'en écriture espacée dans une matrice ligne à ligne.
+    """
+    matrix = np.empty((len(features[feature_names[0]]), len(feature_names)), dtype=np.float64, order='F')
+    for i, name in enumerate(feature_names):
+        matrix[:, i] = features[name]
+    return matrix
+
+
+def delivery_feature_matrix(columns: Mapping[str, Any]) -> np.ndarray:
+    return feature_matrix(delivery_features(columns), DELIVERY_FEATURE_NAMES)
+
+
+def pickup_feature_matrix(columns: Mapping[str, Any]) -> np.ndarray:
+    return feature_matrix(pickup_features(columns), PICKUP_FEATURE_NAMES)
+
+
+def model_feature_matrix(name: str, columns: Mapping[str, Any]) -> np.ndarray:
+    """Matrice du modèle `name` : colonnes de l'API telles quelles si toutes présentes, sinon dérivées"""
+    feature_names = FEATURE_NAMES[name]
+    if all(feature in columns for feature in feature_names):
+        return feature_matrix({feature: np.asarray(columns[feature], dtype=np.float64)
+                               for feature in feature_names}, feature_names)
+    derive = delivery_features if name == 'delivery' else pickup_features
+    return feature_matrix(derive(columns), feature_names)
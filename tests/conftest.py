@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Les tests importent `models` et `src` depuis la racine du dépôt, comme les scripts
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
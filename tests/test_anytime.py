@@ -0,0 +1,78 @@
+import gc
+import time
+
+import numpy as np
+
+from models.route_optimizer import RouteOptimizer
+
+
+def random_locations(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{'id': i, 'lat': 48.8 + float(a) * 0.2, 'lng': 2.3 + float(b) * 0.2}
+            for i, (a, b) in enumerate(rng.random((count, 2)))]
+
+
+def timed_anytime(locations, **kwargs):
+    # Une collecte complète laissée en attente par les tests précédents ne fait pas partie de la requête
+    gc.collect()
+    started = time.perf_counter()
+    result = RouteOptimizer().optimize_anytime(locations, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def served_ids(result):
+    return sorted(stop['location']['id'] for route in result['routes'] for stop in route['stops'])
+
+
+def test_large_instance_fits_a_short_budget():
+    locations = random_locations(5000)
+    result, elapsed_ms = timed_anytime(locations, num_vehicles=10, time_budget_ms=150)
+
+    # Graphe, KMeans et préparation de la recherche ne tiennent pas : découpage de secours
+    assert elapsed_ms < 150 * 1.5
+    assert result['anytime']['partition'] in ('hilbert', 'order')
+    assert result['anytime']['elapsed_ms'] <= elapsed_ms
+    assert served_ids(result) == list(range(5000))
+    assert result['num_vehicles'] == 10
+
+
+def test_budget_left_after_fallback_goes_to_search():
+    locations = random_locations(5000, seed=3)
+    result, elapsed_ms = timed_anytime(locations, num_vehicles=10, time_budget_ms=300)
+
+    assert elapsed_ms < 300 * 1.25
+    assert result['anytime']['iterations'] > 0
+    assert served_ids(result) == list(range(5000))
+
+
+def test_unreachable_budget_is_reported():
+    locations = random_locations(20000, seed=4)
+    result, elapsed_ms = timed_anytime(locations, num_vehicles=10, time_budget_ms=50)
+
+    # La mise en forme seule dépasse 50 ms : réponse au plus tôt, dépassement signalé
+    anytime = result['anytime']
+    assert anytime['budget_exceeded'] == (anytime['elapsed_ms'] > 50)
+    assert anytime['budget_exceeded']
+    assert anytime['iterations'] == 0
+    assert elapsed_ms < 20000 * 15e-3
+    assert served_ids(result) == list(range(20000))
+
+
+def test_budget_includes_search_and_formatting():
+    locations = random_locations(2000, seed=1)
+    result, elapsed_ms = timed_anytime(locations, num_vehicles=4, time_budget_ms=300)
+
+    assert elapsed_ms < 300 * 1.25
+    assert result['anytime']['partition'] == 'kmeans'
+    assert result['anytime']['iterations'] > 0
+    assert result['anytime']['budget_exceeded'] == (result['anytime']['elapsed_ms'] > 300)
+    assert served_ids(result) == list(range(2000))
+
+
+def test_search_beats_fallback_partition():
+    locations = random_locations(300, seed=2)
+    fallback = RouteOptimizer().optimize_anytime(locations, num_vehicles=3, time_budget_ms=1)
+    searched = RouteOptimizer().optimize_anytime(locations, num_vehicles=3, time_budget_ms=300)
+
+    assert fallback['anytime']['partition'] == 'hilbert'
+    assert searched['total_distance'] < fallback['total_distance']
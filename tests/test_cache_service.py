@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from src.api.schemas.prediction import DeliveryFeatures, PickupFeatures
+from src.services.cache_service import InMemoryBackend, PredictionCache
+
+
+def delivery_features(**overrides):
+    values = dict(
+        order_id=1, courier_id=7, lng=121.47, lat=31.23, aoi_id=12, accept_time_seconds=1_700_000_000.0,
+        accept_gps_time_seconds=1_700_000_010.0, accept_gps_lng=121.47, accept_gps_lat=31.23,
+        delivery_time_seconds=1_700_001_800.0, delivery_gps_time_seconds=1_700_001_810.0,
+        delivery_gps_lng=121.48, delivery_gps_lat=31.24, delivery_time_minutes=30.0, accept_hour=10,
+        accept_day=14, city_encoded=3, distance=2.5, day_of_week=1, hour_of_day=10,
+        task_duration_seconds=1800.0, log_task_duration=7.5, delivery_hour=10, delivery_weekday=1,
+        task_duration_seconds_conv=1800.0
+    )
+    values.update(overrides)
+    return DeliveryFeatures(**values)
+
+
+def pickup_features(**overrides):
+    moment = datetime(2024, 5, 14, 10, 0)
+    values = dict(
+        accept_time=moment, time_window_start=moment, time_window_end=datetime(2024, 5, 14, 11, 0),
+        lng=121.47, lat=31.23, aoi_id=12, aoi_type='residential', pickup_time=moment, pickup_gps_time=moment,
+        pickup_gps_lng=121.47, pickup_gps_lat=31.23, accept_gps_time=moment, accept_gps_lng=121.47,
+        accept_gps_lat=31.23, waiting_time_minutes=5.0, city_encoded=3
+    )
+    values.update(overrides)
+    return PickupFeatures(**values)
+
+
+class FailingBackend:
+    def get(self, key):
+        raise ConnectionError("redis down")
+
+    def set(self, key, value, ttl):
+        raise ConnectionError("redis down")
+
+    def clear(self):
+        raise ConnectionError("redis down")
+
+
+def test_keys_cover_every_model_feature():
+    cache = PredictionCache()
+    assert cache.delivery_key(delivery_features()) == cache.delivery_key(delivery_features(order_id=2))
+    assert cache.delivery_key(delivery_features()) != cache.delivery_key(delivery_features(delivery_time_minutes=45.0))
+    assert cache.delivery_key(delivery_features()) != cache.delivery_key(delivery_features(courier_id=8))
+    assert cache.delivery_key(delivery_features()) != cache.delivery_key(delivery_features(delivery_gps_lat=31.3))
+    assert cache.pickup_key(pickup_features()) != cache.pickup_key(pickup_features(waiting_time_minutes=20.0))
+    assert cache.pickup_key(pickup_features()) != cache.pickup_key(pickup_features(aoi_id=13))
+    assert cache.pickup_key(pickup_features()) != cache.delivery_key(delivery_features())
+
+
+def test_near_identical_requests_share_one_entry():
+    cache = PredictionCache(backend=InMemoryBackend())
+    cache.set(cache.delivery_key(delivery_features()), {'prediction': 30.0})
+    cache.set(cache.pickup_key(pickup_features()), {'prediction': 6.0})
+
+    neighbour = delivery_features(order_id=2, lat=31.2301, delivery_gps_lng=121.4801,
+                                  accept_time_seconds=1_700_000_060.0, delivery_time_minutes=31.0)
+    assert cache.get(cache.delivery_key(neighbour)) == {'prediction': 30.0}
+    assert cache.get(cache.pickup_key(pickup_features(lng=121.4701, waiting_time_minutes=5.5))) == {'prediction': 6.0}
+    assert cache.get(cache.delivery_key(delivery_features(delivery_time_minutes=45.0))) is None
+    assert cache.stats()['size'] == 2
+
+
+def test_backend_errors_never_fail_the_cache():
+    cache = PredictionCache(backend=FailingBackend())
+    key = cache.delivery_key(delivery_features())
+    cache.set(key, {'prediction': 30.0})
+    assert cache.get(key) == {'prediction': 30.0}
+
+    cache.clear()
+    assert cache.get(key) is None
+    assert cache.counters['backend_errors'] == 3
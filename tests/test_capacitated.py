@@ -0,0 +1,54 @@
+from collections import Counter
+
+import numpy as np
+
+from models.capacitated import build_fleet, solve_capacitated
+
+
+def random_stops(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([48.8 + rng.random(count) * 0.1, 2.3 + rng.random(count) * 0.1])
+
+
+def check_solution(solution, count):
+    """Chaque arrêt est servi une fois ou non affecté, et aucun véhicule n'est surchargé"""
+    served = [stop for route in solution['routes'] for stop in route['stops']]
+    assert sorted(served + list(solution['unassigned'])) == list(range(count))
+    for route in solution['routes']:
+        assert route['load'] <= route['vehicle']['capacity'] + 1e-9
+
+
+def test_mixed_fleet_uses_every_vehicle_class():
+    coords = random_stops(500)
+    vehicles = build_fleet({'bike': 5, 'scooter': 5, 'van': 3})
+    solution = solve_capacitated(coords, np.ones(500), vehicles, coords.mean(axis=0), improve=False)
+
+    check_solution(solution, 500)
+    assert solution['unassigned'] == []
+    assert Counter(route['vehicle']['vehicle_type'] for route in solution['routes']) == {
+        'bike': 5, 'scooter': 5, 'van': 3
+    }
+
+
+def test_overloaded_fleet_is_filled_before_leaving_stops_unassigned():
+    coords = random_stops(300, seed=1)
+    demands = np.random.default_rng(1).choice([1.0, 4.0, 9.0], 300)
+    vehicles = build_fleet({'bike': 10, 'scooter': 2})
+    solution = solve_capacitated(coords, demands, vehicles, coords.mean(axis=0), improve=False)
+
+    check_solution(solution, 300)
+    assert len(solution['unassigned']) > 0
+    # Réparation : il ne reste de place pour aucun arrêt non affecté
+    spare = max(route['vehicle']['capacity'] - route['load'] for route in solution['routes'])
+    assert demands[solution['unassigned']].min() > spare
+
+
+def test_single_vehicle_capacity_is_respected():
+    coords = random_stops(100, seed=2)
+    vehicles = build_fleet(num_vehicles=1, vehicle_capacity=50)
+    solution = solve_capacitated(coords, np.ones(100), vehicles, coords.mean(axis=0))
+
+    check_solution(solution, 100)
+    assert len(solution['routes']) == 1
+    assert solution['routes'][0]['load'] == 50
+    assert len(solution['unassigned']) == 50
@@ -0,0 +1,55 @@
+import asyncio
+
+import numpy as np
+
+from models.clustering import ClusterCache
+from src.api.schemas.prediction import RouteOptimizationRequest
+from src.services import prediction_service
+from src.services.pools import BoundedPool
+from src.services.prediction_service import PredictionService, _optimize_routes
+
+
+def depot_stops(count=90, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{'id': f"s{i}", 'lat': 48.8 + lat * 0.1, 'lng': 2.3 + lng * 0.1}
+            for i, (lat, lng) in enumerate(rng.random((count, 2)))]
+
+
+def test_entry_moved_to_another_cache_starts_warm():
+    stops = depot_stops()
+    coords = np.array([[stop['lat'], stop['lng']] for stop in stops])
+    ids = [stop['id'] for stop in stops]
+    parent = ClusterCache()
+    labels = parent.fit_predict(coords, 3, key='depot', stop_ids=ids)
+
+    worker = ClusterCache()
+    worker.load('depot', parent.entry('depot'))
+    assert (worker.fit_predict(coords, 3, key='depot', stop_ids=ids) == labels).all()
+    assert worker.stats == {'cold': 0, 'warm': 0, 'reused': 1}
+
+
+def test_route_task_uses_the_entry_sent_by_the_parent(monkeypatch):
+    monkeypatch.setattr(prediction_service, '_route_cluster_cache', ClusterCache())
+    monkeypatch.setattr(prediction_service, '_route_local', type(prediction_service._route_local)())
+    stops = depot_stops()
+    parent = ClusterCache()
+    coords = np.array([[stop['lat'], stop['lng']] for stop in stops])
+    parent.fit_predict(coords, 3, key='depot', stop_ids=[stop['id'] for stop in stops])
+
+    result = _optimize_routes(stops, 3, None, None, None, 'depot', parent.entry('depot'))
+    assert prediction_service._route_cluster_cache.stats['reused'] == 1
+    assert result['cluster_entry'] is not None
+
+
+def test_process_pool_results_feed_the_parent_cache(monkeypatch):
+    monkeypatch.setattr(prediction_service, '_route_cluster_cache', ClusterCache())
+    service = PredictionService(forecaster=object())
+    service.route_pool = BoundedPool('route', 1, 4, kind='process')
+    request = RouteOptimizationRequest(deliveries=depot_stops(), num_vehicles=3, cluster_key='depot')
+    try:
+        result = asyncio.run(service.optimize_route(request))
+    finally:
+        service.route_pool.shutdown()
+    assert 'cluster_entry' not in result
+    entry = prediction_service._route_cluster_cache.entry('depot')
+    assert len(entry['centroids']) == 3 and len(entry['labels']) == 90
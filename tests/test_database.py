@@ -0,0 +1,97 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from src.utils.database import DeliveryStore
+from src.utils.features import SECONDS_PER_DAY
+
+FIRST_DAY = date(2024, 5, 1)
+EPOCH_DAY = (FIRST_DAY - date(1970, 1, 1)).days
+
+
+def deliveries(rows, seed, minutes):
+    """3 villes × 4 jours ; durées tirées dans l'intervalle `minutes`"""
+    rng = np.random.default_rng(seed)
+    return {
+        'city_encoded': rng.integers(0, 3, rows).astype(np.float64),
+        'accept_time_seconds': (EPOCH_DAY + rng.integers(0, 4, rows)) * SECONDS_PER_DAY
+                               + rng.uniform(0, SECONDS_PER_DAY, rows),
+        'delivery_time_minutes': rng.uniform(*minutes, rows),
+        'courier_id': rng.integers(0, 50, rows).astype(np.float64),
+    }
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = DeliveryStore(tmp_path / 'deliveries')
+    # Deux écritures aux durées disjointes : deux parts par partition, prunables par min / max
+    batches = [deliveries(2000, seed=0, minutes=(5, 30)), deliveries(2000, seed=1, minutes=(40, 90))]
+    for batch in batches:
+        store.append(batch)
+    rows = {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+    return store, rows
+
+
+def test_partitions_are_pruned_by_city_and_day(history):
+    store, rows = history
+    result = store.query(['delivery_time_minutes'], cities=[1], start='2024-05-02', end='2024-05-03')
+
+    days = rows['accept_time_seconds'] // SECONDS_PER_DAY - EPOCH_DAY
+    mask = (rows['city_encoded'] == 1) & (days >= 1) & (days <= 2)
+    expected = np.sort(rows['delivery_time_minutes'][mask])
+    np.testing.assert_array_equal(np.sort(result['delivery_time_minutes']), expected)
+    stats = store.stats()
+    # 12 partitions (3 villes × 4 jours) : 2 lues, 10 écartées sur leur seul nom
+    assert (stats['partitions_scanned'], stats['partitions_pruned']) == (2, 10)
+    assert stats['parts_read'] == 4
+
+
+@pytest.mark.parametrize('op, operand', [
+    ('>', 35.0), ('<=', 20.0), ('between', (25.0, 45.0)), ('in', [3.0, 7.0]), ('!=', 3.0), ('==', 7.0)
+])
+def test_filters_match_brute_force(history, op, operand):
+    store, rows = history
+    column = 'courier_id' if op in ('in', '!=', '==') else 'delivery_time_minutes'
+    result = store.query(['delivery_time_minutes'], filters=[(column, op, operand)])
+
+    values = rows[column]
+    mask = {
+        '>': lambda: values > operand, '<=': lambda: values <= operand,
+        'between': lambda: (values >= operand[0]) & (values <= operand[1]),
+        'in': lambda: np.isin(values, operand), '!=': lambda: values != operand, '==': lambda: values == operand
+    }[op]()
+    expected = np.sort(rows['delivery_time_minutes'][mask])
+    np.testing.assert_array_equal(np.sort(result['delivery_time_minutes']), expected)
+
+
+def test_parts_are_skipped_from_min_max(history):
+    store, _ = history
+    result = store.query(['delivery_time_minutes'], filters=[('delivery_time_minutes', '>', 35.0)])
+
+    assert len(result['delivery_time_minutes']) == 2000
+    stats = store.stats()
+    # Les parts de la première écriture (durées < 30 min) ne sont pas ouvertes
+    assert stats['parts_skipped'] == 12
+    assert stats['parts_read'] == 12
+
+
+def test_column_added_later_reads_as_missing(history):
+    store, _ = history
+    late = deliveries(300, seed=2, minutes=(5, 90))
+    late['rating'] = np.full(300, 4.0)
+    store.append(late)
+
+    result = store.query(['rating'], filters=[('rating', '>=', 4.0)])
+    assert len(result['rating']) == 300
+    # Parts antérieures à la colonne : aucune ligne ne peut passer le filtre
+    assert store.stats()['parts_skipped'] == 24
+
+    projected = store.query(['rating', 'delivery_time_minutes'])
+    assert np.isnan(projected['rating']).sum() == 4000
+
+
+def test_unknown_operator_is_rejected(history):
+    store, _ = history
+    with pytest.raises(ValueError):
+        store.query(filters=[('courier_id', 'like', 3)])
@@ -0,0 +1,69 @@
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.api.schemas.columnar import PICKUP_COLUMNS
+from src.api.schemas.prediction import PickupFeatures
+from src.utils.features import PICKUP_FEATURE_NAMES, pickup_feature_matrix
+
+ROOT = Path(__file__).resolve().parents[1]
+
+TIME_FIELDS = ('accept_time', 'time_window_start', 'time_window_end', 'pickup_time', 'pickup_gps_time',
+               'accept_gps_time')
+
+
+@pytest.fixture
+def local_timezone(monkeypatch):
+    # Fuseau local loin d'UTC : la collecte de 23 h 30 tombe le lendemain à Tokyo
+    monkeypatch.setenv('TZ', 'Asia/Tokyo')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def pickup(pickup_time):
+    return PickupFeatures(
+        accept_time=pickup_time - timedelta(minutes=20), time_window_start=pickup_time - timedelta(minutes=10),
+        time_window_end=pickup_time + timedelta(minutes=30), lng=121.47, lat=31.23, aoi_id=12,
+        aoi_type='residential', pickup_time=pickup_time, pickup_gps_time=pickup_time, pickup_gps_lng=121.47,
+        pickup_gps_lat=31.23, accept_gps_time=pickup_time - timedelta(minutes=20), accept_gps_lng=121.47,
+        accept_gps_lat=31.23, waiting_time_minutes=5.0, city_encoded=3
+    )
+
+
+def test_pickup_hour_and_weekday_match_across_paths(local_timezone):
+    # Dimanche 23 h 30 (UTC), sans fuseau
+    features = pickup(datetime(2024, 5, 12, 23, 30))
+    row = features.to_model_input()
+    assert (row['pickup_hour'], row['pickup_weekday']) == (23, 6)
+
+    epoch = {name: [getattr(features, name).replace(tzinfo=timezone.utc).timestamp()] for name in TIME_FIELDS}
+    others = {name: [getattr(features, name)] for name in PickupFeatures.model_fields if name not in TIME_FIELDS}
+    batch = PICKUP_COLUMNS.validate({**others, **epoch})
+    assert batch.error_count == 0
+    assert batch.features[0].tolist() == features.to_feature_array()
+
+    raw = {**others, **{name: np.array(values, dtype='datetime64[us]') for name, values in
+                        ((name, [getattr(features, name)]) for name in TIME_FIELDS)}}
+    assert pickup_feature_matrix(raw)[0].tolist() == features.to_feature_array()
+    assert list(row) == PICKUP_FEATURE_NAMES
+
+
+def test_aware_datetimes_use_the_utc_instant():
+    naive = pickup(datetime(2024, 5, 12, 23, 30)).to_feature_array()
+    aware = pickup(datetime(2024, 5, 13, 1, 30, tzinfo=timezone(timedelta(hours=2)))).to_feature_array()
+    assert aware == naive
+
+
+def test_serving_imports_do_not_load_scipy():
+    # Processus neuf : les autres tests ont déjà importé scipy
+    code = ("import sys, src.utils.features, src.services.prediction_service; "
+            "print(any(name.startswith('scipy') for name in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == 'False'
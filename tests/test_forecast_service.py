@@ -0,0 +1,68 @@
+import sys
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from src.services.forecast_service import DemandForecaster, UnknownZoneError
+
+START = datetime(2024, 3, 4, tzinfo=timezone.utc)  # un lundi
+
+
+def daily_deliveries(city, days, per_day, hour=12):
+    """`per_day` livraisons par jour à `hour` h (UTC) pendant `days` jours depuis START"""
+    seconds = [(START + timedelta(days=d, hours=hour, minutes=i % 60)).timestamp()
+               for d in range(days) for i in range(per_day)]
+    return {'city_encoded': np.full(len(seconds), city, dtype=np.float64), 'accept_time_seconds': np.array(seconds)}
+
+
+def test_forecast_follows_the_weekly_profile():
+    forecaster = DemandForecaster(history_weeks=4)
+    forecaster.record(daily_deliveries(3, days=5 * 7, per_day=10))
+
+    result = forecaster.forecast('3', date(2024, 4, 8), date(2024, 4, 14))
+    assert [day['deliveries'] for day in result['forecasted_deliveries']] == [10.0] * 7
+    assert result['peak_hours'] == [12]
+    assert result['confidence_interval']['total'] == 70.0
+    with pytest.raises(UnknownZoneError):
+        forecaster.forecast('city:4', date(2024, 4, 8), date(2024, 4, 8))
+
+
+def test_concurrent_refits_never_expose_a_partial_model():
+    forecaster = DemandForecaster(history_weeks=2, refit_seconds=0.0)
+    forecaster.record(daily_deliveries(0, days=21, per_day=5))
+    errors = []
+    done = threading.Event()
+
+    def write():
+        # Chaque lot ajoute une zone : le nombre de lignes des profils change à chaque réajustement
+        for city in range(1, 200):
+            forecaster.record(daily_deliveries(city, days=21, per_day=1))
+            forecaster.fit()
+        done.set()
+
+    def read():
+        while not done.is_set():
+            for city in range(0, 200, 7):
+                try:
+                    forecaster.forecast(str(city), date(2024, 3, 25), date(2024, 3, 31))
+                except UnknownZoneError:
+                    pass
+                except Exception as e:
+                    errors.append(e)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(2)]
+    # Changements de thread très fréquents : un lecteur peut tomber entre deux affectations de fit()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert forecaster.forecast('199', date(2024, 3, 25), date(2024, 3, 25))['confidence_interval']['total'] == 1.0
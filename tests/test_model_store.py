@@ -0,0 +1,20 @@
+import numpy as np
+from sklearn.linear_model import Lasso
+
+from src.services.model_store import export_linear_model, load_linear_scorer
+
+NAMES = ['a', 'b', 'c', 'd']
+
+
+def test_mapped_coefficients_are_scored_in_place(tmp_path):
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(200, len(NAMES)))
+    model = Lasso(alpha=0.01).fit(features, features @ [3.0, 0.0, -2.0, 0.5] + 12)
+    export_linear_model(model, NAMES, tmp_path)
+
+    scorer = load_linear_scorer(tmp_path, NAMES)
+    assert not scorer.coef.flags.owndata  # vue sur le fichier mappé, pas une copie
+    expected = model.predict(features[:5])
+    assert np.allclose([scorer.score(row) for row in features[:5]], expected)
+    assert np.allclose([scorer.score(row.tolist()) for row in features[:5]], expected)
+    assert np.allclose(scorer.score_batch(features[:5]), expected)
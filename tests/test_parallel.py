@@ -0,0 +1,52 @@
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from models.distance import KNNDistanceGraph, haversine_matrix
+from models.local_search import solve_route
+from models.parallel import ParallelRouteSolver, _attach
+
+
+def clusters_of(count, parts):
+    return [list(range(i, count, parts)) for i in range(parts)]
+
+
+def test_pool_matches_sequential_routes_and_is_reused():
+    rng = np.random.default_rng(0)
+    coords = np.column_stack([48.8 + rng.random(400) * 0.1, 2.3 + rng.random(400) * 0.1])
+    solver = ParallelRouteSolver(2, min_parallel_stops=0)
+    try:
+        for distances in (haversine_matrix(coords), KNNDistanceGraph(coords, 10)):
+            clusters = clusters_of(400, 4)
+            expected = [solve_route(points, coords, distances, False) for points in clusters]
+            assert solver.solve(clusters, coords, distances, improve=False) == expected
+        executor = solver._executor
+        solver.solve(clusters_of(400, 3), coords, haversine_matrix(coords), improve=False)
+        assert solver._executor is executor
+    finally:
+        solver.shutdown()
+
+
+def test_small_requests_stay_in_process():
+    solver = ParallelRouteSolver(2, min_parallel_stops=1000)
+    coords = np.random.default_rng(1).random((100, 2))
+    routes = solver.solve(clusters_of(100, 4), coords, haversine_matrix(coords), improve=False)
+    assert sorted(stop for route in routes for stop in route) == list(range(100))
+    assert solver._executor is None
+
+
+def test_worker_attach_leaves_the_block_to_the_parent(monkeypatch):
+    block = shared_memory.SharedMemory(create=True, size=8 * 4)
+    try:
+        np.ndarray((4,), dtype=np.float64, buffer=block.buf)[:] = [1, 2, 3, 4]
+        registered = []
+        monkeypatch.setattr(resource_tracker, "register", lambda name, rtype: registered.append(name))
+        attached = []
+        view = _attach((block.name, (4,), np.dtype(np.float64).str), attached)
+        assert view.tolist() == [1, 2, 3, 4]
+        assert registered == []
+        del view
+        attached[0].close()
+    finally:
+        block.close()
+        block.unlink()
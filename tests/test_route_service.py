@@ -0,0 +1,96 @@
+import random
+from datetime import datetime
+
+from models.local_search import repair_window
+from models.route_optimizer import RouteOptimizer
+from src.services.route_service import RouteService
+
+
+def random_locations(count, seed, start=0):
+    rng = random.Random(seed)
+    return [{'id': start + i, 'lat': 48.85 + rng.uniform(-0.05, 0.05), 'lng': 2.35 + rng.uniform(-0.05, 0.05)}
+            for i in range(count)]
+
+
+def make_service():
+    return RouteService(RouteOptimizer(local_search_time_limit=0.1))
+
+
+def test_plan_loads_match_solver_for_stops_without_demand():
+    service = make_service()
+    plan = service.create_plan('p', random_locations(20, seed=1), fleet=['scooter'],
+                               departure_time=datetime(2024, 1, 1, 9))
+    route = plan['routes'][0]
+    # Sans champ 'demand', chaque arrêt compte pour une unité, comme dans le solveur
+    assert route['load'] == len(route['stops']) == 20
+
+
+def test_insertions_never_overfill_a_vehicle():
+    service = make_service()
+    service.create_plan('p', random_locations(20, seed=2), fleet=['scooter'],
+                        departure_time=datetime(2024, 1, 1, 9))
+    for location in random_locations(30, seed=3, start=100):
+        service.insert_stop('p', location)
+
+    plan = service.get_plan('p')
+    route = plan['routes'][0]
+    assert route['load'] == len(route['stops']) == 30
+    assert len(plan['unassigned']) == 20
+
+
+def test_cancel_frees_capacity():
+    service = make_service()
+    service.create_plan('p', random_locations(30, seed=4), fleet=['scooter'],
+                        departure_time=datetime(2024, 1, 1, 9))
+    assert service.insert_stop('p', {'id': 'late', 'lat': 48.85, 'lng': 2.35})['vehicle_id'] is None
+
+    service.cancel_stop('p', 0)
+    result = service.insert_stop('p', {'id': 'next', 'lat': 48.85, 'lng': 2.35})
+    assert result['vehicle_id'] == 1
+    assert service.get_plan('p')['routes'][0]['load'] == 30
+
+
+def check_bookkeeping(plan):
+    for r, stops in enumerate(plan.routes):
+        assert [plan.position[i] for i in stops] == list(range(len(stops)))
+        assert all(plan.route_of[i] == r for i in stops)
+        assert plan.loads[r] == sum(plan.demand(i) for i in stops)
+    assert all(plan.route_of[i] < 0 for i in plan.unassigned)
+
+
+def test_events_keep_positions_and_loads_in_sync():
+    service = make_service()
+    service.create_plan('p', random_locations(40, seed=5), num_vehicles=4, departure_time=datetime(2024, 1, 1, 9))
+    rng = random.Random(6)
+    for location in random_locations(30, seed=7, start=100):
+        result = service.insert_stop('p', location)
+        plan = service.plans['p']
+        assert plan.routes[result['vehicle_id'] - 1][result['position'] - 1] == plan.ids[location['id']]
+        check_bookkeeping(plan)
+    for stop_id in rng.sample(range(40), 10):
+        service.cancel_stop('p', stop_id)
+        check_bookkeeping(service.plans['p'])
+    for stop_id in rng.sample(range(100, 130), 10):
+        service.reorder_stop('p', stop_id, vehicle_id=rng.randint(1, 4), position=rng.randint(1, 5))
+        check_bookkeeping(service.plans['p'])
+
+
+def test_insertion_work_does_not_grow_with_the_fleet(monkeypatch):
+    service = make_service()
+    service.create_plan('p', random_locations(20, seed=8), fleet=['scooter'] + ['bike'] * 500,
+                        departure_time=datetime(2024, 1, 1, 9))
+    plan = service.plans['p']
+    checked = []
+    fits = plan.fits
+    monkeypatch.setattr(plan, 'fits', lambda route, demand: checked.append(route) or fits(route, demand))
+    for location in random_locations(20, seed=9, start=100):
+        checked.clear()
+        assert service.insert_stop('p', location)['vehicle_id'] is not None
+        assert len(checked) <= service.insertion_candidates + 2
+    check_bookkeeping(plan)
+
+
+def test_repair_can_move_the_first_stop():
+    coords = {0: [48.85, 2.31], 1: [48.85, 2.32], 2: [48.85, 2.33], 3: [48.85, 2.34], 9: [48.85, 2.325]}
+    # Nouvel arrêt inséré en tête alors qu'il se trouve au milieu de la route
+    assert repair_window([9, 0, 1, 2, 3], coords, 0) == [0, 1, 9, 2, 3]
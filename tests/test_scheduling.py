@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from models.scheduling import schedule_route
+
+
+def test_early_arrival_waits_for_window_and_delay_propagates():
+    departure = datetime(2026, 10, 19, 8, 0)
+    locations = [
+        {'lat': 0, 'lng': 0, 'time_window_start': '2026-10-19T08:30:00'},
+        {'lat': 0, 'lng': 0, 'time_window_end': datetime(2026, 10, 19, 8, 40)},
+        {'lat': 0, 'lng': 0, 'service_minutes': 0},
+    ]
+    # 10 km à 30 km/h = 20 minutes par tronçon, 5 minutes de service par défaut
+    schedule = schedule_route(locations, [10.0, 10.0, 10.0], departure)
+    first, second, third = schedule['stops']
+
+    assert first['estimated_arrival'] == '2026-10-19T08:20:00'
+    assert first['service_start'] == '2026-10-19T08:30:00'
+    assert first['waiting_minutes'] == 10.0
+    assert second['estimated_arrival'] == '2026-10-19T08:55:00'
+    assert second['slack_minutes'] == -15.0
+    assert not second['on_time']
+    assert third['estimated_arrival'] == '2026-10-19T09:20:00'
+    assert schedule['end_time'] == '2026-10-19T09:20:00'
+    assert schedule['estimated_duration'] == 80.0
+    assert schedule['late_stops'] == 1
+
+
+def test_empty_route():
+    schedule = schedule_route([], [], '2026-10-19T08:00:00')
+    assert schedule['stops'] == []
+    assert schedule['estimated_duration'] == 0.0
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import Lasso
+
+from src.services.training import SufficientStatistics, solve_lasso, training_error
+
+NAMES = ['a', 'b', 'c', 'd', 'e', 'timestamp']
+
+
+def dataset(rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    features = rng.normal(size=(rows, len(NAMES)))
+    features[:, 1] = features[:, 0] * 0.8 + rng.normal(scale=0.3, size=rows)  # features corrélées
+    features[:, 5] = 1.7e9 + rng.uniform(0, 86400 * 30, size=rows)  # horodatages en secondes epoch
+    target = 3 * features[:, 0] - 2 * features[:, 2] + 0.5 * features[:, 3] + 1e-5 * (features[:, 5] - 1.7e9)
+    return features, target + 12 + rng.normal(scale=0.5, size=rows)
+
+
+def chunked_statistics(features, target, chunk=700):
+    stats = SufficientStatistics(NAMES)
+    for start in range(0, len(target), chunk):
+        stats.update(features[start:start + chunk], target[start:start + chunk])
+    return stats
+
+
+@pytest.mark.parametrize('alpha', [0.01, 0.1, 1.0])
+def test_solve_lasso_matches_sklearn(alpha):
+    features, target = dataset()
+    coef, intercept, _ = solve_lasso(chunked_statistics(features, target), alpha, tol=1e-10, max_iter=100000)
+
+    # Même objectif ; sklearn centre les données lui-même
+    reference = Lasso(alpha=alpha, tol=1e-10, max_iter=100000).fit(features, target)
+    np.testing.assert_allclose(coef, reference.coef_, rtol=1e-4, atol=1e-8)
+    assert intercept == pytest.approx(reference.intercept_, rel=1e-6)
+    # Le L1 annule les mêmes coefficients
+    assert (np.abs(coef) > 1e-12).tolist() == (np.abs(reference.coef_) > 1e-12).tolist()
+
+
+def test_chunked_statistics_match_one_pass():
+    features, target = dataset(rows=1000, seed=1)
+    one_pass = SufficientStatistics(NAMES)
+    one_pass.update(features, target)
+    merged = chunked_statistics(features[:600], target[:600])
+    merged.merge(chunked_statistics(features[600:], target[600:], chunk=150))
+
+    np.testing.assert_allclose(merged.xx, one_pass.xx, rtol=1e-9)
+    np.testing.assert_allclose(merged.xy, one_pass.xy, rtol=1e-9)
+    np.testing.assert_allclose(merged.mean_x, one_pass.mean_x, rtol=1e-12)
+
+
+def test_training_error_matches_direct_residuals():
+    features, target = dataset(rows=500, seed=2)
+    stats = chunked_statistics(features, target)
+    coef, intercept, _ = solve_lasso(stats, 0.05, tol=1e-10, max_iter=100000)
+
+    residuals = target - features @ coef - intercept
+    error = training_error(stats, coef)
+    assert error['rmse'] == pytest.approx(np.sqrt(np.mean(residuals ** 2)), rel=1e-6)
+    assert error['r2'] == pytest.approx(1 - residuals @ residuals / np.sum((target - target.mean()) ** 2), rel=1e-6)